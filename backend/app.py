@@ -5,7 +5,15 @@ import tempfile
 import logging
 import argparse
 import json
-from flask import Flask, request, jsonify, make_response, send_file
+from flask import (
+    Flask,
+    request,
+    jsonify,
+    make_response,
+    send_file,
+    g,
+    has_request_context,
+)
 from flask_cors import CORS
 import threading
 import time
@@ -17,7 +25,49 @@ import numpy as np
 from utils.postprocess_utils import format_str_v2
 from db.db_manager import DBManager
 from utils.audio_storage import AudioStorage
+from utils.audio_decoder import (
+    AudioDecodeError,
+    StreamDecoder,
+    decode_audio_bytes,
+    decode_base64_audio,
+    supports_stream_decoding,
+)
 from llm.llm_service import LLMServiceManager
+from asr.streaming import StreamingSessionManager, is_streaming_model, SAMPLE_RATE
+from asr.scheduler import InferenceScheduler
+from asr.model_manager import DEFAULT_MAX_RESIDENT_MODELS, ModelManager
+from asr.backends import (
+    BACKENDS,
+    BACKEND_TORCH,
+    DEVICE_AUTO,
+    BackendStats,
+    is_onnx_available,
+    model_backend,
+)
+from asr.autotune import Autotuner, apply_torch_threads
+from asr.daemon_client import ModelDaemonError, ping_daemon, request_daemon
+from asr.worker_pool import ASRWorkerPool
+from asr.silence_gate import SilenceGate, DEFAULT_THRESHOLD_DB
+from asr.stitching import ChunkStitcher, DEFAULT_OVERLAP_SECONDS
+from asr.chunk_queue import (
+    ChunkQueue,
+    ChunkQueueTotals,
+    PendingChunk,
+    DEFAULT_MAX_PENDING_SECONDS,
+)
+from asr.realtime_session import SessionRegistry
+from asr.two_pass import FinalPassRunner, DEFAULT_MAX_AUDIO_SECONDS
+from asr.result_cache import ResultCache, make_cache_key, DEFAULT_MAX_BYTES
+from asr.jobs import JobManager, TERMINAL_STATUSES, DEFAULT_WINDOW_SECONDS
+from asr.long_audio import (
+    LongAudioTranscriber,
+    run_model_stage,
+    STAGE_PUNC,
+    DEFAULT_LONG_AUDIO_SECONDS,
+)
+from utils import wsgi_server, ws_server
+from utils.binary_transport import BodyBuffer, parse_bool, read_stream_params
+from utils.metrics import MetricsRegistry
 import traceback
 
 # 配置huggingface加速
@@ -32,6 +82,58 @@ logger = logging.getLogger(__name__)
 # 创建 Flask 应用
 app = Flask(__name__)
 
+# 记录进行中的请求，生产服务器退出时据此等待识别请求完成
+request_tracker = wsgi_server.RequestTracker()
+request_tracker.init_app(app)
+
+# 指标：按接口、模型和处理阶段统计耗时，通过 /api/metrics 导出
+metrics = MetricsRegistry()
+http_requests_total = metrics.counter(
+    "asr_http_requests_total", "HTTP 请求数（按接口和状态码）"
+)
+http_request_seconds = metrics.histogram(
+    "asr_http_request_duration_seconds", "HTTP 请求总耗时（按接口和模型）"
+)
+stage_seconds = metrics.histogram(
+    "asr_request_stage_duration_seconds", "请求各处理阶段的耗时（按接口、模型和阶段）"
+)
+
+
+def current_model_name():
+    """当前模型名称，用作指标标签"""
+    params = model_manager.model_params or model_params
+    return params["model"]
+
+
+def timed_stage(stage):
+    """记录当前请求中一个处理阶段的耗时
+
+    Args:
+        stage: 阶段名称（decode、inference、postprocess、insert_text、db 等）
+    """
+    endpoint = request.endpoint if has_request_context() else None
+    return stage_seconds.time(
+        endpoint=endpoint or "background", model=current_model_name(), stage=stage
+    )
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop("request_started", None)
+    endpoint = request.endpoint or "unknown"
+    if started is not None and request.method != "OPTIONS":
+        http_request_seconds.labels(
+            endpoint=endpoint, model=current_model_name()
+        ).observe(time.perf_counter() - started)
+    http_requests_total.inc(endpoint=endpoint, status=str(response.status_code))
+    return response
+
+
 # 配置 CORS，允许所有来源访问
 # CORS(app,
 #      resources={r"/*": {"origins": "*"}},
@@ -41,9 +143,9 @@ app = Flask(__name__)
 #      max_age=86400)  # 缓存预检请求结果24小时
 
 # 全局变量
-asr_model = None
-model_loading = False
-model_load_error = None
+# 模型管理器：持有当前模型、加载状态和分阶段加载进度，支持不停服切换模型；
+# 请求指定的其他模型常驻内存，超出预算时按最近最少使用的顺序淘汰
+model_manager = ModelManager()
 is_recording = False
 temp_dir = tempfile.gettempdir()
 
@@ -51,9 +153,84 @@ temp_dir = tempfile.gettempdir()
 db_manager = None
 audio_storage = None
 
+# ASR 工作进程数，0 表示在当前进程中加载模型
+asr_workers = 0
+# 单个推理任务的超时时间（秒），超时的工作进程会被重启
+asr_worker_timeout = 120
+# torch 算子内线程数（使用工作进程时为每个进程的线程数），0 表示使用默认值
+torch_threads = 0
+
+# 设备和线程数自动校准（稍后会根据命令行参数初始化），None 表示不校准
+autotuner = None
+# 由自动校准决定的设置（命令行没有显式指定）: device、asr_workers、torch_threads
+autotune_targets = set()
+# 启动时没有适用的校准结果，首次加载模型前校准（之后重新加载模型不再校准）
+autotune_pending = False
+# 文件转写每段的时长是否按工作进程数自动确定（命令行没有显式指定）
+job_window_auto = True
+
+# 超过该时长（秒）的一次性识别先用 VAD 切分，再分发到多个工作进程并行识别，0 表示不启用
+long_audio_seconds = DEFAULT_LONG_AUDIO_SECONDS
+
+# 是否保存实时分片的音频文件（在后台线程中写入，不阻塞识别）
+save_realtime_audio = True
+
 # 初始化LLM服务管理器
 llm_manager = None
 
+# 文件转写任务管理器（稍后会根据命令行参数初始化）
+job_manager = None
+
+# WebSocket 流式识别服务（通过 --ws-port 启用）
+stream_socket_server = None
+# WebSocket 每个分片的音频秒数，0 表示按模型自动选择
+ws_chunk_seconds = 0
+
+# 流式识别会话（仅在使用流式模型时启用，按记录ID保存模型缓存）
+streaming_sessions = StreamingSessionManager()
+
+# 识别结果缓存：重复提交的相同音频直接返回结果，None 表示不缓存
+result_cache = ResultCache()
+
+# 一次性模型的实时分片拼接（相邻分片重叠一段音频，按时间戳合并），None 表示直接拼接
+chunk_stitchers = StreamingSessionManager(
+    session_class=ChunkStitcher, overlap_seconds=DEFAULT_OVERLAP_SECONDS
+)
+
+# 进行中的实时录音会话（记录ID由 /api/session/open 分配），空闲超时后写入数据库
+realtime_sessions = SessionRegistry(
+    on_evict=lambda session: flush_realtime_session(session)
+)
+
+# 实时分片队列：同一记录的分片按顺序识别，积压时合并为一次推理，None 表示不排队
+chunk_queue_totals = ChunkQueueTotals()
+chunk_queues = StreamingSessionManager(
+    session_class=ChunkQueue, totals=chunk_queue_totals
+)
+
+# 实时分片的增量解码器（按记录ID保存，webm 文件头每个会话只解析一次）
+stream_decoders = StreamingSessionManager(session_class=StreamDecoder)
+
+# 两遍识别：录音结束后用离线模型重新识别整段音频（通过 --final-model 启用），
+# 离线模型作为常驻模型由 model_manager 管理
+final_model_params = {}
+final_model_error = None
+# 第二遍识别的后台执行器，None 表示不启用两遍识别
+final_pass_runner = None
+
+# 静音门限：实时分片在送入模型之前先判断是否有语音，None 表示不过滤
+silence_gate = SilenceGate()
+
+# 请求可以通过 model 参数指定的模型（与前端设置中可选的模型一致），
+# 指定其他模型会在请求线程中下载并加载，不能由客户端任意指定
+DEFAULT_ROUTABLE_MODELS = (
+    "iic/SenseVoiceSmall",
+    "paraformer-zh",
+    "paraformer-zh-streaming",
+    "paraformer-en",
+)
+routable_models = set(DEFAULT_ROUTABLE_MODELS)
+
 # 模型参数
 model_params = {
     "model": "paraformer-zh-streaming",
@@ -61,9 +238,10 @@ model_params = {
     "punc_model": "ct-punc",
     "spk_model": "cam++",
     "disable_update": True,
-    "device": "cuda",  # 使用 CUDA 或 CPU
+    "device": DEVICE_AUTO,  # 使用 CUDA 或 CPU，auto 表示自动检测
     "ngpu": 0,  # GPU 设备 ID，0 表示使用第一个 GPU
     "hotwords": "",  # 热词，提高特定词汇的识别准确率
+    "backend": BACKEND_TORCH,  # 推理后端：torch、torch-int8 或 onnx
 }
 
 # 根据操作系统加载不同的文本插入模块
@@ -81,90 +259,992 @@ else:
 # 初始化文本插入器
 text_inserter = TextInserter()
 
-# 预加载 FunASR 模块，避免在线程中首次导入
-try:
-    import torch
-    import torchaudio
 
-    logger.info("torch 版本: %s", torch.__version__)
-    logger.info("torchaudio 版本: %s", torchaudio.__version__)
-    import funasr
+def preload_funasr():
+    """预加载 FunASR 模块，避免在线程中首次导入
 
-    logger.info("FunASR 模块已导入")
-except ImportError as e:
-    logger.error(f"导入 FunASR 模块失败: {e}")
-    model_load_error = str(e)
+    模型在模型守护进程中加载时服务进程不需要 FunASR，不调用本函数，重启更快。
+    """
+    try:
+        import torch
+        import torchaudio
 
+        logger.info("torch 版本: %s", torch.__version__)
+        logger.info("torchaudio 版本: %s", torchaudio.__version__)
+        import funasr
 
-# 延迟加载 FunASR 模型，因为它可能比较大
-def load_asr_model():
-    global asr_model, model_loading, model_load_error, model_params
+        logger.info("FunASR 模块已导入")
+    except ImportError as e:
+        logger.error(f"导入 FunASR 模块失败: {e}")
+        model_manager.load_error = str(e)
+
+
+# 加载 FunASR 模型，启动时在后台线程中执行，依次经过导入、下载校验、构建和预热阶段
+def load_asr_model(new_params=None):
+    """加载模型，完成后替换当前模型；加载期间旧模型继续提供服务
+
+    调用前需要通过 model_manager.begin_load() 占用加载状态。
+
+    Args:
+        new_params: 需要覆盖的模型参数（例如新的热词或模型ID）
+
+    Returns:
+        bool: 是否加载成功
+    """
+    global autotune_pending
+    if autotune_pending:
+        # 首次启动时在后台加载线程中校准，服务仍可以响应状态查询
+        autotune_pending = False
+        ensure_autotuned(new_params)
+    params = dict(model_params)
+    if new_params:
+        params.update(new_params)
+
+    if asr_workers == 0 and torch_threads:
+        apply_torch_threads(torch_threads, interop_threads=1)
+    success = model_manager.load(
+        params,
+        num_workers=asr_workers,
+        worker_timeout=asr_worker_timeout,
+        num_threads=torch_threads or None,
+    )
+    if success:
+        model_params.update(params)
+        # 每个工作进程对应一个调度线程，批次可以并行执行；进程内模型同一时间
+        # 只能执行一个批次，只用一个调度线程
+        inference_scheduler.set_num_workers(asr_workers)
+        if final_pass_runner is not None and not model_manager.is_resident(
+            final_model_params
+        ):
+            # 实时模型可用之后再加载第二遍识别的模型，避免同时加载占用过多内存
+            start_final_model_loading()
+    return success
 
-    if model_loading:
-        logger.info("模型已经在加载中...")
+
+def ensure_autotuned(new_params=None, calibrate=True):
+    """应用适用于当前机器和模型的校准结果，没有时先校准（首次启动）
+
+    Args:
+        new_params: 即将加载的模型参数中需要覆盖的部分
+        calibrate: 没有适用的校准结果时是否执行校准
+
+    Returns:
+        bool: 是否应用了校准结果
+    """
+    if autotuner is None or not autotune_targets:
+        return False
+    params = dict(model_params, **(new_params or {}))
+    config = autotuner.load()
+    if not autotuner.is_valid(config, params):
+        if not calibrate:
+            return False
+        try:
+            config = autotuner.run(params)
+        except Exception as e:
+            logger.error(f"校准设备和线程数失败，使用默认设置: {e}")
+            return False
+    if not config:
+        return False
+    apply_autotune_config(config)
+    return True
+
+
+def apply_autotune_config(config):
+    """应用校准结果中命令行没有显式指定的设置"""
+    global asr_workers, torch_threads
+    if "device" in autotune_targets:
+        model_params["device"] = config["device"]
+    if "asr_workers" in autotune_targets:
+        asr_workers = config["asr_workers"]
+    if "torch_threads" in autotune_targets:
+        torch_threads = config["torch_threads"]
+    if job_manager is not None and job_window_auto:
+        # 工作进程数变化后，文件转写每段的时长随之调整
+        job_manager.window_seconds = DEFAULT_WINDOW_SECONDS * max(1, asr_workers)
+
+
+def start_autotune():
+    """在后台线程中重新校准，完成后按新的配置重新加载模型
+
+    Returns:
+        threading.Thread: 校准线程，已经在校准中时返回 None
+    """
+    if autotuner.running:
+        return None
+    thread = threading.Thread(target=rerun_autotune, name="autotune", daemon=True)
+    thread.start()
+    return thread
+
+
+def rerun_autotune():
+    """重新校准设备和线程数（校准期间临时创建一个模型，服务继续处理请求）"""
+    try:
+        config = autotuner.run(model_params)
+    except Exception as e:
+        logger.error(f"校准设备和线程数失败: {e}")
+        return
+    if config is None:
         return
+    apply_autotune_config(config)
+    # 新的设备、线程数和工作进程数在重新加载模型后生效
+    loader = start_model_loading()
+    if loader is None:
+        logger.info("模型正在加载中，新的校准结果在下次加载模型时生效")
+    else:
+        loader.join()
+
 
-    model_loading = True
-    model_load_error = None
+def start_final_model_loading():
+    """在后台线程中加载第二遍识别使用的离线模型
+
+    Returns:
+        threading.Thread: 加载线程，未启用两遍识别或已经在加载中时返回 None
+    """
+    if final_pass_runner is None or model_manager.is_loading_resident(
+        final_model_params
+    ):
+        return None
+
+    thread = threading.Thread(
+        target=load_final_model, name="final-model-loader", daemon=True
+    )
+    thread.start()
+    return thread
 
+
+def load_final_model():
+    """加载第二遍识别使用的离线模型"""
+    global final_model_error
     try:
-        import funasr
+        model_manager.ensure_loaded(final_model_params)
+        final_model_error = None
+    except Exception as e:
+        logger.error(f"加载第二遍识别模型失败: {e}")
+        final_model_error = str(e)
+
+
+def recognize_final_pass(samples):
+    """用离线模型识别整段录音（第二遍识别，在后台线程中执行）
+
+    Returns:
+        识别文本
+    """
+    with model_manager.use(final_model_params) as entry, entry.exclusive():
+        result = entry.model.generate(
+            input=samples,
+            language="auto",
+            use_itn=True,
+            hotword=final_model_params.get("hotwords", ""),
+        )
+    text = result[0]["text"] if result else ""
+    if final_model_params["model"] == "iic/SenseVoiceSmall":
+        text = format_str_v2(text)
+    return text
+
+
+def apply_final_pass(record_id, text):
+    """第二遍识别完成后更新记录文本（没有识别出文本时保留第一遍的结果）"""
+    if text:
+        db_manager.update_record_text(record_id, text)
+        logger.info(f"记录 {record_id} 已更新为第二遍识别的文本")
+
+
+def start_model_loading(new_params=None):
+    """在后台线程中加载模型
+
+    Returns:
+        threading.Thread: 加载线程，已经在加载中时返回 None
+    """
+    if not model_manager.begin_load():
+        logger.info("模型已经在加载中...")
+        return None
+
+    thread = threading.Thread(
+        target=load_asr_model, args=(new_params,), name="asr-model-loader", daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def model_unavailable_response():
+    """模型不可用时返回错误响应，可用时返回 None"""
+    if model_manager.is_loaded():
+        return None
+    if model_manager.loading:
+        return jsonify({"error": "模型正在加载中，请稍后再试"}), 503
+    if model_manager.load_error:
+        return jsonify({"error": f"模型加载失败: {model_manager.load_error}"}), 500
+    # 尝试加载模型
+    start_model_loading()
+    return jsonify({"error": "模型尚未加载，已启动加载过程，请稍后再试"}), 503
+
+
+def use_streaming_session():
+    """当前模型是否使用带缓存的流式识别会话"""
+    return is_streaming_model(model_params["model"])
+
+
+def run_asr_batch(inputs, kwargs):
+    """调度器使用的批量推理函数
+
+    Args:
+        inputs: 音频采样数组列表
+        kwargs: generate 参数
+
+    Returns:
+        与 inputs 一一对应的识别结果列表
+    """
+    kwargs = dict(kwargs)
+    # 请求指定的其他模型（参数不同的请求不会被合并到同一批）
+    routed_params = routed_model_params(kwargs.pop("asr_model", None))
+    # 请求线程中的 routed_generate_kwargs 已经计入命中或加载
+    with model_manager.use(routed_params, count_hit=False) as entry, entry.exclusive():
+        started = time.perf_counter()
+        if len(inputs) == 1:
+            result = entry.model.generate(input=inputs[0], **kwargs)
+        else:
+            batch_kwargs = dict(kwargs)
+            # 带 VAD 时由 FunASR 按 batch_size_s 对切分后的片段组批，VAD 模型本身不支持批量
+            if not entry.model_params["vad_model"]:
+                batch_kwargs["batch_size"] = len(inputs)
+            result = entry.model.generate(input=list(inputs), **batch_kwargs)
+        backend_stats.record(
+            model_backend(entry.model, entry.model_params),
+            time.perf_counter() - started,
+            sum(len(samples) for samples in inputs) / SAMPLE_RATE,
+        )
+        return result
+
+
+# 按推理后端统计的延迟和实时率，在 /api/status 中返回
+backend_stats = BackendStats()
+
+# 推理调度器：合并并发请求，并保证模型只在调度线程中被调用
+inference_scheduler = InferenceScheduler(run_asr_batch)
+
+
+def offline_generate_kwargs(model_name=None):
+    """一次性识别时的额外参数
+
+    AutoModel 会把调用参数合并进模型自身的配置，流式会话留下的 cache 和
+    is_final 会影响后续调用，因此流式模型的一次性识别需要显式重置。
+
+    Args:
+        model_name: 请求指定的模型，None 表示当前模型
+    """
+    if is_streaming_model(model_name or model_params["model"]):
+        return {"cache": {}, "is_final": True}
+    return {}
+
 
-        logger.info("正在加载 FunASR 模型...")
-        logger.info(f"模型参数: {model_params}")
+def routable_model_error(model_name):
+    """检查请求指定的模型是否允许使用
 
-        # 准备模型参数
-        model_kwargs = {}
+    Returns:
+        不允许时的错误信息，允许（或没有指定）时返回 None
+    """
+    if not model_name or model_name == model_params["model"]:
+        return None
+    if model_name not in routable_models:
+        return f"不支持的模型: {model_name}，可选: {', '.join(sorted(routable_models))}"
+    return None
 
-        # 添加模型名称
-        model_kwargs["model"] = model_params["model"]
 
-        # 添加VAD模型（如果有）
-        if model_params["vad_model"]:
-            model_kwargs["vad_model"] = model_params["vad_model"]
+def routed_model_params(model_name):
+    """请求指定的模型对应的模型参数
 
-        # 添加标点模型（如果有）
-        if model_params["punc_model"]:
-            model_kwargs["punc_model"] = model_params["punc_model"]
+    除模型名称外沿用当前的 VAD、标点、设备和热词设置。
 
-        # 添加说话人分割模型（如果有）
-        if model_params["spk_model"]:
-            model_kwargs["spk_model"] = model_params["spk_model"]
+    Returns:
+        模型参数字典；没有指定或与当前模型相同时返回 None
 
-        # 设置是否禁用自动更新
-        model_kwargs["disable_update"] = model_params["disable_update"]
+    Raises:
+        ValueError: 指定的模型不在 --routable-models 中
+    """
+    error = routable_model_error(model_name)
+    if error:
+        raise ValueError(error)
+    if not model_name or model_name == model_params["model"]:
+        return None
+    return dict(model_params, model=model_name)
 
-        # 设置设备类型（CUDA 或 CPU）
-        model_kwargs["device"] = model_params["device"]
 
-        # 设置 GPU 设备 ID
-        model_kwargs["ngpu"] = model_params["ngpu"]
+def routed_generate_kwargs(model_name):
+    """使用请求指定的模型识别时传给调度器的额外参数
 
-        # 设置热词
-        if model_params["hotwords"]:
-            model_kwargs["hotwords"] = model_params["hotwords"]
+    指定的模型不在内存中时先在请求线程中加载，调度线程不会因为加载模型而
+    阻塞其他请求；已经常驻的模型直接使用。
+
+    Returns:
+        dict: 额外参数，没有指定其他模型时为空
+    """
+    routed_params = routed_model_params(model_name)
+    if routed_params is None:
+        return {}
+    with timed_stage("model_load"):
+        model_manager.ensure_loaded(routed_params)
+    return {"asr_model": model_name}
+
+
+def submit_recognition(samples, **kwargs):
+    """提交一次性识别请求，相同音频和参数的结果直接从缓存返回
+
+    Args:
+        samples: 解码后的音频采样
+        **kwargs: 传给 generate 的参数
+
+    Returns:
+        识别结果字典
+    """
+    if result_cache is None:
+        with timed_stage("inference"):
+            return inference_scheduler.submit(samples, **kwargs)
+
+    with timed_stage("cache_lookup"):
+        cache_key = make_cache_key(
+            samples, model_manager.model_params or model_params, kwargs
+        )
+        result = result_cache.get(cache_key)
+    if result is not None:
+        return result
+
+    with timed_stage("inference"):
+        result = inference_scheduler.submit(samples, **kwargs)
+    result_cache.put(cache_key, result)
+    return result
+
+
+def run_scheduled_stage(stage, input, **kwargs):
+    """在调度线程中单独执行 VAD、识别或标点阶段
+
+    使用工作进程池时调度线程数等于工作进程数，多个阶段可以同时执行；
+    在服务进程中加载模型时依次执行。
+    """
+
+    def call():
+        with model_manager.use() as entry, entry.exclusive():
+            if hasattr(entry.model, "run_stage"):
+                return entry.model.run_stage(stage, input, **kwargs)
+            return run_model_stage(entry.model, stage, input, **kwargs)
+
+    with timed_stage("inference" if stage == "asr" else stage):
+        return inference_scheduler.run_exclusive(call)
+
+
+def use_long_audio(samples):
+    """是否对这段音频使用 VAD 分段并行识别"""
+    return (
+        long_audio_seconds > 0
+        and len(samples) >= long_audio_seconds * SAMPLE_RATE
+        and bool(model_params["vad_model"])
+        and not use_streaming_session()
+    )
+
+
+def recognize_long_audio(samples, **kwargs):
+    """长音频模式识别，相同音频和参数的结果直接从缓存返回
+
+    Args:
+        samples: 解码后的音频采样
+        **kwargs: 识别参数
+
+    Returns:
+        识别结果字典（text、segments、timestamp）
+    """
+    cache_key = None
+    if result_cache is not None:
+        with timed_stage("cache_lookup"):
+            cache_key = make_cache_key(
+                samples,
+                model_manager.model_params or model_params,
+                dict(kwargs, mode="long_audio"),
+            )
+            result = result_cache.get(cache_key)
+        if result is not None:
+            return result
+
+    transcriber = LongAudioTranscriber(
+        run_scheduled_stage,
+        parallelism=max(1, asr_workers),
+        postprocess=(
+            format_str_v2 if model_params["model"] == "iic/SenseVoiceSmall" else None
+        ),
+    )
+    result = transcriber.transcribe(samples, **kwargs)
+    if cache_key is not None:
+        result_cache.put(cache_key, result)
+    return result
+
+
+def recognize_samples(samples, language="auto", model=None):
+    """通过推理调度器一次性识别一段音频
+
+    Args:
+        samples: 音频采样
+        language: 识别语言
+        model: 使用的模型，None 表示当前模型
+
+    Returns:
+        (识别文本, 每个词的 [开始, 结束] 毫秒时间戳，模型不输出时为 None)
+    """
+    routed_kwargs = routed_generate_kwargs(model)
+    if not routed_kwargs and use_long_audio(samples):
+        result = recognize_long_audio(
+            samples, language=language, use_itn=True, hotword=model_params["hotwords"]
+        )
+        return result["text"], result["timestamp"]
+
+    result = submit_recognition(
+        samples,
+        language=language,
+        use_itn=True,
+        hotword=model_params["hotwords"],
+        **offline_generate_kwargs(model),
+        **routed_kwargs,
+    )
+
+    if (model or model_params["model"]) == "iic/SenseVoiceSmall":
+        with timed_stage("postprocess"):
+            text = format_str_v2(result["text"])
+    else:
+        text = result["text"]
+    return text, result.get("timestamp")
+
+
+def recognize_job_window(samples, options):
+    """文件转写任务使用的识别函数"""
+    return recognize_samples(
+        samples,
+        language=options.get("language") or "auto",
+        model=options.get("model"),
+    )
 
-        logger.info(f"最终模型参数: {model_kwargs}")
 
-        # 创建模型
-        asr_model = funasr.AutoModel(**model_kwargs)
+def run_session_step(session, samples, is_final=False):
+    """在调度线程中为流式会话执行一步推理
 
-        logger.info("FunASR 模型加载完成")
-        model_loading = False
-        return True
+    模型在会话进行中被替换时，旧模型的缓存不能用于新模型，需要重置。
+
+    Returns:
+        部分识别文本列表
+    """
+
+    def step():
+        with model_manager.use() as entry, entry.exclusive():
+            if session.model_generation != entry.generation:
+                session.reset_cache(entry.generation)
+            started = time.perf_counter()
+            partials = session.feed(entry.model, samples, is_final=is_final)
+            backend_stats.record(
+                model_backend(entry.model, entry.model_params),
+                time.perf_counter() - started,
+                len(samples) / SAMPLE_RATE if samples is not None else 0.0,
+            )
+            return partials
+
+    with timed_stage("inference"):
+        return inference_scheduler.run_exclusive(step)
+
+
+def recognize_stream_chunk(
+    record_id, samples, is_last_chunk=False, auto_insert=False, strip_header=True
+):
+    """识别实时录音的一个分片（HTTP 分片和 WebSocket 共用）
+
+    Args:
+        record_id: 记录ID，为 None 时不保留会话状态
+        samples: 解码后的音频采样
+        is_last_chunk: 是否为最后一个分片
+        auto_insert: 是否自动插入识别结果（会话结束时冲刷的文本使用）
+        strip_header: 分片开头是否带有重复的 webm 文件头音频
+
+    Returns:
+        (本分片新确认的文本, 部分识别结果列表, 是否因静音被跳过)
+    """
+    started = time.perf_counter()
+    realtime_session = realtime_sessions.get(record_id)
+    if realtime_session is not None:
+        # 两遍识别时保留整段录音，结束后交给离线模型
+        realtime_session.add_audio(samples, strip_header=strip_header)
+    skipped = False
+    if use_streaming_session() and record_id is not None:
+        # 流式模型：保留会话缓存，只送入新增音频，按 600ms 子块返回结果
+        session = streaming_sessions.get_or_create(record_id)
+        with session.lock:
+            session.auto_insert = auto_insert
+            new_samples = (
+                session.strip_repeated_header(samples) if strip_header else samples
+            )
+            if silence_gate and not silence_gate.check(
+                record_id, new_samples, strip_header=False
+            ):
+                # 静音分片不送入模型；最后一个分片仍需冲刷缓存
+                skipped = True
+                new_samples = None
+            if skipped and not is_last_chunk:
+                partials = []
+            else:
+                partials = run_session_step(
+                    session, new_samples, is_final=is_last_chunk
+                )
+        if is_last_chunk:
+            streaming_sessions.pop(record_id)
+        recognized_text = "".join(partials)
+    elif chunk_stitchers is not None and record_id is not None:
+        # 一次性模型：与上一个分片重叠一段音频，按时间戳合并边界处的结果
+        stitcher = chunk_stitchers.get_or_create(record_id, strip_header=strip_header)
+        with stitcher.lock:
+            stitcher.auto_insert = auto_insert
+            audio = stitcher.prepare(samples)
+            if silence_gate and not silence_gate.check(
+                record_id, audio, strip_header=False
+            ):
+                # 静音分片不送入模型，上一个分片未确认的结尾直接输出
+                skipped = True
+                recognized_text = stitcher.finish()
+            else:
+                text, timestamps = recognize_samples(audio)
+                recognized_text = stitcher.merge(text, timestamps)
+            if is_last_chunk:
+                recognized_text += stitcher.finish()
+        if is_last_chunk:
+            chunk_stitchers.pop(record_id)
+        partials = [recognized_text] if recognized_text else []
+    elif silence_gate and not silence_gate.check(
+        record_id, samples, strip_header=strip_header
+    ):
+        skipped = True
+        partials = []
+        recognized_text = ""
+    else:
+        recognized_text, _ = recognize_samples(samples)
+        partials = [recognized_text] if recognized_text else []
+
+    if realtime_session is not None:
+        realtime_session.add_timing(
+            len(samples) / SAMPLE_RATE if samples is not None else 0.0,
+            time.perf_counter() - started,
+        )
+    return recognized_text, partials, skipped
+
+
+def open_realtime_session(auto_insert=False, incremental=False):
+    """开始一次实时录音：创建主记录并登记会话
+
+    Returns:
+        RealtimeSession
+    """
+    with timed_stage("db"):
+        record_id = db_manager.add_record(text="", mode="realtime", is_chunked=True)
+    if record_id is None:
+        raise RuntimeError("创建实时录音记录失败")
+    return realtime_sessions.open(
+        record_id,
+        auto_insert=auto_insert,
+        incremental=incremental,
+        max_audio_seconds=DEFAULT_MAX_AUDIO_SECONDS if final_pass_runner else 0,
+    )
+
+
+def save_stream_chunk(record_id, chunk_index, text, audio_path=None):
+    """保存实时录音一个分片的识别结果
+
+    通过 /api/session/open 开始的录音先记在会话中，结束时一次写入数据库；
+    其他录音（旧版客户端）直接写入数据库。
+    """
+    session = realtime_sessions.get(record_id)
+    if session is not None:
+        session.add_chunk(chunk_index, text, audio_path)
+        return
+    with timed_stage("db"):
+        db_manager.add_chunk(
+            record_id=record_id,
+            chunk_index=chunk_index,
+            text=text,
+            audio_path=audio_path,
+        )
+
+
+def punctuate_stream_text(text):
+    """给流式识别的完整文本加标点
+
+    流式模型逐块调用 inference，不经过标点模型，推送的部分结果没有标点；
+    录音结束后对完整文本执行一次标点阶段，保存到主记录中。
+
+    Returns:
+        加标点后的文本，没有配置标点模型或加标点失败时返回原文本
+    """
+    if not text or not use_streaming_session() or not model_params["punc_model"]:
+        return text
+    try:
+        result = run_scheduled_stage(STAGE_PUNC, text)
     except Exception as e:
-        logger.error(f"加载 FunASR 模型失败: {e}")
-        model_load_error = str(e)
-        model_loading = False
-        return False
+        logger.warning(f"流式识别文本加标点失败: {e}")
+        return text
+    return result[0].get("text", text) if result else text
+
+
+def flush_realtime_session(session):
+    """把会话中的分片和完整文本一次写入数据库
+
+    Returns:
+        完整文本
+    """
+    with session.lock:
+        if not session.finalized:
+            chunks = sorted(
+                session.chunks, key=lambda chunk: -1 if chunk[0] is None else chunk[0]
+            )
+            audio_path = next((path for _, _, path in chunks if path), None)
+            session.final_text = punctuate_stream_text(session.text)
+            with timed_stage("db"):
+                db_manager.save_record_chunks(
+                    session.record_id, chunks, session.text, audio_path
+                )
+            session.finalized = True
+            logger.info(
+                f"实时录音 {session.record_id} 结束: {len(chunks)} 个分片，"
+                f"音频 {session.audio_seconds:.1f}s，推理 {session.inference_seconds:.2f}s"
+            )
+            if final_pass_runner is not None and session.audio_parts:
+                final_pass_runner.submit(
+                    session.record_id, session.audio_parts, session.text
+                )
+                session.audio_parts = None
+        return session.text
+
+
+def finalize_stream_record(record_id, update_audio_path=False):
+    """用所有分片的文本更新主记录
+
+    Args:
+        record_id: 记录ID
+        update_audio_path: 是否同时把主记录的音频设置为第一个分片的音频
+
+    Returns:
+        完整文本；没有登记会话且数据库中没有分片时返回 None
+    """
+    session = realtime_sessions.pop(record_id)
+    if session is not None:
+        return flush_realtime_session(session)
+
+    with timed_stage("db"):
+        chunks = db_manager.get_chunks_by_record_id(record_id)
+        if not chunks:
+            return None
+        full_text = "".join(chunk["text"] for chunk in chunks)
+    full_text = punctuate_stream_text(full_text)
+    with timed_stage("db"):
+        db_manager.update_record_text(
+            record_id,
+            full_text,
+            chunks[0]["audio_path"] if update_audio_path else None,
+        )
+    return full_text
+
+
+def finish_streaming_session(record_id, chunk_index):
+    """结束流式会话，冲刷解码器缓存中剩余的识别结果
+
+    Returns:
+        剩余的识别文本
+    """
+    session = streaming_sessions.pop(record_id)
+    if session is None or session.is_finished:
+        return ""
+
+    with session.lock:
+        tail_text = "".join(run_session_step(session, None, is_final=True))
+
+    if tail_text:
+        if session.auto_insert:
+            with timed_stage("insert_text"):
+                text_inserter.insert_text(tail_text)
+        save_stream_chunk(record_id, chunk_index, tail_text)
+        logger.info(f"流式会话 {record_id} 结束，剩余文本: {tail_text}")
+    return tail_text
+
+
+def finish_chunk_stitcher(record_id, chunk_index):
+    """结束分片拼接，输出最后一个分片分界线之后的文本
+
+    Returns:
+        剩余的识别文本
+    """
+    stitcher = chunk_stitchers.pop(record_id) if chunk_stitchers else None
+    if stitcher is None:
+        return ""
+
+    with stitcher.lock:
+        tail_text = stitcher.finish()
+
+    if tail_text:
+        if stitcher.auto_insert:
+            with timed_stage("insert_text"):
+                text_inserter.insert_text(tail_text)
+        save_stream_chunk(record_id, chunk_index, tail_text)
+        logger.info(f"分片拼接 {record_id} 结束，剩余文本: {tail_text}")
+    return tail_text
+
+
+def open_ws_session(options):
+    """开始一次 WebSocket 录音，创建实时录音记录
+
+    Returns:
+        会话状态字典
+    """
+    if not model_manager.is_loaded():
+        raise RuntimeError(model_manager.load_error or "模型尚未加载，请稍后再试")
+    auto_insert = bool(options.get("auto_insert", False))
+    record_id = open_realtime_session(auto_insert=auto_insert).record_id
+    logger.info(f"WebSocket 录音开始，记录ID: {record_id}")
+    return {
+        "record_id": record_id,
+        "chunk_index": 0,
+        "auto_insert": auto_insert,
+    }
+
+
+def feed_ws_session(state, samples, is_final):
+    """识别 WebSocket 录音的一个分片并保存结果
+
+    PCM 音频没有 webm 文件头，不需要去掉重复的开头。
+
+    Returns:
+        识别出的文本列表
+    """
+    record_id = state["record_id"]
+    if samples is None:
+        # 没有剩余音频，只冲刷会话中尚未输出的结果（内部已保存分片）
+        if use_streaming_session():
+            tail_text = finish_streaming_session(record_id, state["chunk_index"])
+        else:
+            tail_text = finish_chunk_stitcher(record_id, state["chunk_index"])
+        if tail_text:
+            state["chunk_index"] += 1
+            return [tail_text]
+        return []
+
+    recognized_text, partials, _ = recognize_stream_chunk(
+        record_id,
+        samples,
+        is_last_chunk=is_final,
+        auto_insert=state["auto_insert"],
+        strip_header=False,
+    )
+    if not recognized_text:
+        return []
+
+    if state["auto_insert"]:
+        with timed_stage("insert_text"):
+            text_inserter.insert_text(recognized_text)
+
+    audio_path = None
+    if save_realtime_audio:
+        with timed_stage("audio_save"):
+            audio_path = audio_storage.save_samples_async(
+                samples, mode="realtime", chunk_index=state["chunk_index"]
+            )
+    save_stream_chunk(record_id, state["chunk_index"], recognized_text, audio_path)
+    state["chunk_index"] += 1
+    return partials
+
+
+def close_ws_session(state):
+    """结束 WebSocket 录音，更新主记录的完整文本
+
+    Returns:
+        完整的识别文本
+    """
+    record_id = state["record_id"]
+    if silence_gate:
+        silence_gate.pop_session(record_id)
+    full_text = finalize_stream_record(record_id, update_audio_path=True) or ""
+    logger.info(f"WebSocket 录音结束，记录ID: {record_id}")
+    return full_text
+
+
+def ws_chunk_samples():
+    """WebSocket 每个分片的采样点数
+
+    流式模型按 600ms 子块推理，攒够一个子块就送入；一次性模型每次都要
+    重新识别重叠部分，分片过短时开销较大，默认 1 秒。
+    """
+    if ws_chunk_seconds > 0:
+        seconds = ws_chunk_seconds
+    else:
+        seconds = 0.6 if use_streaming_session() else 1.0
+    return int(seconds * SAMPLE_RATE)
+
+
+def _load_stage_durations():
+    stages = model_manager.progress.snapshot()["stages"]
+    return [((("stage", stage["name"]),), stage["duration"]) for stage in stages]
+
+
+def _worker_states():
+    pool = model_manager.model
+    if not isinstance(pool, ASRWorkerPool):
+        return []
+    return [
+        (
+            (("worker", str(worker["worker_id"])),),
+            2 if worker["busy"] else 1 if worker["alive"] and worker["ready"] else 0,
+        )
+        for worker in pool.get_status()
+    ]
+
+
+# 注册调度器、模型和各模块的指标（导出时取值，全局对象被替换后仍然有效）
+metrics.register_histogram(
+    "asr_scheduler_latency_seconds",
+    "推理请求从入队到得到结果的耗时",
+    lambda: inference_scheduler.latency_histogram,
+)
+metrics.register_histogram(
+    "asr_scheduler_queue_wait_seconds",
+    "推理请求在调度队列中的等待时间",
+    lambda: inference_scheduler.queue_wait_histogram,
+)
+metrics.register_histogram(
+    "asr_scheduler_batch_size",
+    "每次模型调用合并的请求数",
+    lambda: inference_scheduler.batch_size_histogram,
+)
+metrics.register_histogram(
+    "asr_audio_write_seconds",
+    "后台写入音频文件的耗时",
+    lambda: audio_storage.write_histogram if audio_storage else None,
+)
+metrics.gauge(
+    "asr_scheduler_queue_depth",
+    "调度队列中等待的请求数",
+    inference_scheduler.queue_depth,
+)
+metrics.counter_func(
+    "asr_scheduler_requests_total",
+    "调度器累计处理的请求数",
+    lambda: inference_scheduler.total_requests,
+)
+metrics.counter_func(
+    "asr_scheduler_errors_total",
+    "调度器累计失败的请求数",
+    lambda: inference_scheduler.total_errors,
+)
+metrics.gauge(
+    "asr_http_inflight_requests",
+    "正在处理的 HTTP 请求数",
+    lambda: request_tracker.inflight,
+)
+metrics.gauge("asr_model_loaded", "是否有可用的模型", model_manager.is_loaded)
+metrics.gauge("asr_model_loading", "是否正在加载模型", lambda: model_manager.loading)
+metrics.gauge(
+    "asr_model_info",
+    "当前模型（值恒为 1）",
+    lambda: [((("model", current_model_name()),), 1)],
+)
+metrics.gauge(
+    "asr_model_load_stage_seconds",
+    "最近一次模型加载各阶段的耗时",
+    _load_stage_durations,
+)
+metrics.gauge(
+    "asr_worker_state", "ASR 工作进程状态（0 不可用，1 空闲，2 忙碌）", _worker_states
+)
+metrics.gauge(
+    "asr_streaming_sessions", "进行中的流式识别会话数", streaming_sessions.count
+)
+metrics.gauge(
+    "asr_stitching_sessions",
+    "进行中的分片拼接会话数",
+    lambda: chunk_stitchers.count() if chunk_stitchers else 0,
+)
+metrics.gauge(
+    "asr_stream_lag_seconds",
+    "实时识别会话的积压秒数（最早一个未识别完的分片已经等待的时间）",
+    lambda: (
+        [
+            ((("record_id", str(record_id)),), queue.lag_seconds())
+            for record_id, queue in chunk_queues.items()
+        ]
+        if chunk_queues
+        else None
+    ),
+)
+metrics.counter_func(
+    "asr_stream_coalesced_chunks_total",
+    "积压时并入后续分片一起识别的实时分片数",
+    lambda: chunk_queue_totals.coalesced if chunk_queues else None,
+)
+metrics.counter_func(
+    "asr_stream_dropped_chunks_total",
+    "积压过多被丢弃的实时分片数",
+    lambda: chunk_queue_totals.dropped if chunk_queues else None,
+)
+metrics.gauge("asr_resident_models", "常驻内存的模型数", model_manager.resident_count)
+metrics.gauge(
+    "asr_resident_model_bytes",
+    "常驻模型加载时测得的内存之和",
+    model_manager.resident_memory_bytes,
+)
+metrics.counter_func(
+    "asr_resident_model_hits_total",
+    "请求指定的模型已常驻内存的次数",
+    lambda: model_manager.hits,
+)
+metrics.counter_func(
+    "asr_resident_model_loads_total",
+    "按请求加载常驻模型的次数",
+    lambda: model_manager.loads,
+)
+metrics.counter_func(
+    "asr_resident_model_evictions_total",
+    "超出内存预算被淘汰的常驻模型数",
+    lambda: model_manager.evictions,
+)
+metrics.gauge(
+    "asr_realtime_sessions", "进行中的实时录音会话数", realtime_sessions.count
+)
+metrics.gauge("asr_stream_decoders", "进行中的增量解码会话数", stream_decoders.count)
+metrics.gauge(
+    "asr_websocket_connections",
+    "当前的 WebSocket 流式识别连接数",
+    lambda: stream_socket_server.connections if stream_socket_server else None,
+)
+metrics.counter_func(
+    "asr_silence_skipped_chunks_total",
+    "静音门限累计跳过的分片数",
+    lambda: silence_gate.total_skipped if silence_gate else None,
+)
+metrics.counter_func(
+    "asr_result_cache_hits_total",
+    "识别结果缓存累计命中次数",
+    lambda: result_cache.hits if result_cache else None,
+)
+metrics.counter_func(
+    "asr_result_cache_misses_total",
+    "识别结果缓存累计未命中次数",
+    lambda: result_cache.misses if result_cache else None,
+)
 
 
 # 清理函数
 def cleanup():
-    global asr_model
     logger.info("执行清理操作...")
     # 在这里可以添加任何需要的清理代码
-    asr_model = None
+    if job_manager:
+        job_manager.stop()
+    if stream_socket_server:
+        stream_socket_server.stop()
+    # 进行中的录音把已识别的内容写入数据库
+    realtime_sessions.close_all()
+    if final_pass_runner:
+        final_pass_runner.shutdown()
+    stream_decoders.clear()
+    inference_scheduler.stop()
+    model_manager.unload()
+    if audio_storage:
+        audio_storage.close()
 
 
 # 注册清理函数
@@ -176,7 +1256,9 @@ def add_cors_headers(response):
     response.headers.add("Access-Control-Allow-Origin", "*")
     response.headers.add(
         "Access-Control-Allow-Headers",
-        "Content-Type, Authorization, X-Requested-With, Accept, Origin",
+        "Content-Type, Authorization, X-Requested-With, Accept, Origin, "
+        "X-Record-Id, X-Chunk-Index, X-Is-Last-Chunk, X-Auto-Insert, "
+        "X-Incremental",
     )
     response.headers.add(
         "Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS"
@@ -192,10 +1274,29 @@ def after_request(response):
 
 
 # 在应用启动时开始加载模型 - 使用请求处理器替代 before_first_request
+def inference_backend_status():
+    """推理后端的配置，以及各后端的推理延迟和常驻模型内存"""
+    backends = backend_stats.snapshot()
+    for model in model_manager.get_resident_status()["models"]:
+        backend = model["model_params"].get("backend") or BACKEND_TORCH
+        stats = backends.setdefault(backend, {})
+        stats["memory_bytes"] = stats.get("memory_bytes", 0) + model["memory_bytes"]
+    current = model_manager.model
+    return {
+        "backend": model_params["backend"],
+        "active": (
+            model_backend(current, model_manager.model_params)
+            if current is not None
+            else None
+        ),
+        "onnx_available": is_onnx_available(),
+        "backends": backends,
+    }
+
+
 @app.route("/api/status", methods=["GET"])
 def status():
     """检查服务状态和模型加载情况"""
-    global asr_model, model_loading, model_load_error
 
     # 如果模型未加载且未在加载中，启动加载
     # if asr_model is None and not model_loading and model_load_error is None:
@@ -209,20 +1310,50 @@ def status():
     except Exception as e:
         logger.error(f"获取已配置的LLM模型数量失败: {e}")
 
-    response = jsonify(
-        {
-            "status": "running",
-            "model_loaded": asr_model is not None,
-            "model_loading": model_loading,
-            "model_error": model_load_error,
-            "system": system,
-            "configured_llm_count": configured_models_count,
+    status_data = {
+        "status": "running",
+        "model_loaded": model_manager.is_loaded(),
+        "model_loading": model_manager.loading,
+        "model_error": model_manager.load_error,
+        "system": system,
+        "configured_llm_count": configured_models_count,
+    }
+    status_data["load_progress"] = model_manager.progress.snapshot()
+    status_data["incremental_decode"] = supports_stream_decoding()
+    if isinstance(model_manager.model, ASRWorkerPool):
+        status_data["asr_workers"] = model_manager.model.get_status()
+    if model_manager.daemon_socket:
+        status_data["model_daemon"] = ping_daemon(model_manager.daemon_socket)
+    status_data["inference_backend"] = inference_backend_status()
+    if autotuner is not None:
+        status_data["autotune"] = autotuner.status()
+    if stream_socket_server:
+        status_data["websocket_port"] = stream_socket_server.port
+    if final_pass_runner is not None:
+        status_data["final_model"] = {
+            "model": final_model_params["model"],
+            "loaded": model_manager.is_resident(final_model_params),
+            "loading": model_manager.is_loading_resident(final_model_params),
+            "error": final_model_error,
         }
-    )
+
+    response = jsonify(status_data)
 
     return response
 
 
+@app.route("/api/ready", methods=["GET"])
+def ready():
+    """就绪检查：模型加载并完成预热推理后才返回 200"""
+    progress = model_manager.progress.snapshot()
+    # 重新加载期间旧模型仍在服务，因此以当前模型为准；预热失败时不算就绪
+    is_ready = model_manager.is_loaded() and model_manager.is_warmed_up()
+    progress["ready"] = is_ready
+    progress["warmed_up"] = model_manager.is_warmed_up()
+    progress["model_error"] = model_manager.load_error
+    return jsonify(progress), 200 if is_ready else 503
+
+
 # 将 base64 编码的音频数据转换为临时 WAV 文件
 def base64_to_wav(base64_audio):
     """使用音频存储模块将base64编码的音频数据转换为临时WAV文件"""
@@ -230,166 +1361,590 @@ def base64_to_wav(base64_audio):
 
 
 # 实时语音识别
-@app.route("/api/recognize_stream", methods=["POST"])
-def recognize_stream():
-    """实时语音识别"""
-    global asr_model, model_loading, model_load_error
+# 实时分片请求体的读取缓冲区（每个请求线程复用一块）
+stream_body_buffer = BodyBuffer()
+
+
+def read_stream_request():
+    """读取实时分片请求的元数据和音频字节
+
+    支持三种格式：
+    - application/json: audio 字段为 base64 字符串（兼容旧版前端）
+    - multipart/form-data: audio 文件字段，元数据在表单、查询参数或请求头中
+    - 其他（application/octet-stream 等）: 请求体就是音频，元数据在查询参数
+      或 X-Record-Id/X-Chunk-Index/X-Is-Last-Chunk/X-Auto-Insert 请求头中
+
+    incremental 为真时分片是 MediaRecorder 依次产生的原始片段（只有第一个
+    片段带 webm 文件头），由会话的增量解码器解码。
+
+    Returns:
+        (元数据字典, 音频字节；没有音频时为 None)
+    """
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        params = {
+            "record_id": data.get("record_id", None),
+            "chunk_index": data.get("chunk_index", None),
+            "is_last_chunk": data.get("is_last_chunk", False),
+            "auto_insert": data.get("auto_insert", False),
+            "incremental": data.get("incremental", False),
+            "audio": data.get("audio"),
+        }
+        return params, None
+
+    if request.mimetype == "multipart/form-data":
+        params = read_stream_params(request.args, request.headers, request.form)
+        upload = request.files.get("audio")
+        if upload is None:
+            return params, None
+        # 上传文件由 werkzeug 保存在临时文件或内存中，读入线程复用的缓冲区；
+        # 不直接引用 BytesIO 的内部缓冲区，否则请求结束关闭文件时会报错
+        stream = upload.stream
+        stream.seek(0, os.SEEK_END)
+        length = stream.tell()
+        stream.seek(0)
+        return params, stream_body_buffer.read(stream, length) or None
+
+    params = read_stream_params(request.args, request.headers)
+    if request.content_length is None:
+        # 分块传输没有 Content-Length，只能整体读取
+        body = request.get_data()
+    else:
+        body = stream_body_buffer.read(request.stream, request.content_length)
+    return params, body or None
 
-    if asr_model is None:
-        if model_loading:
-            return jsonify({"error": "模型正在加载中，请稍后再试"}), 503
-        elif model_load_error:
-            return jsonify({"error": f"模型加载失败: {model_load_error}"}), 500
-        else:
-            # 尝试加载模型
-            if not model_loading and asr_model is None:
-                threading.Thread(target=load_asr_model).start()
-                return (
-                    jsonify({"error": "模型尚未加载，已启动加载过程，请稍后再试"}),
-                    503,
-                )
 
-    # 获取请求数据
-    data = request.json
+def decode_stream_fragment(record_id, chunk_index, data, is_last_chunk=False):
+    """用会话的增量解码器解码一个 MediaRecorder 片段
 
-    auto_insert = data.get("auto_insert", False)
-    chunk_index = data.get("chunk_index", None)  # 获取分片索引
-    record_id = data.get("record_id", None)  # 获取记录ID
-    is_last_chunk = data.get("is_last_chunk", False)  # 是否为最后一个分片
+    片段按分片索引的顺序写入解码器，提前到达的片段暂存到缺失的片段到达。
 
-    # 如果是最后一个分片标记请求（没有音频数据）
-    if is_last_chunk and ("audio" not in data or data["audio"] is None):
-        logger.info(
-            f"收到最后一个分片标记，记录ID: {record_id}, 分片索引: {chunk_index}"
-        )
+    Args:
+        record_id: 记录ID
+        chunk_index: 分片索引
+        data: 片段字节
+        is_last_chunk: 是否为最后一个片段，是则结束解码并释放解码器
 
-        if record_id:
-            try:
-                # 获取所有分片
-                chunks = db_manager.get_chunks_by_record_id(record_id)
-                if chunks:
-                    full_text = "".join([chunk["text"] for chunk in chunks])
-
-                    # 更新主记录
-                    conn = db_manager.get_connection()
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "UPDATE recognition_records SET text = ?, audio_path = ? WHERE id = ?",
-                        (
-                            full_text,
-                            chunks[0]["audio_path"] if chunks else None,
-                            record_id,
-                        ),
-                    )
-                    conn.commit()
-                    conn.close()
+    Returns:
+        新增的 16kHz 采样（片段提前到达时为空）
 
-                    logger.info(f"已更新记录 {record_id} 的完整文本")
-                    return jsonify({"success": True, "record_id": record_id})
-                else:
-                    logger.warning(f"记录 {record_id} 没有找到分片")
-                    return jsonify({"error": "没有找到分片记录"}), 400
-            except Exception as e:
-                logger.error(f"处理最后一个分片标记失败: {e}")
-                return jsonify({"error": f"处理最后一个分片标记失败: {str(e)}"}), 500
-        else:
-            return jsonify({"error": "没有提供记录ID"}), 400
+    Raises:
+        AudioDecodeError: 解码失败；解码器保持失败状态，会话之后的片段同样失败
+    """
+    decoder = stream_decoders.get_or_create(record_id)
+    try:
+        with decoder.lock:
+            samples = decoder.feed_fragment(chunk_index, data)
+            if is_last_chunk:
+                samples = np.concatenate([samples, decoder.finish()])
+    except AudioDecodeError:
+        # 之后的片段没有容器头，不能换一个新的解码器，结束解码进程但保留失败状态
+        decoder.close()
+        raise
+    finally:
+        if is_last_chunk:
+            stream_decoders.pop(record_id)
+    return samples
+
+
+def flush_stream_decoder(record_id):
+    """录音结束时读出增量解码器中剩余的音频并释放解码器
+
+    最后一个片段写入后，等待输出稳定的窗口之后才解码出的采样和仍在管道中
+    的数据留在 ffmpeg 中，关闭输入后才能全部读出。
+
+    Returns:
+        剩余的 16kHz 采样，没有增量解码器时为空数组
+    """
+    decoder = stream_decoders.pop(record_id)
+    if decoder is None:
+        return np.zeros(0, dtype=np.float32)
+    try:
+        with decoder.lock:
+            return decoder.finish()
+    except Exception as e:
+        logger.warning(f"读出增量解码器剩余的音频失败: {e}")
+        return np.zeros(0, dtype=np.float32)
+    finally:
+        decoder.close()
 
-    # 正常的音频处理请求
-    if not data or "audio" not in data:
-        return jsonify({"error": "没有提供音频数据"}), 400
 
-    # 将 base64 音频数据转换为 WAV 文件并保存
-    audio_path = audio_storage.save_audio_file(
-        data["audio"], mode="realtime", chunk_index=chunk_index
-    )
+def finish_stream_record(record_id, chunk_index):
+    """处理最后一个分片标记：冲刷会话缓存，用所有分片的文本更新主记录
 
-    if not audio_path:
-        return jsonify({"error": "音频数据处理失败"}), 400
+    Returns:
+        (响应字典, HTTP 状态码)
+    """
+    try:
+        if silence_gate:
+            silence_gate.pop_session(record_id)
 
+        # 流式会话需要冲刷最后的缓存
+        if use_streaming_session():
+            finish_streaming_session(record_id, chunk_index)
+        else:
+            finish_chunk_stitcher(record_id, chunk_index)
+
+        # 用所有分片的文本更新主记录
+        full_text = finalize_stream_record(record_id, update_audio_path=True)
+        if full_text is not None:
+            logger.info(f"已更新记录 {record_id} 的完整文本")
+            response_data = {"success": True, "record_id": record_id}
+            final_pass = (
+                final_pass_runner.get_status(record_id) if final_pass_runner else None
+            )
+            if final_pass is not None:
+                # 客户端可以通过 /api/session/<id>/final 等待第二遍识别的结果
+                response_data["final_pass"] = final_pass["status"]
+            return response_data, 200
+        else:
+            logger.warning(f"记录 {record_id} 没有找到分片")
+            return {"error": "没有找到分片记录"}, 400
+    except Exception as e:
+        logger.error(f"处理最后一个分片标记失败: {e}")
+        return {"error": f"处理最后一个分片标记失败: {str(e)}"}, 500
+
+
+def recognize_stream_audio(
+    record_id,
+    chunk_index,
+    samples,
+    is_last_chunk,
+    auto_insert,
+    strip_header=True,
+    audio_bytes=None,
+):
+    """识别实时分片的音频，自动插入并保存识别结果
+
+    Args:
+        record_id: 记录ID
+        chunk_index: 分片索引
+        samples: 解码后的音频采样（排队合并时为多个分片拼接后的音频）
+        is_last_chunk: 是否为最后一个分片
+        auto_insert: 是否自动插入识别结果
+        strip_header: 分片开头是否带有重复的 webm 文件头音频
+        audio_bytes: 原始音频字节，为 None 时保存解码后的采样
+
+    Returns:
+        (响应字典, HTTP 状态码)
+    """
     try:
         # 使用 FunASR 进行识别
-        logger.info(f"处理音频: {audio_path}")
-
-        result = asr_model.generate(
-            input=audio_path,
-            language="auto",
-            use_itn=True,
-            hotword=model_params["hotwords"],
+        logger.info(
+            f"处理音频分片: 记录ID {record_id}, 分片索引 {chunk_index}, "
+            f"时长 {len(samples) / SAMPLE_RATE:.2f}s"
         )
 
-        if model_params["model"] == "iic/SenseVoiceSmall":
-            recognized_text = format_str_v2(result[0]["text"])
-        else:
-            recognized_text = result[0]["text"]
+        recognized_text, partials, skipped = recognize_stream_chunk(
+            record_id,
+            samples,
+            is_last_chunk=is_last_chunk,
+            auto_insert=auto_insert,
+            strip_header=strip_header,
+        )
+        skipped_chunks = None
+        if silence_gate and record_id is not None:
+            if is_last_chunk:
+                skipped_chunks = silence_gate.pop_session(record_id)["skipped"]
+            else:
+                skipped_chunks = silence_gate.get_session_stats(record_id)["skipped"]
 
         if recognized_text == "":
-            return jsonify(
-                {
-                    "success": True,
-                    "text": "",
-                    "record_id": record_id,
-                    "chunk_index": chunk_index,
-                }
-            )
+            response_data = {
+                "success": True,
+                "text": "",
+                "partials": [],
+                "record_id": record_id,
+                "chunk_index": chunk_index,
+            }
+            if skipped:
+                response_data["skipped"] = True
+            if skipped_chunks is not None:
+                response_data["silence_skipped_chunks"] = skipped_chunks
+            return response_data, 200
 
         # 如果需要自动插入文本
         if auto_insert:
-            text_inserter.insert_text(recognized_text)
+            with timed_stage("insert_text"):
+                text_inserter.insert_text(recognized_text)
 
         # 保存到数据库
         if chunk_index is not None:
-            # 如果是第一个分片，创建主记录
-            if chunk_index == 0:
-                record_id = db_manager.add_record(
-                    text="", mode="realtime", is_chunked=True
-                )
+            # 音频文件在后台线程中写入
+            audio_path = None
+            if save_realtime_audio:
+                with timed_stage("audio_save"):
+                    if audio_bytes is None:
+                        # 增量解码的片段和合并的分片没有完整的文件头，保存解码后的采样
+                        audio_path = audio_storage.save_samples_async(
+                            samples, mode="realtime", chunk_index=chunk_index
+                        )
+                    else:
+                        # 二进制上传的音频位于复用缓冲区中，后台写入前需要拷贝
+                        audio_path = audio_storage.save_audio_bytes_async(
+                            bytes(audio_bytes), mode="realtime", chunk_index=chunk_index
+                        )
+
+            # 旧版客户端的第一个分片创建主记录（/api/session/open 已经创建）
+            if chunk_index == 0 and realtime_sessions.get(record_id) is None:
+                with timed_stage("db"):
+                    record_id = db_manager.add_record(
+                        text="", mode="realtime", is_chunked=True
+                    )
                 logger.info(f"创建新的实时录音记录，ID: {record_id}")
 
             # 添加分片记录
             if record_id:
-                db_manager.add_chunk(
-                    record_id=record_id,
-                    chunk_index=chunk_index,
-                    text=recognized_text,
-                    audio_path=audio_path,
-                )
+                save_stream_chunk(record_id, chunk_index, recognized_text, audio_path)
                 logger.info(
                     f"添加分片记录，记录ID: {record_id}, 分片索引: {chunk_index}"
                 )
 
             # 如果是最后一个分片，更新主记录的文本
             if is_last_chunk and record_id:
-                # 获取所有分片
-                chunks = db_manager.get_chunks_by_record_id(record_id)
-                full_text = "".join([chunk["text"] for chunk in chunks])
-
-                # 更新主记录
-                conn = db_manager.get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE recognition_records SET text = ? WHERE id = ?",
-                    (full_text, record_id),
-                )
-                conn.commit()
-                conn.close()
+                finalize_stream_record(record_id)
                 logger.info(f"更新记录 {record_id} 的完整文本")
 
-        return jsonify(
-            {
-                "success": True,
-                "text": recognized_text,
-                "record_id": record_id,
-                "chunk_index": chunk_index,
-            }
-        )
+        return {
+            "success": True,
+            "text": recognized_text,
+            "partials": partials,
+            "record_id": record_id,
+            "chunk_index": chunk_index,
+            "silence_skipped_chunks": skipped_chunks,
+        }, 200
     except Exception as e:
         logger.error(f"识别失败: {e}")
         estr = str(e)
         if "ffmpeg" in estr or "Invalid data found when processing" in estr:
-            return jsonify({"error": "空音频数据"}), 200
+            return {"error": "空音频数据"}, 200
         eeee = sys.exc_info()
-        return jsonify({"error": f"识别失败: {str(eeee)}"}), 500
+        return {"error": f"识别失败: {str(eeee)}"}, 500
+
+
+def process_stream_chunks(
+    record_id, chunk_index, chunks, samples, auto_insert, strip_header, audio_bytes
+):
+    """处理一批实时分片（同一记录同时只有一个线程处理，文本按顺序插入和保存）
+
+    Args:
+        record_id: 记录ID
+        chunk_index: 本次请求的分片索引，识别结果记在该分片下
+        chunks: 按索引排序的 PendingChunk 列表，积压时包含之前排队的分片
+        samples: 合并后的音频采样，只有结束标记时为 None
+        auto_insert: 是否自动插入识别结果
+        strip_header: 分片开头是否带有重复的 webm 文件头音频
+        audio_bytes: 本次请求的原始音频字节，没有合并其他分片时用于保存
+
+    Returns:
+        (响应字典, HTTP 状态码)
+    """
+    is_last_chunk = any(chunk.is_last_chunk for chunk in chunks)
+    has_marker = any(chunk.samples is None for chunk in chunks)
+    audio_chunks = [chunk for chunk in chunks if chunk.samples is not None]
+    finish_index = chunk_index
+    if has_marker:
+        # 增量解码器中剩余的音频与积压的分片一起识别，然后再结束会话
+        tail = flush_stream_decoder(record_id)
+        if len(tail):
+            samples = tail if samples is None else np.concatenate([samples, tail])
+            if not audio_chunks:
+                # 剩余的音频记在结束标记的索引下，会话冲刷的文本记在下一个索引
+                finish_index = chunk_index + 1
+    response = None
+    if samples is not None:
+        merged = len(audio_chunks) > 1
+        response = recognize_stream_audio(
+            record_id,
+            # 合并的分片记在其中第一个分片的索引下，第一个分片仍会创建主记录
+            (
+                audio_chunks[0].chunk_index
+                if audio_chunks and (merged or has_marker)
+                else chunk_index
+            ),
+            samples,
+            # 有结束标记时由 finish_stream_record 结束会话
+            is_last_chunk and not has_marker,
+            auto_insert,
+            strip_header=strip_header,
+            audio_bytes=None if merged or has_marker else audio_bytes,
+        )
+    if has_marker:
+        # 结束标记与之前积压的分片一起处理，分片的中间结果不再单独返回
+        response = finish_stream_record(record_id, finish_index)
+    return response
+
+
+@app.route("/api/recognize_stream", methods=["POST"])
+def recognize_stream():
+    """实时语音识别"""
+    error_response = model_unavailable_response()
+    if error_response:
+        return error_response
+
+    # 获取请求数据
+    params, audio_bytes = read_stream_request()
+
+    auto_insert = params["auto_insert"]
+    chunk_index = params["chunk_index"]  # 获取分片索引
+    record_id = params["record_id"]  # 获取记录ID
+    is_last_chunk = params["is_last_chunk"]  # 是否为最后一个分片
+    incremental = params["incremental"] and record_id is not None
+    base64_audio = params.get("audio")
+
+    # 如果是最后一个分片标记请求（没有音频数据）
+    if is_last_chunk and audio_bytes is None and not base64_audio:
+        logger.info(
+            f"收到最后一个分片标记，记录ID: {record_id}, 分片索引: {chunk_index}"
+        )
+        if not record_id:
+            return jsonify({"error": "没有提供记录ID"}), 400
+        samples = None
+    else:
+        # 正常的音频处理请求
+        if audio_bytes is None and not base64_audio:
+            return jsonify({"error": "没有提供音频数据"}), 400
+
+        # 在内存中解码音频，直接把采样数组交给模型，不经过临时文件
+        try:
+            with timed_stage("decode"):
+                if audio_bytes is None:
+                    audio_bytes = decode_base64_audio(base64_audio)
+                if incremental:
+                    samples = decode_stream_fragment(
+                        record_id, chunk_index, audio_bytes, is_last_chunk
+                    )
+                else:
+                    samples = decode_audio_bytes(audio_bytes)
+        except AudioDecodeError as e:
+            if incremental:
+                # 增量解码出错后本次录音的后续片段都无法解码，明确告知客户端
+                logger.error(f"记录 {record_id} 增量解码失败: {e}")
+                return (
+                    jsonify(
+                        {
+                            "error": f"增量解码失败，本次录音无法继续识别: {e}",
+                            "decode_failed": True,
+                            "record_id": record_id,
+                        }
+                    ),
+                    500,
+                )
+            logger.warning(f"音频解码失败: {e}")
+            return jsonify({"error": "空音频数据"}), 200
+
+        if incremental and len(samples) == 0 and not is_last_chunk:
+            # 片段中还没有完整的音频帧，等待后续片段
+            return jsonify(
+                {
+                    "success": True,
+                    "text": "",
+                    "partials": [],
+                    "record_id": record_id,
+                    "chunk_index": chunk_index,
+                }
+            )
+        if incremental:
+            # 增量解码的片段不是完整文件，保存解码后的采样
+            audio_bytes = None
+
+    queue = None
+    if chunk_queues is not None and record_id is not None:
+        # 重复的文件头在队列合并分片时去掉
+        queue = chunk_queues.get_or_create(record_id, strip_header=not incremental)
+
+    def process(chunks, merged_samples):
+        return process_stream_chunks(
+            record_id,
+            chunk_index,
+            chunks,
+            merged_samples,
+            auto_insert,
+            strip_header=not incremental and queue is None,
+            audio_bytes=audio_bytes,
+        )
+
+    if queue is None:
+        response_data, status_code = process(
+            [PendingChunk(chunk_index, samples, is_last_chunk)], samples
+        )
+        return jsonify(response_data), status_code
+
+    try:
+        chunk = queue.run(chunk_index, samples, is_last_chunk, process)
+    finally:
+        if is_last_chunk:
+            chunk_queues.pop(record_id)
+
+    if chunk.result is not None:
+        response_data, status_code = chunk.result
+    else:
+        # 音频并入了之后的分片一起识别，或者积压过多被丢弃
+        response_data, status_code = {
+            "success": True,
+            "text": "",
+            "partials": [],
+            "record_id": record_id,
+            "chunk_index": chunk_index,
+            "coalesced": chunk.coalesced,
+            "dropped": chunk.dropped,
+        }, 200
+    response_data.update(queue.hint())
+    return jsonify(response_data), status_code
+
+
+@app.route("/api/scheduler/stats", methods=["GET"])
+def scheduler_stats():
+    """获取推理调度器的批大小和延迟统计"""
+    stats = inference_scheduler.get_stats()
+    stats["silence_gate"] = silence_gate.get_stats() if silence_gate else None
+    stats["result_cache"] = result_cache.get_stats() if result_cache else None
+    return jsonify({"success": True, "stats": stats})
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics_endpoint():
+    """以 Prometheus 文本格式导出延迟分布、队列深度和模型状态"""
+    response = make_response(metrics.render())
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    return response
+
+
+@app.route("/api/session/open", methods=["POST"])
+def open_session():
+    """开始一次实时录音，返回服务端分配的记录ID
+
+    请求体（可选）: {"auto_insert": false, "incremental": false}
+    """
+    error_response = model_unavailable_response()
+    if error_response:
+        return error_response
+
+    data = request.get_json(silent=True) or {}
+    try:
+        session = open_realtime_session(
+            auto_insert=parse_bool(data.get("auto_insert")),
+            incremental=parse_bool(data.get("incremental")),
+        )
+    except Exception as e:
+        logger.error(f"开始实时录音失败: {e}")
+        return jsonify({"error": f"开始实时录音失败: {str(e)}"}), 500
+
+    logger.info(f"开始实时录音，记录ID: {session.record_id}")
+    return jsonify(
+        {
+            "success": True,
+            "record_id": session.record_id,
+            "incremental_decode": supports_stream_decoding(),
+            "idle_timeout": realtime_sessions.max_idle_seconds,
+        }
+    )
+
+
+@app.route("/api/session/<int:record_id>", methods=["GET"])
+def get_session(record_id):
+    """获取进行中的实时录音会话的状态"""
+    session = realtime_sessions.get(record_id)
+    if session is None:
+        return jsonify({"error": "会话不存在或已结束"}), 404
+    return jsonify({"success": True, "session": session.to_dict()})
+
+
+@app.route("/api/session/<int:record_id>/final", methods=["GET"])
+def get_final_pass(record_id):
+    """获取第二遍识别的结果
+
+    查询参数 wait 为最长等待秒数（最多 60 秒），第二遍识别结束或超时后返回。
+    """
+    if final_pass_runner is None:
+        return jsonify({"error": "未启用两遍识别"}), 404
+    try:
+        wait = min(max(float(request.args.get("wait", 0)), 0), 60)
+    except ValueError:
+        wait = 0
+    if wait > 0:
+        status = final_pass_runner.wait(record_id, wait)
+    else:
+        status = final_pass_runner.get_status(record_id)
+    if status is None:
+        return jsonify({"error": "该记录没有第二遍识别"}), 404
+    return jsonify({"success": True, "final_pass": status})
+
+
+@app.route("/api/models/resident", methods=["GET"])
+def resident_models():
+    """获取常驻内存的模型、内存预算以及命中、加载和淘汰次数"""
+    return jsonify({"success": True, **model_manager.get_resident_status()})
+
+
+@app.route("/api/model_daemon", methods=["GET"])
+def model_daemon_health():
+    """模型守护进程的健康检查"""
+    if not model_manager.daemon_socket:
+        return jsonify({"success": False, "error": "未启用模型守护进程"}), 404
+    health = ping_daemon(model_manager.daemon_socket)
+    if health is None:
+        return jsonify({"success": False, "error": "模型守护进程未运行"}), 503
+    return jsonify({"success": True, **health})
+
+
+@app.route("/api/model_daemon/shutdown", methods=["POST"])
+def shutdown_model_daemon():
+    """停止模型守护进程并卸载其中的模型（服务进程重启不会停止守护进程）"""
+    if not model_manager.daemon_socket:
+        return jsonify({"success": False, "error": "未启用模型守护进程"}), 404
+    try:
+        request_daemon(model_manager.daemon_socket, {"type": "shutdown"})
+    except ModelDaemonError as e:
+        return jsonify({"success": False, "error": str(e)}), 503
+    # 已连接的模型不再可用，下次加载时重新启动守护进程
+    model_manager.unload()
+    return jsonify({"success": True})
+
+
+@app.route("/api/autotune", methods=["GET"])
+def get_autotune():
+    """获取校准状态、保存的校准结果和当前生效的设置"""
+    if autotuner is None:
+        return jsonify({"success": False, "error": "未启用自动校准"}), 404
+    return jsonify(
+        {
+            "success": True,
+            **autotuner.status(),
+            "targets": sorted(autotune_targets),
+            "device": model_params["device"],
+            "asr_workers": asr_workers,
+            "torch_threads": torch_threads,
+        }
+    )
+
+
+@app.route("/api/autotune", methods=["POST"])
+def run_autotune():
+    """重新校准设备和线程数，完成后按新的配置重新加载模型
+
+    wait=false 时立即返回，不等待校准和加载完成。
+    """
+    if autotuner is None:
+        return jsonify({"success": False, "error": "未启用自动校准"}), 404
+    data = request.get_json(silent=True) or {}
+    options = dict(request.args)
+    options.update(data)
+    wait = str(options.get("wait", "true")).lower() != "false"
+
+    thread = start_autotune()
+    if thread is None:
+        return jsonify({"success": False, "error": "正在校准中，请稍后再试"}), 503
+    if not wait:
+        return jsonify({"success": True, "message": "正在后台校准"}), 202
+
+    thread.join()
+    if autotuner.error:
+        return (
+            jsonify({"success": False, "error": f"校准失败: {autotuner.error}"}),
+            500,
+        )
+    return jsonify({"success": True, **autotuner.status()})
 
 
 @app.route("/api/get_last_record_id", methods=["POST", "GET"])
@@ -406,57 +1961,213 @@ def get_last_record_id():
 @app.route("/api/recognize", methods=["POST"])
 def recognize():
     """从音频文件识别文本（一次性录音模式）"""
-    global asr_model
-
-    if asr_model is None:
-        if model_loading:
-            return jsonify({"error": "模型正在加载中，请稍后再试"}), 503
-        elif model_load_error:
-            return jsonify({"error": f"模型加载失败: {model_load_error}"}), 500
-        else:
-            # 尝试加载模型
-            threading.Thread(target=load_asr_model).start()
-            return jsonify({"error": "模型尚未加载，已启动加载过程，请稍后再试"}), 503
+    error_response = model_unavailable_response()
+    if error_response:
+        return error_response
 
     if "audio" not in request.files:
         return jsonify({"error": "没有提供音频文件"}), 400
 
     audio_file = request.files["audio"]
     auto_insert = request.form.get("auto_insert", "false").lower() == "true"
+    # 可选：指定本次识别使用的模型，已常驻内存的模型不需要重新加载
+    model_name = request.form.get("model") or None
+    model_error = routable_model_error(model_name)
+    if model_error:
+        return jsonify({"error": model_error}), 400
 
-    # 保存上传的音频文件
-    audio_path = audio_storage.save_audio_file(audio_file, mode="onetime")
-
-    if not audio_path:
-        return jsonify({"error": "音频文件保存失败"}), 400
+    # 在内存中解码上传的音频
+    try:
+        with timed_stage("decode"):
+            audio_bytes = audio_file.read()
+            samples = decode_audio_bytes(audio_bytes)
+    except AudioDecodeError as e:
+        logger.warning(f"音频解码失败: {e}")
+        return jsonify({"error": "音频文件解码失败"}), 400
 
     try:
-        # 使用 FunASR 进行识别
-        result = asr_model.generate(input=audio_path, language="zh", use_itn=True)
-        recognized_text = result[0]["text"]
+        # 使用 FunASR 进行识别，长录音分段并行识别
+        routed_kwargs = routed_generate_kwargs(model_name)
+        if not routed_kwargs and use_long_audio(samples):
+            result = recognize_long_audio(
+                samples, language="zh", use_itn=True, hotword=model_params["hotwords"]
+            )
+        else:
+            result = submit_recognition(
+                samples,
+                language="zh",
+                use_itn=True,
+                **offline_generate_kwargs(model_name),
+                **routed_kwargs,
+            )
+        recognized_text = result["text"]
 
         # 如果需要自动插入文本
         if auto_insert:
-            text_inserter.insert_text(recognized_text)
+            with timed_stage("insert_text"):
+                text_inserter.insert_text(recognized_text)
+
+        # 识别成功后在后台保存音频文件
+        with timed_stage("audio_save"):
+            audio_path = audio_storage.save_audio_bytes_async(
+                audio_bytes, mode="onetime"
+            )
 
         # 保存到数据库
-        record_id = db_manager.add_record(
-            text=recognized_text,
-            mode="onetime",
-            audio_path=audio_path,
-            is_chunked=False,
-        )
+        with timed_stage("db"):
+            record_id = db_manager.add_record(
+                text=recognized_text,
+                mode="onetime",
+                audio_path=audio_path,
+                is_chunked=False,
+            )
 
         return jsonify(
             {"success": True, "text": recognized_text, "record_id": record_id}
         )
     except Exception as e:
         logger.error(f"识别失败: {e}")
-        # 删除音频文件
-        audio_storage.delete_audio_file(audio_path)
         return jsonify({"error": f"识别失败: {str(e)}"}), 500
 
 
+def job_manager_unavailable_response():
+    if job_manager is None:
+        return jsonify({"error": "转写任务功能未启用"}), 503
+    return None
+
+
+@app.route("/api/jobs", methods=["POST"])
+def create_job():
+    """提交文件转写任务，立即返回任务ID
+
+    可以上传文件（表单字段 file 或 audio），也可以在本机请求时通过 path
+    指定本地文件路径。可选参数 language、model。
+    """
+    error_response = job_manager_unavailable_response()
+    if error_response:
+        return error_response
+
+    data = request.get_json(silent=True) or request.form
+    options = {"language": data.get("language") or "auto"}
+    if data.get("model"):
+        model_error = routable_model_error(data["model"])
+        if model_error:
+            return jsonify({"error": model_error}), 400
+        options["model"] = data["model"]
+
+    upload = request.files.get("file") or request.files.get("audio")
+    if upload is not None:
+        job = job_manager.submit_upload(upload, options)
+    elif data.get("path"):
+        # 只允许本机客户端直接读取本地文件
+        if request.remote_addr not in ("127.0.0.1", "::1"):
+            return jsonify({"error": "只有本机请求可以指定本地文件路径"}), 403
+        if not os.path.isfile(data["path"]):
+            return jsonify({"error": "文件不存在"}), 400
+        job = job_manager.submit_path(data["path"], options)
+    else:
+        return jsonify({"error": "没有提供文件"}), 400
+
+    if job is None:
+        return jsonify({"error": "创建转写任务失败"}), 500
+    return jsonify({"success": True, "job": job}), 202
+
+
+@app.route("/api/jobs", methods=["GET"])
+def list_jobs():
+    """获取转写任务列表"""
+    error_response = job_manager_unavailable_response()
+    if error_response:
+        return error_response
+
+    status = request.args.get("status")
+    limit = request.args.get("limit", default=100, type=int)
+    jobs = job_manager.list_jobs(
+        status=status.split(",") if status else None, limit=limit
+    )
+    return jsonify({"success": True, "jobs": jobs})
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """获取转写任务的状态和进度"""
+    error_response = job_manager_unavailable_response()
+    if error_response:
+        return error_response
+
+    job = job_manager.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在"}), 404
+    return jsonify({"success": True, "job": job})
+
+
+@app.route("/api/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """以 Server-Sent Events 推送转写任务的进度，任务结束后关闭"""
+    error_response = job_manager_unavailable_response()
+    if error_response:
+        return error_response
+    if job_manager.get_job(job_id) is None:
+        return jsonify({"error": "任务不存在"}), 404
+
+    def generate():
+        version = None
+        last_payload = None
+        while True:
+            job = job_manager.get_job(job_id)
+            if job is None:
+                return
+            payload = json.dumps(job, ensure_ascii=False)
+            if payload != last_payload:
+                last_payload = payload
+                yield f"data: {payload}\n\n"
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            version = job_manager.wait_for_update(version, timeout=15)
+
+    response = app.response_class(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """取消转写任务"""
+    error_response = job_manager_unavailable_response()
+    if error_response:
+        return error_response
+
+    if not job_manager.cancel(job_id):
+        return jsonify({"error": "任务不存在或已经结束"}), 400
+    return jsonify({"success": True})
+
+
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+def get_job_result(job_id):
+    """获取转写任务的识别结果（进行中的任务返回已完成部分）"""
+    error_response = job_manager_unavailable_response()
+    if error_response:
+        return error_response
+
+    job = job_manager.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在"}), 404
+
+    chunks = []
+    if job["record_id"] is not None:
+        chunks = db_manager.get_chunks_by_record_id(job["record_id"])
+    return jsonify(
+        {
+            "success": True,
+            "status": job["status"],
+            "record_id": job["record_id"],
+            "text": "".join(chunk["text"] for chunk in chunks),
+            "chunks": chunks,
+        }
+    )
+
+
 @app.route("/api/insert_text", methods=["POST"])
 def insert_text():
     """将文本插入到当前焦点位置"""
@@ -473,26 +2184,53 @@ def insert_text():
         return jsonify({"error": f"插入文本失败: {str(e)}"}), 500
 
 
-@app.route("/api/reload_model", methods=["GET"])
+@app.route("/api/reload_model", methods=["GET", "POST"])
 def reload_model():
-    """重新加载模型"""
-    global asr_model, model_loading
+    """重新加载模型
+
+    新模型在后台加载并预热，期间旧模型继续处理识别请求，加载完成后原子切换。
+    可以通过查询参数或 JSON 传入新的模型参数（如 hotwords、model、backend）；
+    wait=false 时立即返回，不等待加载完成。
+    """
+    data = request.get_json(silent=True) or {}
+    options = dict(request.args)
+    options.update(data)
+
+    new_params = {
+        key: options[key]
+        for key in (
+            "model",
+            "vad_model",
+            "punc_model",
+            "spk_model",
+            "hotwords",
+            "backend",
+        )
+        if key in options
+    }
+    if new_params.get("backend", BACKEND_TORCH) not in BACKENDS:
+        return (
+            jsonify({"error": f"不支持的推理后端，可选: {', '.join(BACKENDS)}"}),
+            400,
+        )
+    wait = str(options.get("wait", "true")).lower() != "false"
 
-    if model_loading:
+    loader = start_model_loading(new_params)
+    if loader is None:
         return jsonify({"error": "模型正在加载中，请稍后再试"}), 503
+    if not wait:
+        return jsonify({"success": True, "message": "模型正在后台重新加载"}), 202
 
-    # 清除当前模型
-    asr_model = None
-
-    # 启动模型加载
-    success = load_asr_model()
-
-    if success:
+    loader.join()
+    if model_manager.load_error is None and model_manager.is_loaded():
         return jsonify({"success": True, "message": "模型重新加载成功"})
     else:
         return (
             jsonify(
-                {"success": False, "error": f"模型重新加载失败: {model_load_error}"}
+                {
+                    "success": False,
+                    "error": f"模型重新加载失败: {model_manager.load_error}",
+                }
             ),
             500,
         )
@@ -1060,6 +2798,13 @@ if __name__ == "__main__":
     parser.add_argument(
         "--model", type=str, default="paraformer-zh-streaming", help="语音识别模型"
     )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=BACKENDS,
+        default=BACKEND_TORCH,
+        help="推理后端：torch 为 PyTorch 全精度，torch-int8 为动态 int8 量化（仅 CPU），onnx 为导出 ONNX 后用 onnxruntime 推理（首次使用时导出并保存在模型目录，需要安装 funasr-onnx，不支持流式模型）",
+    )
     parser.add_argument("--vad-model", type=str, default="", help="语音活动检测模型")
     parser.add_argument("--punc-model", type=str, default="", help="标点符号模型")
     parser.add_argument("--spk-model", type=str, default="", help="说话人分割模型")
@@ -1069,9 +2814,9 @@ if __name__ == "__main__":
     parser.add_argument(
         "--device",
         type=str,
-        default="cuda",
-        choices=["cuda", "cpu"],
-        help="使用的设备类型 (cuda 或 cpu)",
+        default=DEVICE_AUTO,
+        choices=[DEVICE_AUTO, "cuda", "cpu"],
+        help="使用的设备类型 (auto、cuda 或 cpu)，auto 表示使用校准结果或自动检测",
     )
     parser.add_argument(
         "--ngpu", type=int, default=0, help="使用的 GPU 设备 ID (0, 1, ...)"
@@ -1085,6 +2830,197 @@ if __name__ == "__main__":
         default="",
         help="数据存储目录路径，用于存储音频文件和数据库",
     )
+    parser.add_argument(
+        "--server",
+        choices=["dev", "waitress"],
+        default="waitress",
+        help="HTTP 服务器：waitress 为多线程生产服务器（未安装时改用 dev），dev 为 Flask 开发服务器",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="监听地址，默认只接受本机连接；0.0.0.0 表示接受所有网络接口的连接",
+    )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="使用 Flask 开发服务器时开启调试模式（调试器可以执行任意代码，只用于本机开发）",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=8,
+        help="生产服务器处理请求的线程数",
+    )
+    parser.add_argument(
+        "--connection-limit",
+        type=int,
+        default=100,
+        help="生产服务器的最大并发连接数",
+    )
+    parser.add_argument(
+        "--shutdown-timeout",
+        type=float,
+        default=30,
+        help="退出时等待进行中的识别请求完成的最长秒数",
+    )
+    parser.add_argument(
+        "--batch-max-size", type=int, default=8, help="推理调度器每批最多的请求数"
+    )
+    parser.add_argument(
+        "--batch-max-wait-ms",
+        type=float,
+        default=10,
+        help="推理调度器凑批时最多等待的毫秒数",
+    )
+    parser.add_argument(
+        "--lazy-load",
+        action="store_true",
+        help="不在启动时加载模型，等到第一次识别请求时再加载",
+    )
+    parser.add_argument(
+        "--asr-workers",
+        type=int,
+        default=None,
+        help="ASR 工作进程数，0 表示在服务进程中加载模型，不指定时由自动校准决定（不校准时为 0）",
+    )
+    parser.add_argument(
+        "--torch-threads",
+        type=int,
+        default=0,
+        help="torch 算子内线程数（使用工作进程时为每个进程的线程数），0 表示由自动校准决定",
+    )
+    parser.add_argument(
+        "--disable-autotune",
+        action="store_true",
+        help="不在首次启动时校准设备、线程数和工作进程数",
+    )
+    parser.add_argument(
+        "--model-daemon",
+        type=str,
+        default="",
+        help="模型守护进程的套接字路径：模型在独立的守护进程中加载（未运行时自动启动），服务进程重启后模型仍在内存中，为空表示不使用",
+    )
+    parser.add_argument(
+        "--asr-worker-timeout",
+        type=float,
+        default=120,
+        help="单个推理任务的超时秒数，超时的工作进程会被重启",
+    )
+    parser.add_argument(
+        "--disable-realtime-audio-save",
+        action="store_true",
+        help="不保存实时识别分片的音频文件",
+    )
+    parser.add_argument(
+        "--result-cache-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 1024 / 1024,
+        help="识别结果缓存的内存上限（MB），0 表示不缓存",
+    )
+    parser.add_argument(
+        "--result-cache-persist",
+        action="store_true",
+        help="把识别结果缓存同时保存到数据库，服务重启后仍然有效",
+    )
+    parser.add_argument(
+        "--chunk-overlap",
+        type=float,
+        default=DEFAULT_OVERLAP_SECONDS,
+        help="实时分片之间重叠的音频秒数，用于合并边界处的识别结果，0 表示不重叠",
+    )
+    parser.add_argument(
+        "--model-memory-budget-mb",
+        type=float,
+        default=0,
+        help="常驻内存的模型（请求指定的模型、被切换下来的模型）的内存预算（MB），超出后按最近最少使用的顺序释放；0 表示不限制，此时被切换下来的模型不常驻；使用模型守护进程时作为守护进程的预算。每个模型的内存按加载前后进程常驻内存的差值估算，加载时有其他请求在推理会有偏差",
+    )
+    parser.add_argument(
+        "--max-resident-models",
+        type=int,
+        default=DEFAULT_MAX_RESIDENT_MODELS,
+        help="最多同时常驻内存的模型数（包括当前模型），超出后按最近最少使用的顺序释放；0 表示不限制",
+    )
+    parser.add_argument(
+        "--routable-models",
+        type=str,
+        default=",".join(DEFAULT_ROUTABLE_MODELS),
+        help="请求可以通过 model 参数指定的模型（逗号分隔），为空表示只能使用当前模型",
+    )
+    parser.add_argument(
+        "--final-model",
+        type=str,
+        default="",
+        help="两遍识别：录音结束后用该离线模型（如 paraformer-zh）重新识别整段录音并更新记录，为空表示不启用",
+    )
+    parser.add_argument(
+        "--final-vad-model",
+        type=str,
+        default="fsmn-vad",
+        help="第二遍识别使用的语音活动检测模型",
+    )
+    parser.add_argument(
+        "--final-punc-model",
+        type=str,
+        default="ct-punc",
+        help="第二遍识别使用的标点符号模型",
+    )
+    parser.add_argument(
+        "--stream-queue-seconds",
+        type=float,
+        default=DEFAULT_MAX_PENDING_SECONDS,
+        help="每个实时识别会话排队等待识别的音频上限（秒），超过后丢弃最早的分片，0 表示不排队",
+    )
+    parser.add_argument(
+        "--job-workers",
+        type=int,
+        default=1,
+        help="同时处理的文件转写任务数",
+    )
+    parser.add_argument(
+        "--job-window-seconds",
+        type=float,
+        default=0,
+        help=(
+            f"文件转写任务每次送入模型的音频秒数，默认 {DEFAULT_WINDOW_SECONDS} 秒"
+            "乘以 ASR 工作进程数（每个窗口分段后由各工作进程并行识别）"
+        ),
+    )
+    parser.add_argument(
+        "--long-audio-seconds",
+        type=float,
+        default=DEFAULT_LONG_AUDIO_SECONDS,
+        help="超过该秒数的一次性识别先用 VAD 切分再并行识别，0 表示不启用",
+    )
+    parser.add_argument(
+        "--ws-port",
+        type=int,
+        default=0,
+        help="WebSocket 流式识别服务的端口，0 表示不启用",
+    )
+    parser.add_argument(
+        "--ws-chunk-seconds",
+        type=float,
+        default=0,
+        help="WebSocket 流式识别每个分片的秒数，0 表示按模型自动选择",
+    )
+    parser.add_argument(
+        "--disable-silence-gate",
+        action="store_true",
+        help="不跳过静音的实时分片，所有分片都送入模型",
+    )
+    parser.add_argument(
+        "--silence-threshold-db",
+        type=float,
+        default=DEFAULT_THRESHOLD_DB,
+        help="静音门限的能量阈值（dBFS），低于该值的帧视为静音",
+    )
+    parser.add_argument(
+        "--silence-gate-vad",
+        action="store_true",
+        help="能量判断有声音的分片再用 VAD 模型确认（更准确，但多一次 VAD 推理）",
+    )
 
     args = parser.parse_args()
 
@@ -1097,6 +3033,65 @@ if __name__ == "__main__":
     model_params["device"] = args.device
     model_params["ngpu"] = args.ngpu
     model_params["hotwords"] = args.hotwords
+    model_params["backend"] = args.backend
+    save_realtime_audio = not args.disable_realtime_audio_save
+    asr_workers = max(0, args.asr_workers or 0)
+    torch_threads = max(0, args.torch_threads)
+    autotune_targets = {
+        name
+        for name, automatic in (
+            ("device", args.device == DEVICE_AUTO),
+            ("asr_workers", args.asr_workers is None),
+            ("torch_threads", args.torch_threads <= 0),
+        )
+        if automatic
+    }
+    asr_worker_timeout = args.asr_worker_timeout
+    ws_chunk_seconds = max(0, args.ws_chunk_seconds)
+    long_audio_seconds = max(0, args.long_audio_seconds)
+    model_manager.memory_budget_bytes = int(
+        max(0, args.model_memory_budget_mb) * 1024 * 1024
+    )
+    model_manager.max_resident_models = max(0, args.max_resident_models)
+    routable_models = {
+        name.strip() for name in args.routable_models.split(",") if name.strip()
+    }
+    if args.model_daemon:
+        model_manager.daemon_socket = os.path.abspath(args.model_daemon)
+        if asr_workers > 0:
+            logger.warning("使用模型守护进程时不启动 ASR 工作进程")
+            asr_workers = 0
+    else:
+        preload_funasr()
+    inference_scheduler.max_batch_size = max(1, args.batch_max_size)
+    inference_scheduler.max_wait_ms = max(0, args.batch_max_wait_ms)
+    if args.chunk_overlap > 0:
+        chunk_stitchers.session_kwargs["overlap_seconds"] = args.chunk_overlap
+    else:
+        chunk_stitchers = None
+    if args.final_model:
+        final_model_params = dict(
+            model_params,
+            model=args.final_model,
+            vad_model=args.final_vad_model,
+            punc_model=args.final_punc_model,
+            spk_model="",
+        )
+        final_pass_runner = FinalPassRunner(recognize_final_pass, apply_final_pass)
+    if args.stream_queue_seconds > 0:
+        chunk_queues.session_kwargs["max_pending_seconds"] = args.stream_queue_seconds
+    else:
+        chunk_queues = None
+    if args.disable_silence_gate:
+        silence_gate = None
+    else:
+        silence_gate = SilenceGate(
+            threshold_db=args.silence_threshold_db,
+            vad_model=(
+                (args.vad_model or "fsmn-vad") if args.silence_gate_vad else None
+            ),
+            device=args.device,
+        )
 
     # 输出模型参数
     logger.info(f"使用模型参数: {model_params}")
@@ -1109,20 +3104,84 @@ if __name__ == "__main__":
     db_manager = DBManager(db_path=data_storage_path)
     audio_storage = AudioStorage(storage_dir=data_storage_path)
 
+    # 初始化识别结果缓存
+    if args.result_cache_mb > 0:
+        result_cache = ResultCache(
+            max_bytes=int(args.result_cache_mb * 1024 * 1024),
+            store=db_manager if args.result_cache_persist else None,
+        )
+    else:
+        result_cache = None
+
     # 初始化LLM服务管理器
     llm_manager = LLMServiceManager()
 
+    # 初始化设备和线程数校准：已有适用的校准结果时直接使用，否则在加载模型前校准
+    if args.disable_autotune:
+        logger.info("已禁用自动校准")
+    elif args.model_daemon:
+        logger.info("使用模型守护进程时不校准设备和线程数")
+    else:
+        autotuner = Autotuner(os.path.dirname(db_manager.db_path))
+        autotune_pending = not ensure_autotuned(calibrate=False)
+
+    # 初始化文件转写任务管理器，恢复上次未完成的任务
+    job_window_auto = not args.job_window_seconds
+    job_manager = JobManager(
+        db_manager,
+        jobs_dir=os.path.join(os.path.dirname(db_manager.db_path), "jobs"),
+        recognize=recognize_job_window,
+        is_ready=model_manager.is_loaded,
+        num_workers=max(1, args.job_workers),
+        window_seconds=(
+            args.job_window_seconds or DEFAULT_WINDOW_SECONDS * max(1, asr_workers)
+        ),
+    )
+    job_manager.start()
+
     # 从数据库加载LLM配置
     load_llm_configs()
 
     # 获取端口参数
     port = args.port
 
-    # 同步加载模型
-    # load_asr_model()
+    # 在后台线程中加载并预热模型，服务可以立即响应状态查询
+    if not args.lazy_load:
+        start_model_loading()
+
+    # 启动 WebSocket 流式识别服务
+    if args.ws_port:
+        if ws_server.is_available():
+            stream_socket_server = ws_server.StreamSocketServer(
+                args.host,
+                args.ws_port,
+                open_session=open_ws_session,
+                feed_session=feed_ws_session,
+                close_session=close_ws_session,
+                chunk_samples=ws_chunk_samples,
+            )
+            stream_socket_server.start()
+        else:
+            logger.warning("websockets 未安装，WebSocket 流式识别服务未启动")
+
+    server_mode = args.server
+    if server_mode == "waitress" and not wsgi_server.is_available():
+        logger.warning("waitress 未安装，改用 Flask 开发服务器")
+        server_mode = "dev"
 
     # 输出明确的启动信息，确保 Electron 能够捕获
     print(f"* Running on http://127.0.0.1:{port}")
     sys.stdout.flush()  # 确保输出被立即刷新
 
-    app.run(host="0.0.0.0", port=port, debug=True, use_reloader=False)
+    if server_mode == "waitress":
+        wsgi_server.serve(
+            app,
+            host=args.host,
+            port=port,
+            tracker=request_tracker,
+            threads=max(1, args.threads),
+            connection_limit=max(1, args.connection_limit),
+            shutdown_timeout=max(0, args.shutdown_timeout),
+        )
+    else:
+        app.run(host=args.host, port=port, debug=args.debug, use_reloader=False)
@@ -0,0 +1,3 @@
+"""
+语音识别模块 - 管理 FunASR 模型推理相关的会话与调度
+"""
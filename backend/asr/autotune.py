@@ -0,0 +1,305 @@
+"""
+设备和线程数自动校准 - 首次启动时检测可用设备，用合成音频测试不同线程数下的推理耗时，选出的配置保存在数据目录中供以后启动使用
+"""
+
+import gc
+import os
+import json
+import time
+import logging
+import threading
+
+from asr.backends import detect_device, resolve_backend
+from asr.model_loader import warmup_model, create_model
+from asr.model_manager import available_memory_bytes, process_rss_bytes
+from asr.worker_pool import ASRWorkerPool
+
+logger = logging.getLogger(__name__)
+
+# 校准结果保存的文件名（在数据目录中）
+AUTOTUNE_FILE = "autotune.json"
+# 校准结果格式的版本，格式变化后重新校准
+CONFIG_VERSION = 3
+# 每次测试使用的合成音频时长（秒）
+BENCHMARK_AUDIO_SECONDS = 3.0
+# 每个线程数测试的次数，取中位数
+BENCHMARK_ROUNDS = 3
+# 单个请求的延迟不超过最快配置的该倍数时，选择吞吐量最高的配置
+LATENCY_TOLERANCE = 1.5
+# 工作进程最多使用校准时可用内存的比例
+MEMORY_HEADROOM = 0.8
+# 测量内存时等待工作进程加载模型的最长时间（秒）
+WORKER_START_TIMEOUT = 300
+
+
+def thread_candidates(cpu_count):
+    """需要测试的线程数：2 的幂以及 CPU 核心数"""
+    candidates = {cpu_count}
+    threads = 1
+    while threads < cpu_count:
+        candidates.add(threads)
+        threads *= 2
+    return sorted(candidates)
+
+
+def apply_torch_threads(num_threads, interop_threads=None):
+    """设置当前进程 torch 的算子内和算子间线程数
+
+    Args:
+        num_threads: 算子内线程数
+        interop_threads: 算子间线程数，None 表示不修改
+    """
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(num_threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # 算子间线程数只能在第一次并行计算之前设置
+            logger.info("torch 算子间线程数已经生效，保持不变")
+
+
+def max_workers_by_memory(worker_bytes, available_bytes):
+    """可用内存能容纳的工作进程数，无法获取内存信息时返回 None
+
+    Args:
+        worker_bytes: 加载模型后一个进程的常驻内存（字节）
+        available_bytes: 系统可用内存（字节）
+    """
+    if not worker_bytes or not available_bytes:
+        return None
+    return max(1, int(available_bytes * MEMORY_HEADROOM // worker_bytes))
+
+
+def measure_worker_bytes(model_params, num_threads, timeout=WORKER_START_TIMEOUT):
+    """启动一个工作进程加载并预热模型，返回它的常驻内存
+
+    工作进程中只有模型和推理运行时，不包括服务进程中 Web 服务等占用的
+    内存，按它估算工作进程数比按服务进程的内存准确。
+
+    Args:
+        model_params: 模型参数字典
+        num_threads: 工作进程的 torch 线程数
+        timeout: 等待工作进程就绪的最长时间（秒）
+
+    Returns:
+        常驻内存（字节），工作进程启动失败或无法获取时返回 None
+    """
+    pool = ASRWorkerPool(model_params, num_workers=1, num_threads=num_threads)
+    pool.start()
+    try:
+        if not pool.wait_ready(timeout=timeout):
+            logger.warning(f"校准用的工作进程启动失败: {pool.last_error}")
+            return None
+        pid = pool.get_status()[0]["pid"]
+        return process_rss_bytes(pid) if pid else None
+    finally:
+        pool.stop()
+
+
+def choose_config(device, cpu_count, results, max_workers=None):
+    """根据各线程数的延迟选择线程数和工作进程数
+
+    多个工作进程各自占用互不重叠的核心，吞吐量按
+    工作进程数 / 单个请求延迟 估算（不需要为每种进程数各加载一份模型）。
+    每个工作进程各持有一份模型，进程数同时受可用内存限制。在延迟不超过
+    最快配置 LATENCY_TOLERANCE 倍的配置中选择吞吐量最高的；使用 GPU 时
+    模型只加载一份，只选择线程数。
+
+    Args:
+        device: 推理设备
+        cpu_count: CPU 核心数
+        results: [{"torch_threads", "latency_ms"}, ...]
+        max_workers: 内存能容纳的工作进程数，None 表示不限制
+
+    Returns:
+        dict: torch_threads、asr_workers（0 表示在服务进程中加载）和
+            estimated_throughput（每秒处理的请求数）
+    """
+    fastest = min(result["latency_ms"] for result in results)
+    best = None
+    for result in results:
+        if result["latency_ms"] > fastest * LATENCY_TOLERANCE:
+            continue
+        workers = (
+            1 if device == "cuda" else max(1, cpu_count // result["torch_threads"])
+        )
+        if max_workers is not None:
+            workers = min(workers, max_workers)
+        throughput = workers * 1000 / result["latency_ms"]
+        if best is None or throughput > best["estimated_throughput"]:
+            best = {
+                "torch_threads": result["torch_threads"],
+                "asr_workers": workers if workers > 1 else 0,
+                "estimated_throughput": round(throughput, 2),
+            }
+    return best
+
+
+class Autotuner:
+    """设备和线程数校准
+
+    校准时按当前模型参数在检测到的设备上临时创建一个模型，依次设置不同的
+    torch 线程数，用合成音频测量推理延迟，选出的配置写入数据目录。需要
+    多个工作进程时再启动一个工作进程测量它的内存，按可用内存限制进程数。
+    CPU 核心数、设备、模型或推理后端变化后需要重新校准。
+    """
+
+    def __init__(self, data_dir):
+        """初始化校准
+
+        Args:
+            data_dir: 数据目录，校准结果保存在其中的 autotune.json
+        """
+        self.path = os.path.join(data_dir, AUTOTUNE_FILE)
+        self.running = False
+        self.error = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """读取保存的校准结果，不存在或无法读取时返回 None"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取校准结果失败，将重新校准: {e}")
+            return None
+
+    def is_valid(self, config, model_params):
+        """保存的校准结果是否适用于当前机器和模型"""
+        if not config or config.get("version") != CONFIG_VERSION:
+            return False
+        if config.get("cpu_count") != (os.cpu_count() or 1):
+            return False
+        if config.get("model") != model_params["model"]:
+            return False
+        if config.get("backend") != resolve_backend(model_params, warn=False):
+            return False
+        return config.get("device") == detect_device()[0]
+
+    def run(self, model_params):
+        """执行校准并保存结果
+
+        校准期间会修改当前进程的 torch 线程数，结束后恢复。
+
+        Args:
+            model_params: 模型参数字典（device 会被替换为检测到的设备）
+
+        Returns:
+            dict: 校准结果；已经在校准中时返回 None
+
+        Raises:
+            创建模型或推理失败时抛出异常
+        """
+        with self._lock:
+            if self.running:
+                return None
+            self.running = True
+            self.error = None
+
+        try:
+            config = self._benchmark(model_params)
+            self._save(config)
+            return config
+        except Exception as e:
+            self.error = str(e)
+            raise
+        finally:
+            with self._lock:
+                self.running = False
+
+    def status(self):
+        """校准状态和保存的结果"""
+        return {"running": self.running, "error": self.error, "config": self.load()}
+
+    def _benchmark(self, model_params):
+        device, device_info = detect_device()
+        cpu_count = os.cpu_count() or 1
+        params = dict(model_params, device=device)
+        logger.info(f"开始校准设备和线程数: 设备 {device}，{cpu_count} 个 CPU 核心")
+        started = time.perf_counter()
+
+        import torch
+
+        original_threads = torch.get_num_threads()
+        # 校准用的模型会被释放，按创建模型之前的可用内存估算工作进程数
+        available_bytes = available_memory_bytes()
+        model = create_model(params)
+        results = []
+        try:
+            warmup_model(model, params)
+            # 加载并预热模型后服务进程的内存，包括 Web 服务等，只在无法启动
+            # 工作进程测量时作为偏大的估计
+            process_bytes = process_rss_bytes()
+            for threads in thread_candidates(cpu_count):
+                torch.set_num_threads(threads)
+                # 线程数变化后的第一次推理不计入
+                warmup_model(model, params, seconds=BENCHMARK_AUDIO_SECONDS)
+                latencies = []
+                for _ in range(BENCHMARK_ROUNDS):
+                    begin = time.perf_counter()
+                    warmup_model(model, params, seconds=BENCHMARK_AUDIO_SECONDS)
+                    latencies.append(time.perf_counter() - begin)
+                latency_ms = sorted(latencies)[len(latencies) // 2] * 1000
+                results.append(
+                    {"torch_threads": threads, "latency_ms": round(latency_ms, 1)}
+                )
+                logger.info(f"校准: {threads} 个线程，延迟 {latency_ms:.0f}ms")
+        finally:
+            torch.set_num_threads(original_threads)
+            del model
+            gc.collect()
+
+        worker_bytes = None
+        worker_memory_source = None
+        max_workers = None
+        unlimited = choose_config(device, cpu_count, results)
+        if unlimited["asr_workers"] > 1:
+            worker_bytes = measure_worker_bytes(params, unlimited["torch_threads"])
+            worker_memory_source = "worker"
+            if worker_bytes is None:
+                worker_bytes = process_bytes
+                worker_memory_source = "process"
+            max_workers = max_workers_by_memory(worker_bytes, available_bytes)
+        config = choose_config(device, cpu_count, results, max_workers=max_workers)
+        config.update(
+            # 线程数来自实测延迟；工作进程数按核心数和一个工作进程实测的内存
+            # 估算，没有同时运行多个工作进程测量
+            asr_workers_estimate={
+                "by_cpu": (
+                    1 if device == "cuda" else cpu_count // config["torch_threads"]
+                ),
+                "by_memory": max_workers,
+                "worker_memory_bytes": worker_bytes,
+                "worker_memory_source": worker_memory_source,
+                "available_memory_bytes": available_bytes,
+            },
+            version=CONFIG_VERSION,
+            device=device,
+            device_info=device_info,
+            cpu_count=cpu_count,
+            model=model_params["model"],
+            backend=resolve_backend(params, warn=False),
+            benchmark_audio_seconds=BENCHMARK_AUDIO_SECONDS,
+            results=results,
+            created_at=time.time(),
+            duration=round(time.perf_counter() - started, 1),
+        )
+        logger.info(
+            f"校准完成: 设备 {device}，{config['torch_threads']} 个线程，"
+            f"{config['asr_workers']} 个工作进程（估算），耗时 {config['duration']}s"
+        )
+        return config
+
+    def _save(self, config):
+        """写入临时文件后替换，中途退出不会留下不完整的文件"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,349 @@
+"""
+推理后端 - PyTorch 全精度、PyTorch 动态 int8 量化，或导出为 ONNX 后用 onnxruntime 推理（适合只有 CPU 的机器）
+"""
+
+import os
+import time
+import logging
+import threading
+
+import numpy as np
+
+from asr.streaming import SAMPLE_RATE, is_streaming_model
+
+try:
+    import funasr_onnx
+except ImportError:
+    funasr_onnx = None
+
+logger = logging.getLogger(__name__)
+
+BACKEND_TORCH = "torch"
+BACKEND_TORCH_INT8 = "torch-int8"
+BACKEND_ONNX = "onnx"
+BACKENDS = [BACKEND_TORCH, BACKEND_TORCH_INT8, BACKEND_ONNX]
+
+# 每毫秒的采样数，VAD 时间戳换算为采样下标
+MS_SAMPLES = SAMPLE_RATE // 1000
+
+
+# 自动选择设备
+DEVICE_AUTO = "auto"
+
+
+def detect_device():
+    """检测可用的推理设备
+
+    Returns:
+        (设备 cuda 或 cpu, 设备信息字典)
+    """
+    try:
+        import torch
+    except ImportError:
+        return "cpu", {}
+    if torch.cuda.is_available():
+        return "cuda", {
+            "gpu": torch.cuda.get_device_name(0),
+            "gpu_count": torch.cuda.device_count(),
+        }
+    return "cpu", {}
+
+
+def resolve_device(device):
+    """把 auto 换成检测到的设备，其他值原样返回"""
+    if device == DEVICE_AUTO:
+        return detect_device()[0]
+    return device
+
+
+def intra_op_threads():
+    """推理使用的算子内线程数
+
+    与当前进程 torch 的线程数一致：工作进程启动时按 CPU 核心平分（或按
+    自动校准的结果）设置，服务进程中按 --torch-threads 设置。多个工作进程
+    各自使用全部核心会严重争抢 CPU。
+    """
+    try:
+        import torch
+    except ImportError:
+        return os.cpu_count() or 1
+    return max(1, torch.get_num_threads())
+
+
+def is_onnx_available():
+    """是否安装了 funasr-onnx（依赖 onnxruntime）"""
+    return funasr_onnx is not None
+
+
+def resolve_backend(model_params, warn=True):
+    """模型实际使用的推理后端
+
+    ONNX 后端不支持流式模型（推理时需要在调用之间保留 cache），这类模型
+    以及没有安装 funasr-onnx 时改用 PyTorch；int8 量化后的模型只能在 CPU
+    上运行，使用 GPU 时不量化。
+
+    Args:
+        model_params: 模型参数字典
+        warn: 改用其他后端时是否输出警告（每次请求都调用时关闭）
+
+    Returns:
+        后端名称
+    """
+    backend = model_params.get("backend") or BACKEND_TORCH
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的推理后端: {backend}")
+    if backend == BACKEND_ONNX:
+        if is_streaming_model(model_params["model"]):
+            if warn:
+                logger.warning(
+                    f"ONNX 后端不支持流式模型 {model_params['model']}，改用 PyTorch"
+                )
+            return BACKEND_TORCH
+        if not is_onnx_available():
+            if warn:
+                logger.warning("funasr-onnx 未安装，ONNX 后端不可用，改用 PyTorch")
+            return BACKEND_TORCH
+    if (
+        backend == BACKEND_TORCH_INT8
+        and resolve_device(model_params["device"]) != "cpu"
+    ):
+        if warn:
+            logger.warning("int8 量化只支持 CPU 推理，改用 PyTorch 全精度")
+        return BACKEND_TORCH
+    return backend
+
+
+def quantize_model_int8(model):
+    """把 AutoModel 中各个子模型的线性层动态量化为 int8
+
+    动态量化只转换权重，激活在推理时按批量化，不需要校准数据；量化在
+    加载时完成，只需要几秒，不单独缓存。只在 CPU 上有效。
+
+    Args:
+        model: funasr.AutoModel 实例（原地修改）
+    """
+    import torch
+
+    started = time.perf_counter()
+    for name in ("model", "vad_model", "punc_model"):
+        module = getattr(model, name, None)
+        if isinstance(module, torch.nn.Module):
+            setattr(
+                model,
+                name,
+                torch.quantization.quantize_dynamic(
+                    module, {torch.nn.Linear}, dtype=torch.qint8
+                ),
+            )
+    logger.info(f"模型已动态量化为 int8，耗时 {time.perf_counter() - started:.1f}s")
+
+
+def export_onnx_model(model_name, disable_update=True):
+    """把模型导出为 ONNX，导出结果保存在模型目录中，之后直接使用
+
+    Args:
+        model_name: FunASR 模型名称或目录
+        disable_update: 是否跳过检查模型更新
+
+    Returns:
+        包含 model.onnx 的模型目录
+    """
+    from funasr.download.download_from_hub import download_model
+
+    model_dir = download_model(model=model_name, check_latest=not disable_update)[
+        "model_path"
+    ]
+    if os.path.exists(os.path.join(model_dir, "model.onnx")):
+        return model_dir
+
+    from funasr import AutoModel
+
+    logger.info(f"首次使用 ONNX 后端，导出模型 {model_name}（只需执行一次）...")
+    started = time.perf_counter()
+    AutoModel(model=model_dir, device="cpu", disable_update=True).export(
+        type="onnx", quantize=False
+    )
+    logger.info(
+        f"模型已导出为 ONNX: {model_dir}，耗时 {time.perf_counter() - started:.1f}s"
+    )
+    return model_dir
+
+
+class OnnxModel:
+    """用 onnxruntime 推理的模型
+
+    对外提供与 AutoModel 相同的 generate 和 inference 接口：VAD、识别和标点
+    模型分别导出为 ONNX，generate 依次执行三个阶段；inference 按 model 参数
+    单独执行一个阶段，供长音频识别使用。热词和说话人分割不支持。
+    """
+
+    inference_backend = BACKEND_ONNX
+
+    def __init__(self, model_params):
+        """导出（首次）并加载 ONNX 模型
+
+        Args:
+            model_params: 模型参数字典
+        """
+        disable_update = model_params["disable_update"]
+        device = resolve_device(model_params["device"])
+        device_id = model_params["ngpu"] if device == "cuda" else -1
+        threads = intra_op_threads()
+        self.model_name = model_params["model"]
+        self.is_sense_voice = "SenseVoice" in self.model_name
+
+        asr_dir = export_onnx_model(self.model_name, disable_update)
+        asr_class = (
+            funasr_onnx.SenseVoiceSmall
+            if self.is_sense_voice
+            else funasr_onnx.Paraformer
+        )
+        self.model = asr_class(
+            asr_dir, batch_size=1, device_id=device_id, intra_op_num_threads=threads
+        )
+
+        # 与 AutoModel 相同的属性名，run_model_stage 据此判断是否配置了该阶段
+        self.vad_model = None
+        self.vad_kwargs = {}
+        if model_params["vad_model"]:
+            self.vad_model = funasr_onnx.Fsmn_vad(
+                export_onnx_model(model_params["vad_model"], disable_update),
+                intra_op_num_threads=threads,
+            )
+        self.punc_model = None
+        self.punc_kwargs = {}
+        if model_params["punc_model"]:
+            self.punc_model = funasr_onnx.CT_Transformer(
+                export_onnx_model(model_params["punc_model"], disable_update),
+                intra_op_num_threads=threads,
+            )
+        if model_params.get("spk_model"):
+            logger.warning("ONNX 后端不支持说话人分割模型，已忽略")
+        # onnxruntime 会话可以并发调用，但逐段识别的中间状态不能交叉
+        self._lock = threading.Lock()
+
+    def generate(self, input, **kwargs):
+        """识别一段或多段音频（接口与 AutoModel.generate 相同）
+
+        Returns:
+            结果列表，每段音频一个 {"key", "text"}
+        """
+        inputs = input if isinstance(input, (list, tuple)) else [input]
+        results = []
+        with self._lock:
+            for index, samples in enumerate(inputs):
+                samples = np.asarray(samples, dtype=np.float32)
+                if self.vad_model is not None:
+                    parts = [
+                        samples[begin * MS_SAMPLES : end * MS_SAMPLES]
+                        for begin, end in self._vad(samples)
+                    ]
+                else:
+                    parts = [samples]
+                text = "".join(self._recognize(part, **kwargs) for part in parts)
+                if self.punc_model is not None and text:
+                    text = self._punctuate(text)
+                results.append({"key": f"onnx_{index}", "text": text})
+        return results
+
+    def inference(self, input, model=None, kwargs=None, **extra):
+        """单独执行一个阶段（接口与 AutoModel.inference 相同）"""
+        with self._lock:
+            if model is not None and model is self.vad_model:
+                samples = np.asarray(input, dtype=np.float32)
+                return [{"key": "onnx_vad", "value": self._vad(samples)}]
+            if model is not None and model is self.punc_model:
+                return [{"key": "onnx_punc", "text": self._punctuate(input)}]
+            samples = np.asarray(input, dtype=np.float32)
+            return [{"key": "onnx_asr", "text": self._recognize(samples, **extra)}]
+
+    def _vad(self, samples):
+        """VAD 切分，返回 [[开始毫秒, 结束毫秒], ...]"""
+        segments = self.vad_model(samples)
+        # 输入为单段音频时结果多一层列表
+        if segments and segments[0] and isinstance(segments[0][0], (list, tuple)):
+            segments = segments[0]
+        return [[int(begin), int(end)] for begin, end in segments if end > begin]
+
+    def _recognize(self, samples, language="auto", use_itn=True, **kwargs):
+        if len(samples) == 0:
+            return ""
+        if self.is_sense_voice:
+            result = self.model(
+                samples,
+                language=language,
+                textnorm="withitn" if use_itn else "woitn",
+            )
+        else:
+            result = self.model(samples)
+        return _result_text(result)
+
+    def _punctuate(self, text):
+        result = self.punc_model(text)
+        return result[0] if isinstance(result, (list, tuple)) else str(result)
+
+
+def _result_text(result):
+    """不同版本的 funasr-onnx 返回格式不同，统一取出文本"""
+    if not result:
+        return ""
+    item = result[0]
+    if isinstance(item, dict):
+        item = item.get("preds", item.get("text", ""))
+    if isinstance(item, (list, tuple)):
+        item = item[0] if item else ""
+    return item if isinstance(item, str) else str(item)
+
+
+def model_backend(model, model_params):
+    """模型实际使用的推理后端（工作进程池和守护进程中的模型按参数判断）"""
+    return (
+        getattr(model, "inference_backend", None)
+        or model_params.get("backend")
+        or BACKEND_TORCH
+    )
+
+
+class BackendStats:
+    """按推理后端统计推理次数、耗时和实时率"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, backend, seconds, audio_seconds):
+        """记录一次推理
+
+        Args:
+            backend: 后端名称
+            seconds: 推理耗时（秒）
+            audio_seconds: 音频时长（秒）
+        """
+        with self._lock:
+            stats = self._stats.setdefault(
+                backend,
+                {"requests": 0, "inference_seconds": 0.0, "audio_seconds": 0.0},
+            )
+            stats["requests"] += 1
+            stats["inference_seconds"] += seconds
+            stats["audio_seconds"] += audio_seconds
+            stats["last_latency_ms"] = round(seconds * 1000, 1)
+
+    def snapshot(self):
+        """各后端的统计：平均延迟（毫秒）和实时率（推理耗时 / 音频时长）"""
+        with self._lock:
+            return {
+                backend: {
+                    "requests": stats["requests"],
+                    "avg_latency_ms": round(
+                        stats["inference_seconds"] * 1000 / stats["requests"], 1
+                    ),
+                    "last_latency_ms": stats["last_latency_ms"],
+                    "rtf": (
+                        round(stats["inference_seconds"] / stats["audio_seconds"], 4)
+                        if stats["audio_seconds"]
+                        else None
+                    ),
+                }
+                for backend, stats in self._stats.items()
+            }
@@ -0,0 +1,238 @@
+"""
+实时分片队列 - 识别速度跟不上录音时，同一会话排队的分片合并为一次推理，并提示客户端放慢发送
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+
+from asr.streaming import RepeatedHeaderDetector, SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# 每个会话排队等待识别的音频上限（秒），超过后丢弃最早的分片
+DEFAULT_MAX_PENDING_SECONDS = 30
+# 会话积压超过该秒数时提示客户端放慢发送
+DEFAULT_SLOW_DOWN_SECONDS = 4
+
+
+class PendingChunk:
+    """排队中的一个实时分片"""
+
+    def __init__(self, chunk_index, samples, is_last_chunk, payload=None):
+        self.chunk_index = chunk_index
+        self.samples = samples
+        self.is_last_chunk = is_last_chunk
+        # 调用方附带的数据（例如原始音频字节），识别时原样交给处理函数
+        self.payload = payload
+        self.received_at = time.time()
+
+        # 处理结果；coalesced 表示音频并入了后续分片，dropped 表示积压过多被丢弃
+        self.done = False
+        self.result = None
+        self.error = None
+        self.coalesced = False
+        self.dropped = False
+
+    @property
+    def seconds(self):
+        return len(self.samples) / SAMPLE_RATE if self.samples is not None else 0.0
+
+
+class ChunkQueueTotals:
+    """所有会话累计合并和丢弃的分片数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.coalesced = 0
+        self.dropped = 0
+
+    def add(self, coalesced=0, dropped=0):
+        with self._lock:
+            self.coalesced += coalesced
+            self.dropped += dropped
+
+
+class ChunkQueue:
+    """一个会话的实时分片队列
+
+    同一会话同时只有一个线程执行识别，分片按索引顺序处理，识别结果也按
+    顺序插入和保存。识别进行中到达的分片先排队，下一次把排队的所有分片
+    合并为一次推理；较早的分片请求立即返回（标记为已合并），只有最新的
+    分片等待识别结果，积压不会占满请求线程。排队音频超过上限时丢弃最早的
+    分片，延迟不会无限增长。
+    """
+
+    def __init__(
+        self,
+        session_id,
+        strip_header=True,
+        max_pending_seconds=DEFAULT_MAX_PENDING_SECONDS,
+        slow_down_seconds=DEFAULT_SLOW_DOWN_SECONDS,
+        totals=None,
+    ):
+        """初始化分片队列
+
+        Args:
+            session_id: 会话ID（记录ID）
+            strip_header: 分片开头是否带有重复的 webm 文件头音频，合并前需要去掉
+            max_pending_seconds: 排队音频的上限（秒）
+            slow_down_seconds: 积压超过该秒数时提示客户端放慢发送
+            totals: 可选的 ChunkQueueTotals，累计合并和丢弃的分片数
+        """
+        self.session_id = session_id
+        self.max_pending_seconds = max_pending_seconds
+        self.slow_down_seconds = slow_down_seconds
+        self.totals = totals
+        self.header_detector = (
+            RepeatedHeaderDetector(session_id) if strip_header else None
+        )
+        self.last_active = time.time()
+
+        self._condition = threading.Condition()
+        self._pending = []
+        self._processing = None
+
+    def run(self, chunk_index, samples, is_last_chunk, process, payload=None):
+        """提交一个分片并等待处理
+
+        Args:
+            chunk_index: 分片索引
+            samples: 解码后的音频采样，结束标记没有音频时为 None
+            is_last_chunk: 是否为最后一个分片
+            process: 处理函数，参数为 (按索引排序的 PendingChunk 列表, 合并后的
+                音频采样或 None)，返回值作为本次提交的分片的结果
+            payload: 附带的数据
+
+        Returns:
+            PendingChunk: done 为 True，result 为处理结果；coalesced 或
+                dropped 为 True 时没有结果
+
+        Raises:
+            处理函数抛出的异常
+        """
+        chunk = PendingChunk(chunk_index, samples, is_last_chunk, payload)
+        with self._condition:
+            self.last_active = time.time()
+            coalesced = 0
+            for waiting in self._pending:
+                if not waiting.done:
+                    # 音频留在队列中与新分片一起识别，较早的请求不再等待
+                    waiting.done = True
+                    waiting.coalesced = True
+                    coalesced += 1
+            self._pending.append(chunk)
+            dropped = self._trim()
+            self._condition.notify_all()
+            if self.totals is not None and (coalesced or dropped):
+                self.totals.add(coalesced=coalesced, dropped=dropped)
+
+            while not chunk.done and self._processing is not None:
+                self._condition.wait()
+            if chunk.done:
+                return self._finish(chunk)
+            self._processing = self._take()
+
+        batch = self._processing
+        result = error = None
+        try:
+            result = process(batch, self._merge(batch))
+        except Exception as e:
+            error = e
+        finally:
+            with self._condition:
+                # 同一批中的其他分片在本分片到达时已经标记为合并
+                chunk.done = True
+                chunk.result = result
+                chunk.error = error
+                self._processing = None
+                self.last_active = time.time()
+                self._condition.notify_all()
+        return self._finish(chunk)
+
+    def lag_seconds(self):
+        """会话当前的积压：最早一个未识别完的分片已经等待的秒数"""
+        with self._condition:
+            return self._lag_locked()
+
+    def pending_seconds(self):
+        """排队等待识别的音频秒数"""
+        with self._condition:
+            return sum(chunk.seconds for chunk in self._pending)
+
+    def hint(self):
+        """返回给客户端的积压信息
+
+        Returns:
+            dict: lag_seconds 为积压秒数，slow_down 表示客户端应当放慢发送
+        """
+        lag = self.lag_seconds()
+        return {"lag_seconds": round(lag, 3), "slow_down": lag > self.slow_down_seconds}
+
+    def _finish(self, chunk):
+        if chunk.error is not None:
+            raise chunk.error
+        return chunk
+
+    def _lag_locked(self):
+        waiting = list(self._pending) + list(self._processing or [])
+        if not waiting:
+            return 0.0
+        return time.time() - min(chunk.received_at for chunk in waiting)
+
+    def _take(self):
+        """取出排队的所有分片，按索引排序"""
+        batch = sorted(
+            self._pending,
+            key=lambda chunk: (
+                chunk.chunk_index is None,
+                chunk.chunk_index or 0,
+                chunk.received_at,
+            ),
+        )
+        self._pending = []
+        return batch
+
+    def _trim(self):
+        """丢弃超出上限的最早的分片（最后一个分片和结束标记不丢弃）
+
+        Returns:
+            丢弃的分片数
+        """
+        dropped = 0
+        total = sum(chunk.seconds for chunk in self._pending)
+        while total > self.max_pending_seconds and len(self._pending) > 1:
+            oldest = self._pending[0]
+            if oldest.is_last_chunk:
+                break
+            self._pending.pop(0)
+            total -= oldest.seconds
+            oldest.done = True
+            oldest.coalesced = False
+            oldest.dropped = True
+            dropped += 1
+        if dropped:
+            logger.warning(
+                f"会话 {self.session_id} 识别积压过多，丢弃最早的 {dropped} 个分片"
+            )
+        return dropped
+
+    def _merge(self, batch):
+        """依次去掉每个分片重复的文件头后拼接音频"""
+        parts = []
+        for chunk in batch:
+            if chunk.samples is None:
+                continue
+            samples = chunk.samples
+            if self.header_detector is not None:
+                samples = self.header_detector.strip(samples)
+            parts.append(samples)
+        if not parts:
+            return None
+        if len(parts) > 1:
+            logger.info(
+                f"会话 {self.session_id} 合并 {len(parts)} 个排队的分片一起识别"
+            )
+        return np.concatenate(parts) if len(parts) > 1 else parts[0]
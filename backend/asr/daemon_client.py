@@ -0,0 +1,288 @@
+"""
+模型守护进程客户端 - 模型在独立的守护进程中加载，后端通过本地套接字调用，后端重启后模型仍在内存中
+"""
+
+import os
+import sys
+import time
+import logging
+import secrets
+import threading
+import subprocess
+from multiprocessing.connection import Client
+
+logger = logging.getLogger(__name__)
+
+# 连接守护进程的超时时间（秒）
+CONNECT_TIMEOUT = 5
+# 启动守护进程后等待其可以连接的最长时间（秒），不包括加载模型的时间
+SPAWN_TIMEOUT = 60
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ModelDaemonError(Exception):
+    """守护进程不可用或推理失败"""
+
+
+class _ConnectionLost(ModelDaemonError):
+    """连接在请求过程中断开"""
+
+
+def daemon_address(socket_path):
+    """套接字路径对应的连接地址（Windows 上使用同名的命名管道）"""
+    if sys.platform == "win32":
+        return r"\\.\pipe\funasr-" + os.path.basename(socket_path)
+    return socket_path
+
+
+def daemon_authkey(socket_path, create=False):
+    """读取守护进程的认证密钥
+
+    密钥保存在套接字旁边的 .key 文件中，只有当前用户可读；守护进程启动时
+    生成，客户端读取同一个文件。
+
+    Args:
+        socket_path: 套接字路径
+        create: 是否生成新的密钥（守护进程启动时）
+
+    Returns:
+        bytes: 密钥，文件不存在时返回 None
+    """
+    key_path = socket_path + ".key"
+    if create:
+        key = secrets.token_hex(32).encode()
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(key)
+        return key
+    try:
+        with open(key_path, "rb") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def request_daemon(socket_path, message, timeout=CONNECT_TIMEOUT):
+    """向守护进程发送一条请求（单独建立连接）
+
+    Args:
+        socket_path: 套接字路径
+        message: 请求字典
+        timeout: 等待响应的最长时间（秒）
+
+    Returns:
+        响应中的 result
+
+    Raises:
+        ModelDaemonError: 守护进程不可用或请求失败
+    """
+    conn = _connect(socket_path)
+    try:
+        return _exchange(conn, message, timeout)
+    finally:
+        conn.close()
+
+
+def ping_daemon(socket_path):
+    """守护进程的健康检查，不可用时返回 None"""
+    try:
+        return request_daemon(socket_path, {"type": "health"})
+    except ModelDaemonError:
+        return None
+
+
+def spawn_daemon(
+    socket_path, memory_budget_mb=0, max_resident_models=None, timeout=SPAWN_TIMEOUT
+):
+    """守护进程没有运行时在独立的会话中启动它，后端退出后守护进程继续运行
+
+    Args:
+        socket_path: 套接字路径
+        memory_budget_mb: 守护进程中常驻模型的内存预算（MB）
+        max_resident_models: 守护进程中最多常驻的模型数，None 表示使用默认值
+        timeout: 等待守护进程可以连接的最长时间（秒）
+
+    Returns:
+        dict: 守护进程的健康状态
+
+    Raises:
+        ModelDaemonError: 启动失败
+    """
+    health = ping_daemon(socket_path)
+    if health is not None:
+        logger.info(f"已连接到运行中的模型守护进程 (pid {health['pid']})")
+        return health
+
+    command = [
+        sys.executable,
+        "-m",
+        "asr.model_daemon",
+        "--socket",
+        socket_path,
+        "--log-file",
+        socket_path + ".log",
+    ]
+    if memory_budget_mb:
+        command += ["--model-memory-budget-mb", str(memory_budget_mb)]
+    if max_resident_models is not None:
+        command += ["--max-resident-models", str(max_resident_models)]
+    logger.info(f"启动模型守护进程: {' '.join(command)}")
+    options = {}
+    if sys.platform == "win32":
+        options["creationflags"] = (
+            subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        )
+    else:
+        options["start_new_session"] = True
+    process = subprocess.Popen(
+        command,
+        cwd=BACKEND_DIR,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        **options,
+    )
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        health = ping_daemon(socket_path)
+        if health is not None:
+            return health
+        if process.poll() is not None:
+            raise ModelDaemonError(
+                f"模型守护进程启动后退出，退出码 {process.returncode}，"
+                f"详见 {socket_path}.log"
+            )
+        time.sleep(0.2)
+    raise ModelDaemonError(f"等待模型守护进程启动超过 {timeout} 秒")
+
+
+def _connect(socket_path):
+    authkey = daemon_authkey(socket_path)
+    if authkey is None:
+        raise ModelDaemonError("模型守护进程未运行")
+    try:
+        return Client(daemon_address(socket_path), authkey=authkey)
+    except (OSError, EOFError) as e:
+        raise ModelDaemonError(f"无法连接模型守护进程: {e}")
+    except Exception as e:
+        # 认证失败（密钥文件属于旧的守护进程）
+        raise ModelDaemonError(f"连接模型守护进程失败: {e}")
+
+
+def _exchange(conn, message, timeout):
+    """发送请求并等待响应，timeout 为 None 时一直等待"""
+    try:
+        conn.send(message)
+        if timeout is not None and not conn.poll(timeout):
+            raise ModelDaemonError(f"模型守护进程超过 {timeout} 秒没有响应")
+        response = conn.recv()
+    except (OSError, EOFError) as e:
+        raise _ConnectionLost(f"模型守护进程连接中断: {e}")
+    if not response.get("ok"):
+        raise ModelDaemonError(response.get("error") or "模型守护进程请求失败")
+    return response.get("result")
+
+
+class ModelDaemonClient:
+    """守护进程中的一个模型
+
+    对外提供与 ASRWorkerPool 相同的 generate、stream_step 和 run_stage 接口，
+    供模型管理器和推理调度器使用。每个调用占用一个连接，空闲的连接保留下来
+    复用；守护进程重启后断开的连接会重新建立。音频采样随请求一起序列化，
+    本地套接字的传输开销远小于推理耗时。
+    """
+
+    def __init__(self, socket_path, model_params, task_timeout=120):
+        """初始化客户端
+
+        Args:
+            socket_path: 守护进程的套接字路径
+            model_params: 模型参数字典，守护进程按参数加载和查找模型
+            task_timeout: 单个推理请求的超时时间（秒）
+        """
+        self.socket_path = socket_path
+        self.model_params = dict(model_params)
+        self.task_timeout = task_timeout
+        self.memory_bytes = 0
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """让守护进程加载模型（已经加载时立即返回），加载失败时抛出 ModelDaemonError"""
+        result = self._call({"type": "load"}, wait=True)
+        self.memory_bytes = result.get("memory_bytes", 0)
+        logger.info(
+            f"模型守护进程已加载模型: {self.model_params['model']}"
+            f"{'（已常驻）' if result.get('resident') else ''}"
+        )
+
+    def stop(self):
+        """关闭连接（守护进程中的模型保留）"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def generate(self, input, **kwargs):
+        """在守护进程中执行识别（接口与 AutoModel.generate 相同）"""
+        return self._call({"type": "generate", "input": input, "kwargs": kwargs})
+
+    def stream_step(self, session_id, samples, **kwargs):
+        """在守护进程中执行一步流式推理，会话缓存保存在守护进程中"""
+        return self._call(
+            {
+                "type": "stream",
+                "session_id": session_id,
+                "input": samples,
+                "kwargs": kwargs,
+            }
+        )
+
+    def run_stage(self, stage, input, **kwargs):
+        """在守护进程中单独执行 VAD、识别或标点阶段"""
+        return self._call(
+            {"type": "stage", "stage": stage, "input": input, "kwargs": kwargs}
+        )
+
+    def health(self):
+        """守护进程的健康状态，不可用时返回 None"""
+        return ping_daemon(self.socket_path)
+
+    def _call(self, message, wait=False):
+        """发送请求，wait 为 True 时不限制等待时间（加载模型可能需要下载）"""
+        timeout = None if wait else self.task_timeout
+        message = dict(message, model_params=self.model_params)
+        # 复用的连接可能在守护进程重启后已经断开，换新连接重试一次
+        for attempt in range(2):
+            conn, reused = self._acquire()
+            try:
+                result = _exchange(conn, message, timeout)
+            except _ConnectionLost:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            self._release(conn)
+            return result
+
+    def _acquire(self):
+        with self._lock:
+            if self._closed:
+                raise ModelDaemonError("模型已释放")
+            if self._idle:
+                return self._idle.pop(), True
+        return _connect(self.socket_path), False
+
+    def _release(self, conn):
+        with self._lock:
+            if not self._closed:
+                self._idle.append(conn)
+                return
+        conn.close()
@@ -0,0 +1,336 @@
+"""
+文件转写任务模块 - 长音频/视频文件在后台线程中分段识别，任务状态保存在 SQLite 中
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime
+
+from asr.streaming import SAMPLE_RATE
+from asr.stitching import ChunkStitcher, DEFAULT_OVERLAP_SECONDS
+from utils.audio_decoder import iter_audio_frames, probe_duration
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+TERMINAL_STATUSES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# 每次送入模型的音频时长（秒）
+DEFAULT_WINDOW_SECONDS = 30
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+class JobManager:
+    """文件转写任务管理器
+
+    上传的文件先保存到磁盘并在数据库中登记为 queued，由后台线程依次处理：
+    按 window_seconds 分段识别，相邻段之间用 ChunkStitcher 重叠拼接，每段的
+    结果立即写入 recognition_chunks，并记录处理进度。服务异常退出后，运行中
+    的任务重新排队，从上次记录的进度继续。
+    """
+
+    def __init__(
+        self,
+        db_manager,
+        jobs_dir,
+        recognize,
+        is_ready=None,
+        num_workers=1,
+        window_seconds=DEFAULT_WINDOW_SECONDS,
+        overlap_seconds=DEFAULT_OVERLAP_SECONDS,
+    ):
+        """初始化任务管理器
+
+        Args:
+            db_manager: 数据库管理器
+            jobs_dir: 上传文件的保存目录
+            recognize: 识别函数，参数为 (采样数组, 任务参数)，返回 (文本, 时间戳)
+            is_ready: 返回模型是否可用的函数，模型不可用时任务等待
+            num_workers: 同时处理的任务数
+            window_seconds: 每段送入模型的音频时长（秒）
+            overlap_seconds: 相邻段重叠的音频时长（秒）
+        """
+        self.db_manager = db_manager
+        self.jobs_dir = jobs_dir
+        self.recognize = recognize
+        self.is_ready = is_ready or (lambda: True)
+        self.num_workers = num_workers
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+        self._condition = threading.Condition()
+        self._threads = []
+        self._running = False
+        # 正在运行的任务ID -> 取消标记
+        self._active = {}
+        # 每次任务状态变化时递增，用于进度推送
+        self.version = 0
+
+    def start(self):
+        """恢复中断的任务并启动后台线程"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+
+        requeued = self.db_manager.requeue_interrupted_jobs()
+        if requeued:
+            logger.info(f"恢复了 {requeued} 个中断的转写任务")
+
+        self._threads = [
+            threading.Thread(
+                target=self._worker_loop, name=f"job-worker-{i}", daemon=True
+            )
+            for i in range(self.num_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"转写任务线程已启动: {self.num_workers} 个")
+
+    def stop(self):
+        """停止后台线程，运行中的任务保持 running 状态，下次启动时继续"""
+        with self._condition:
+            self._running = False
+            for cancel_event in self._active.values():
+                cancel_event.set()
+            self._condition.notify_all()
+
+    def submit_upload(self, file_storage, options=None):
+        """保存上传的文件并创建任务
+
+        Args:
+            file_storage: werkzeug 的 FileStorage 对象
+            options: 识别参数字典
+
+        Returns:
+            任务字典，失败时返回 None
+        """
+        job_id = uuid.uuid4().hex
+        file_name = file_storage.filename or ""
+        ext = os.path.splitext(file_name)[1].lower()[:10]
+        file_path = os.path.join(self.jobs_dir, f"{job_id}{ext}")
+        # 按块写入磁盘，不把整个文件读入内存
+        file_storage.save(file_path)
+        return self._create(job_id, file_path, file_name, options)
+
+    def submit_path(self, file_path, options=None):
+        """为本机上已有的文件创建任务（不复制文件）
+
+        Args:
+            file_path: 本地文件路径
+            options: 识别参数字典
+
+        Returns:
+            任务字典，失败时返回 None
+        """
+        return self._create(
+            uuid.uuid4().hex, file_path, os.path.basename(file_path), options
+        )
+
+    def cancel(self, job_id):
+        """取消任务
+
+        Returns:
+            bool: 是否取消成功（已结束的任务不能取消）
+        """
+        job = self.db_manager.get_job(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return False
+
+        with self._condition:
+            cancel_event = self._active.get(job_id)
+            if cancel_event is not None:
+                # 运行中的任务在处理完当前段之后停止
+                cancel_event.set()
+            else:
+                self.db_manager.update_job(
+                    job_id, status=JOB_CANCELLED, finished_at=datetime.now().isoformat()
+                )
+            self._notify()
+        return True
+
+    def get_job(self, job_id):
+        """获取任务"""
+        return self.db_manager.get_job(job_id)
+
+    def list_jobs(self, status=None, limit=100):
+        """获取任务列表"""
+        return self.db_manager.get_jobs(status=status, limit=limit)
+
+    def wait_for_update(self, version, timeout):
+        """等待任务状态变化
+
+        Args:
+            version: 调用方已知的版本号
+            timeout: 最长等待秒数
+
+        Returns:
+            最新的版本号
+        """
+        with self._condition:
+            if self.version == version:
+                self._condition.wait(timeout)
+            return self.version
+
+    def _create(self, job_id, file_path, file_name, options):
+        if not self.db_manager.add_job(job_id, file_path, file_name, options):
+            return None
+        with self._condition:
+            self._notify()
+        logger.info(f"创建转写任务 {job_id}: {file_name}")
+        return self.db_manager.get_job(job_id)
+
+    def _notify(self):
+        """状态变化，唤醒等待的线程（调用方持有锁）"""
+        self.version += 1
+        self._condition.notify_all()
+
+    def _claim_next(self):
+        """取出下一个排队的任务，没有任务或模型未就绪时阻塞"""
+        with self._condition:
+            while self._running:
+                if self.is_ready():
+                    for job in self.db_manager.get_jobs(status=JOB_QUEUED, limit=10):
+                        if job["id"] in self._active:
+                            continue
+                        self._active[job["id"]] = threading.Event()
+                        self.db_manager.update_job(
+                            job["id"],
+                            status=JOB_RUNNING,
+                            started_at=job["started_at"] or datetime.now().isoformat(),
+                        )
+                        self._notify()
+                        return job
+                self._condition.wait(1.0)
+            return None
+
+    def _worker_loop(self):
+        while self._running:
+            job = self._claim_next()
+            if job is None:
+                continue
+            cancel_event = self._active[job["id"]]
+            try:
+                self._run_job(job, cancel_event)
+            except JobCancelled:
+                if self._running:
+                    logger.info(f"转写任务 {job['id']} 已取消")
+                    self._finish(job["id"], status=JOB_CANCELLED)
+            except Exception as e:
+                logger.error(f"转写任务 {job['id']} 失败: {e}")
+                self._finish(job["id"], status=JOB_FAILED, error=str(e))
+            finally:
+                with self._condition:
+                    self._active.pop(job["id"], None)
+                    self._notify()
+
+    def _finish(self, job_id, **fields):
+        self.db_manager.update_job(
+            job_id, finished_at=datetime.now().isoformat(), **fields
+        )
+
+    def _update_progress(self, job_id, **fields):
+        self.db_manager.update_job(job_id, **fields)
+        with self._condition:
+            self._notify()
+
+    def _run_job(self, job, cancel_event):
+        job_id = job["id"]
+        options = job["options"]
+
+        record_id = job["record_id"]
+        if record_id is None:
+            record_id = self.db_manager.add_record(
+                text="", mode="file", is_chunked=True
+            )
+            self.db_manager.update_job(job_id, record_id=record_id)
+
+        # 从上次中断的位置继续，往前多取一段重叠音频用于拼接
+        resume_seconds = job["processed_seconds"] or 0.0
+        preroll_seconds = min(resume_seconds, self.overlap_seconds)
+        chunk_index = job["next_chunk_index"] or 0
+        if resume_seconds:
+            logger.info(f"转写任务 {job_id} 从 {resume_seconds:.1f}s 处继续")
+        # 中断前可能已经写入了尚未记录进度的分片
+        self.db_manager.delete_chunks_from(record_id, chunk_index)
+
+        started = time.perf_counter()
+        duration = probe_duration(job["file_path"])
+        if duration:
+            self._update_progress(job_id, duration_seconds=round(duration, 3))
+
+        stitcher = ChunkStitcher(
+            job_id, overlap_seconds=self.overlap_seconds, strip_header=False
+        )
+        preroll = int(preroll_seconds * SAMPLE_RATE)
+        window_start = resume_seconds - preroll_seconds
+        # 边解码边识别，内存中只保留当前这一段音频
+        windows = iter_audio_frames(
+            job["file_path"], self.window_seconds, start_seconds=window_start
+        )
+        try:
+            for samples in windows:
+                if cancel_event.is_set():
+                    raise JobCancelled()
+
+                if preroll:
+                    stitcher.prime(samples[:preroll])
+                    samples = samples[preroll:]
+                    window_start += preroll / SAMPLE_RATE
+                    preroll = 0
+                    if not len(samples):
+                        continue
+
+                audio = stitcher.prepare(samples)
+                text, timestamps = self.recognize(audio, options)
+                text = stitcher.merge(text, timestamps)
+                if text:
+                    self.db_manager.add_chunk(
+                        record_id=record_id, chunk_index=chunk_index, text=text
+                    )
+                    chunk_index += 1
+
+                window_start += len(samples) / SAMPLE_RATE
+                fields = {
+                    "processed_seconds": round(window_start, 3),
+                    "next_chunk_index": chunk_index,
+                }
+                if duration:
+                    fields["progress"] = round(min(window_start / duration, 0.999), 4)
+                self._update_progress(job_id, **fields)
+        finally:
+            # 任务取消或识别出错时结束解码进程
+            windows.close()
+
+        tail_text = stitcher.finish()
+        if tail_text:
+            self.db_manager.add_chunk(
+                record_id=record_id, chunk_index=chunk_index, text=tail_text
+            )
+
+        chunks = self.db_manager.get_chunks_by_record_id(record_id)
+        full_text = "".join(chunk["text"] for chunk in chunks)
+        self.db_manager.update_record_text(record_id, full_text)
+        self._finish(
+            job_id,
+            status=JOB_DONE,
+            progress=1.0,
+            duration_seconds=round(window_start, 3),
+        )
+        logger.info(
+            f"转写任务 {job_id} 完成: 音频 {window_start:.1f}s，"
+            f"耗时 {time.perf_counter() - started:.1f}s"
+        )
@@ -0,0 +1,174 @@
+"""
+长音频识别模块 - 先用 VAD 切分语音段，多个语音段并行识别，按时间顺序拼接后统一加标点
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from asr.streaming import SAMPLE_RATE
+from asr.stitching import split_tokens, join_tokens
+
+logger = logging.getLogger(__name__)
+
+# 超过该时长的一次性识别使用长音频模式（秒）
+DEFAULT_LONG_AUDIO_SECONDS = 60
+# 相邻的短语音段合并后送入模型的最大时长（秒）
+DEFAULT_MAX_SEGMENT_SECONDS = 20
+
+# 可以单独执行的模型阶段
+STAGE_VAD = "vad"
+STAGE_ASR = "asr"
+STAGE_PUNC = "punc"
+
+
+def run_model_stage(model, stage, input, **kwargs):
+    """在 AutoModel 上单独执行 VAD、识别或标点中的一个阶段
+
+    AutoModel.generate 会把 VAD、识别、标点串在一起按顺序执行，这里直接
+    调用 inference 分别执行各个阶段，识别阶段可以分散到多个进程中。
+
+    Args:
+        model: FunASR AutoModel
+        stage: 阶段名称（vad/asr/punc）
+        input: 音频采样（vad/asr）或文本（punc）
+        **kwargs: 推理参数
+
+    Returns:
+        结果列表，模型没有配置该阶段时返回 None
+    """
+    if stage == STAGE_VAD:
+        if getattr(model, "vad_model", None) is None:
+            return None
+        return model.inference(
+            input, model=model.vad_model, kwargs=model.vad_kwargs, **kwargs
+        )
+    if stage == STAGE_PUNC:
+        if getattr(model, "punc_model", None) is None:
+            return None
+        return model.inference(
+            input, model=model.punc_model, kwargs=model.punc_kwargs, **kwargs
+        )
+    return model.inference(input, **kwargs)
+
+
+def group_segments(segments, max_seconds=DEFAULT_MAX_SEGMENT_SECONDS):
+    """把 VAD 切出的相邻语音段合并为不超过 max_seconds 的识别单元
+
+    语音段太短时模型调用的固定开销占比高，合并后再分发；单个超长的语音段
+    保持不变。
+
+    Args:
+        segments: [[开始毫秒, 结束毫秒], ...]
+        max_seconds: 合并后的最大时长（秒）
+
+    Returns:
+        [(开始毫秒, 结束毫秒), ...]，按时间顺序排列
+    """
+    max_ms = max_seconds * 1000
+    groups = []
+    for begin, end in sorted((int(begin), int(end)) for begin, end in segments):
+        if end <= begin:
+            continue
+        if groups and end - groups[-1][0] <= max_ms:
+            groups[-1] = (groups[-1][0], end)
+        else:
+            groups.append((begin, end))
+    return groups
+
+
+class LongAudioTranscriber:
+    """长音频识别
+
+    先对整段音频执行 VAD，把语音段合并为若干识别单元，同时提交给多个
+    工作进程识别，结果按开始时间排序拼接，最后对全文执行一次标点恢复。
+    分段识别时不加标点，避免每段结尾被强行断句。
+    """
+
+    def __init__(
+        self,
+        run_stage,
+        parallelism=1,
+        max_segment_seconds=DEFAULT_MAX_SEGMENT_SECONDS,
+        postprocess=None,
+    ):
+        """初始化长音频识别
+
+        Args:
+            run_stage: 执行模型阶段的函数，参数为 (阶段, 输入, **推理参数)，
+                返回值与 run_model_stage 相同
+            parallelism: 同时识别的语音段数，通常等于工作进程数
+            max_segment_seconds: 合并后每个识别单元的最大时长（秒）
+            postprocess: 可选的单段文本后处理函数（例如去掉 SenseVoice 标签）
+        """
+        self.run_stage = run_stage
+        self.parallelism = max(1, parallelism)
+        self.max_segment_seconds = max_segment_seconds
+        self.postprocess = postprocess
+
+    def transcribe(self, samples, **kwargs):
+        """识别一段长音频
+
+        Args:
+            samples: 16kHz 音频采样
+            **kwargs: 识别阶段的推理参数（语言、热词等）
+
+        Returns:
+            dict: text 为全文；segments 为每个识别单元的开始、结束毫秒和文本；
+                timestamp 为每个词相对整段音频的 [开始, 结束] 毫秒时间，
+                模型不输出时间戳时为 None
+        """
+        vad_result = self.run_stage(STAGE_VAD, samples)
+        if vad_result is None:
+            raise RuntimeError("当前模型没有配置 VAD 模型，无法使用长音频模式")
+        segments = vad_result[0].get("value", []) if vad_result else []
+        groups = group_segments(segments, self.max_segment_seconds)
+        logger.info(
+            f"长音频识别: {len(samples) / SAMPLE_RATE:.1f}s 音频，"
+            f"{len(segments)} 个语音段合并为 {len(groups)} 个识别单元"
+        )
+
+        def recognize_group(group):
+            begin = int(group[0] * SAMPLE_RATE / 1000)
+            end = int(group[1] * SAMPLE_RATE / 1000)
+            result = self.run_stage(STAGE_ASR, samples[begin:end], **kwargs)
+            return result[0] if result else {}
+
+        with ThreadPoolExecutor(
+            max_workers=self.parallelism, thread_name_prefix="long-audio"
+        ) as executor:
+            # map 按提交顺序返回结果，即按语音段的时间顺序
+            results = list(executor.map(recognize_group, groups))
+
+        tokens = []
+        timestamps = []
+        has_timestamps = True
+        output_segments = []
+        for (begin_ms, end_ms), result in zip(groups, results):
+            text = result.get("text", "")
+            if self.postprocess is not None:
+                text = self.postprocess(text)
+            group_tokens = split_tokens(text)
+            group_timestamps = result.get("timestamp")
+            if group_timestamps and len(group_timestamps) == len(group_tokens):
+                timestamps.extend(
+                    [begin_ms + span[0], begin_ms + span[1]]
+                    for span in group_timestamps
+                )
+            elif group_tokens:
+                has_timestamps = False
+            tokens.extend(group_tokens)
+            output_segments.append(
+                {"start": begin_ms, "end": end_ms, "text": join_tokens(group_tokens)}
+            )
+
+        text = join_tokens(tokens)
+        if text:
+            punc_result = self.run_stage(STAGE_PUNC, text)
+            if punc_result:
+                text = punc_result[0].get("text", text)
+
+        return {
+            "text": text,
+            "segments": output_segments,
+            "timestamp": timestamps if has_timestamps and tokens else None,
+        }
@@ -0,0 +1,318 @@
+"""
+模型守护进程 - 在独立的进程中持有已加载的模型，通过本地套接字为后端提供推理，后端重启后不需要重新加载模型
+
+在 backend 目录下运行:
+    python -m asr.model_daemon --socket /tmp/funasr-models.sock
+    python -m asr.model_daemon --socket /tmp/funasr-models.sock --health
+    python -m asr.model_daemon --socket /tmp/funasr-models.sock --shutdown
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from multiprocessing.connection import Client, Listener
+
+from asr.daemon_client import (
+    ModelDaemonError,
+    daemon_address,
+    daemon_authkey,
+    ping_daemon,
+    request_daemon,
+)
+from asr.long_audio import run_model_stage
+from asr.model_manager import DEFAULT_MAX_RESIDENT_MODELS, ModelManager
+
+logger = logging.getLogger(__name__)
+
+# 流式缓存超过该时间未使用时清理（秒）
+STREAM_CACHE_IDLE_SECONDS = 600
+
+
+class ModelDaemon:
+    """模型守护进程
+
+    模型由守护进程内的 ModelManager 按参数加载并常驻内存，超出内存预算时
+    按最近最少使用的顺序释放。每个连接由一个线程处理，同一个模型同一时间
+    只执行一个推理；流式识别的缓存按会话保存在守护进程中。
+    """
+
+    def __init__(
+        self,
+        socket_path,
+        memory_budget_bytes=0,
+        max_resident_models=DEFAULT_MAX_RESIDENT_MODELS,
+    ):
+        """初始化守护进程
+
+        Args:
+            socket_path: 监听的套接字路径
+            memory_budget_bytes: 常驻模型的内存预算（字节），0 表示不限制
+            max_resident_models: 最多同时常驻的模型数，0 表示不限制
+        """
+        self.socket_path = socket_path
+        self.model_manager = ModelManager(
+            memory_budget_bytes=memory_budget_bytes,
+            max_resident_models=max_resident_models,
+        )
+        self.started_at = time.time()
+        self.requests = 0
+        self.errors = 0
+
+        self._listener = None
+        self._authkey = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._connections = 0
+        # (模型参数键, 模型代数, 会话ID) -> [cache, 最后使用时间]
+        self._caches = {}
+
+    def serve_forever(self):
+        """监听套接字并处理请求，直到收到停止请求
+
+        Raises:
+            ModelDaemonError: 已经有守护进程在同一个套接字上运行
+        """
+        if ping_daemon(self.socket_path) is not None:
+            raise ModelDaemonError(f"模型守护进程已经在运行: {self.socket_path}")
+        if sys.platform != "win32" and os.path.exists(self.socket_path):
+            # 上次异常退出留下的套接字文件
+            os.unlink(self.socket_path)
+
+        self._authkey = daemon_authkey(self.socket_path, create=True)
+        self._listener = Listener(
+            daemon_address(self.socket_path), authkey=self._authkey
+        )
+        if sys.platform != "win32":
+            os.chmod(self.socket_path, 0o600)
+        self._running = True
+        logger.info(f"模型守护进程已启动 (pid {os.getpid()}): {self.socket_path}")
+
+        try:
+            while self._running:
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError) as e:
+                    if not self._running:
+                        break
+                    logger.warning(f"接受连接失败: {e}")
+                    continue
+                except Exception as e:
+                    # 认证失败
+                    logger.warning(f"拒绝连接: {e}")
+                    continue
+                if not self._running:
+                    conn.close()
+                    break
+                threading.Thread(
+                    target=self._serve_connection,
+                    args=(conn,),
+                    name="model-daemon-conn",
+                    daemon=True,
+                ).start()
+        finally:
+            self._close()
+
+    def shutdown(self):
+        """停止接受请求，监听循环退出后卸载模型"""
+        if not self._running:
+            return
+        logger.info("模型守护进程收到停止请求")
+        self._running = False
+        # 连接一次自己，唤醒阻塞在 accept 中的监听循环
+        try:
+            Client(daemon_address(self.socket_path), authkey=self._authkey).close()
+        except Exception:
+            pass
+
+    def health(self):
+        """健康状态：进程、请求计数和常驻模型"""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "socket": self.socket_path,
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "requests": self.requests,
+                "errors": self.errors,
+                "connections": self._connections,
+                "stream_sessions": len(self._caches),
+                "models": self.model_manager.get_resident_status(),
+            }
+
+    def _close(self):
+        if self._listener is not None:
+            self._listener.close()
+        self.model_manager.unload()
+        for path in (self.socket_path + ".key", self.socket_path):
+            if sys.platform == "win32" and path == self.socket_path:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        logger.info("模型守护进程已退出")
+
+    def _serve_connection(self, conn):
+        """处理一个连接上的请求，直到客户端断开"""
+        with self._lock:
+            self._connections += 1
+        try:
+            while self._running:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    break
+                response = self._handle(message)
+                try:
+                    conn.send(response)
+                except (OSError, ValueError):
+                    break
+                if message.get("type") == "shutdown":
+                    self.shutdown()
+                    break
+        finally:
+            conn.close()
+            with self._lock:
+                self._connections -= 1
+
+    def _handle(self, message):
+        """执行一个请求
+
+        Returns:
+            dict: ok 表示是否成功，成功时 result 为结果，失败时 error 为原因
+        """
+        kind = message.get("type")
+        try:
+            if kind == "health":
+                result = self.health()
+            elif kind == "shutdown":
+                result = {"pid": os.getpid()}
+            elif kind == "load":
+                result = self._load(message["model_params"])
+            elif kind in ("generate", "stage", "stream"):
+                with self._lock:
+                    self.requests += 1
+                result = self._infer(kind, message)
+            else:
+                raise ValueError(f"未知的请求类型: {kind}")
+            return {"ok": True, "result": result}
+        except Exception as e:
+            logger.error(f"处理 {kind} 请求失败: {e}")
+            with self._lock:
+                self.errors += 1
+            return {"ok": False, "error": str(e)}
+
+    def _load(self, model_params):
+        """加载模型（已经常驻时立即返回）"""
+        resident = self.model_manager.is_resident(model_params)
+        entry = self.model_manager.ensure_loaded(model_params)
+        return {"resident": resident, "memory_bytes": entry.memory_bytes}
+
+    def _infer(self, kind, message):
+        kwargs = message.get("kwargs") or {}
+        with self.model_manager.use(
+            message["model_params"]
+        ) as entry, entry.exclusive():
+            if kind == "generate":
+                return entry.model.generate(input=message["input"], **kwargs)
+            if kind == "stage":
+                return run_model_stage(
+                    entry.model, message["stage"], message["input"], **kwargs
+                )
+            key = (entry.key, entry.generation, message["session_id"])
+            cache = self._stream_cache(key)
+            result = entry.model.inference(
+                input=message["input"], cache=cache, **kwargs
+            )
+            if kwargs.get("is_final"):
+                with self._lock:
+                    self._caches.pop(key, None)
+            return result
+
+    def _stream_cache(self, key):
+        """获取流式会话的缓存，同时清理长时间未使用的缓存"""
+        now = time.time()
+        with self._lock:
+            for expired in [
+                cache_key
+                for cache_key, (_, used_at) in self._caches.items()
+                if now - used_at > STREAM_CACHE_IDLE_SECONDS
+            ]:
+                del self._caches[expired]
+            item = self._caches.setdefault(key, [{}, now])
+            item[1] = now
+            return item[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FunASR 模型守护进程")
+    parser.add_argument("--socket", type=str, required=True, help="监听的套接字路径")
+    parser.add_argument(
+        "--model-memory-budget-mb",
+        type=float,
+        default=0,
+        help="常驻模型的内存预算（MB），超出后按最近最少使用的顺序释放，0 表示不限制",
+    )
+    parser.add_argument(
+        "--max-resident-models",
+        type=int,
+        default=DEFAULT_MAX_RESIDENT_MODELS,
+        help="最多同时常驻的模型数，超出后按最近最少使用的顺序释放，0 表示不限制",
+    )
+    parser.add_argument(
+        "--log-file", type=str, default="", help="日志文件，为空时输出到标准错误"
+    )
+    parser.add_argument(
+        "--health",
+        action="store_true",
+        help="检查守护进程是否在运行，输出健康状态（不可用时退出码为 1）",
+    )
+    parser.add_argument("--shutdown", action="store_true", help="停止运行中的守护进程")
+    args = parser.parse_args()
+
+    if args.health:
+        health = ping_daemon(args.socket)
+        if health is None:
+            print("模型守护进程未运行")
+            return 1
+        print(json.dumps(health, ensure_ascii=False, indent=2))
+        return 0
+
+    if args.shutdown:
+        try:
+            request_daemon(args.socket, {"type": "shutdown"})
+        except ModelDaemonError as e:
+            print(f"停止模型守护进程失败: {e}")
+            return 1
+        print("模型守护进程已停止")
+        return 0
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        filename=args.log_file or None,
+    )
+    # 收到 SIGTERM 时退出监听循环，卸载模型并删除套接字
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    daemon = ModelDaemon(
+        args.socket,
+        memory_budget_bytes=int(max(0, args.model_memory_budget_mb) * 1024 * 1024),
+        max_resident_models=max(0, args.max_resident_models),
+    )
+    try:
+        daemon.serve_forever()
+    except ModelDaemonError as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
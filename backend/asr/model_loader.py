@@ -0,0 +1,242 @@
+"""
+模型加载模块 - 根据模型参数构造 FunASR AutoModel，并记录分阶段的加载进度
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from asr.backends import (
+    BACKEND_ONNX,
+    BACKEND_TORCH_INT8,
+    OnnxModel,
+    quantize_model_int8,
+    resolve_backend,
+    resolve_device,
+)
+from asr.streaming import (
+    SAMPLE_RATE,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_ENCODER_CHUNK_LOOK_BACK,
+    DEFAULT_DECODER_CHUNK_LOOK_BACK,
+    is_streaming_model,
+)
+
+logger = logging.getLogger(__name__)
+
+# 加载阶段: (名称, 描述)
+LOAD_STAGES = [
+    ("import", "导入 FunASR"),
+    ("download", "下载/校验模型文件"),
+    ("build", "构建模型"),
+    ("quantize", "int8 量化"),
+    ("warmup", "预热推理"),
+]
+
+# 预热使用的合成音频时长（秒）
+WARMUP_SECONDS = 1.0
+
+
+class LoadProgress:
+    """模型加载进度，记录每个阶段的状态和耗时"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """重置为初始状态"""
+        with self._lock:
+            self.stages = [
+                {"name": name, "label": label, "status": "pending", "duration": None}
+                for name, label in LOAD_STAGES
+            ]
+            self.current_stage = None
+            self.ready = False
+            self.error = None
+            self.started_at = None
+            self.finished_at = None
+
+    @contextmanager
+    def stage(self, name):
+        """标记一个加载阶段的开始和结束
+
+        Args:
+            name: 阶段名称
+        """
+        entry = self._get_stage(name)
+        started = time.perf_counter()
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.time()
+            self.current_stage = name
+            entry["status"] = "running"
+        logger.info(f"模型加载阶段开始: {entry['label']}")
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                entry["status"] = "failed"
+                entry["duration"] = round(time.perf_counter() - started, 3)
+                self.error = str(e)
+            raise
+        with self._lock:
+            entry["status"] = "done"
+            entry["duration"] = round(time.perf_counter() - started, 3)
+        logger.info(f"模型加载阶段完成: {entry['label']}，耗时 {entry['duration']}s")
+
+    def skip(self, name, reason=""):
+        """标记阶段被跳过"""
+        with self._lock:
+            entry = self._get_stage(name)
+            entry["status"] = "skipped"
+            if reason:
+                entry["reason"] = reason
+
+    def mark_ready(self):
+        """所有阶段完成，模型可以处理请求"""
+        with self._lock:
+            self.ready = True
+            self.current_stage = None
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        """获取当前进度"""
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "current_stage": self.current_stage,
+                "error": self.error,
+                "stages": [dict(entry) for entry in self.stages],
+                "total_duration": (
+                    round(self.finished_at - self.started_at, 3)
+                    if self.finished_at and self.started_at
+                    else None
+                ),
+            }
+
+    def _get_stage(self, name):
+        for entry in self.stages:
+            if entry["name"] == name:
+                return entry
+        raise KeyError(name)
+
+
+def build_model_kwargs(model_params):
+    """把模型参数转换为 AutoModel 的构造参数
+
+    Args:
+        model_params: 模型参数字典（model、vad_model、punc_model 等）
+
+    Returns:
+        dict: AutoModel 构造参数
+    """
+    # 准备模型参数
+    model_kwargs = {}
+
+    # 添加模型名称
+    model_kwargs["model"] = model_params["model"]
+
+    # 添加VAD模型（如果有）
+    if model_params["vad_model"]:
+        model_kwargs["vad_model"] = model_params["vad_model"]
+
+    # 添加标点模型（如果有）
+    if model_params["punc_model"]:
+        model_kwargs["punc_model"] = model_params["punc_model"]
+
+    # 添加说话人分割模型（如果有）
+    if model_params["spk_model"]:
+        model_kwargs["spk_model"] = model_params["spk_model"]
+
+    # 设置是否禁用自动更新
+    model_kwargs["disable_update"] = model_params["disable_update"]
+
+    # 设置设备类型（CUDA 或 CPU，auto 时自动检测）
+    model_kwargs["device"] = resolve_device(model_params["device"])
+
+    # 设置 GPU 设备 ID
+    model_kwargs["ngpu"] = model_params["ngpu"]
+
+    # 设置热词
+    if model_params["hotwords"]:
+        model_kwargs["hotwords"] = model_params["hotwords"]
+
+    return model_kwargs
+
+
+def download_models(model_params):
+    """预先下载或校验模型文件，使构建阶段只从本地加载
+
+    Args:
+        model_params: 模型参数字典
+
+    Returns:
+        bool: 是否执行了下载/校验（当前 FunASR 版本不支持时返回 False）
+    """
+    try:
+        from funasr.download.download_from_hub import download_model
+    except ImportError:
+        logger.info("当前 FunASR 版本不支持单独下载模型，将在构建时下载")
+        return False
+
+    for key in ("model", "vad_model", "punc_model", "spk_model"):
+        name = model_params.get(key)
+        if name:
+            download_model(model=name, check_latest=not model_params["disable_update"])
+    return True
+
+
+def warmup_model(model, model_params, seconds=WARMUP_SECONDS):
+    """用一段合成音频执行一次推理，提前完成首次推理的初始化开销
+
+    Args:
+        model: AutoModel 实例
+        model_params: 模型参数字典
+        seconds: 合成音频的时长（秒）
+    """
+    rng = np.random.RandomState(0)
+    samples = (rng.randn(int(SAMPLE_RATE * seconds)) * 0.01).astype(np.float32)
+
+    if is_streaming_model(model_params["model"]):
+        model.inference(
+            input=samples,
+            cache={},
+            is_final=True,
+            chunk_size=DEFAULT_CHUNK_SIZE,
+            encoder_chunk_look_back=DEFAULT_ENCODER_CHUNK_LOOK_BACK,
+            decoder_chunk_look_back=DEFAULT_DECODER_CHUNK_LOOK_BACK,
+        )
+    else:
+        model.generate(input=samples, language="auto", use_itn=True)
+
+
+def create_model(model_params, quantize=True):
+    """按模型参数中的推理后端创建 FunASR 模型
+
+    Args:
+        model_params: 模型参数字典，backend 为 torch（默认）、torch-int8 或 onnx
+        quantize: torch-int8 后端是否在创建后立即量化；为 False 时由调用方
+            调用 quantize_model_int8（例如单独记录量化耗时）
+
+    Returns:
+        funasr.AutoModel 实例；ONNX 后端为接口相同的 OnnxModel
+    """
+    backend = resolve_backend(model_params)
+    if backend == BACKEND_ONNX:
+        logger.info(f"使用 ONNX 后端加载模型: {model_params['model']}")
+        return OnnxModel(model_params)
+
+    import funasr
+
+    model_kwargs = build_model_kwargs(model_params)
+    logger.info(f"最终模型参数: {model_kwargs}")
+    model = funasr.AutoModel(**model_kwargs)
+    if backend == BACKEND_TORCH_INT8 and quantize:
+        quantize_model_int8(model)
+    # 记录实际使用的后端（不支持时会回退为 PyTorch，与参数不同）
+    model.inference_backend = backend
+    return model
@@ -0,0 +1,635 @@
+"""
+模型管理模块 - 在后台加载新模型，原子替换当前模型；多个模型可以同时常驻内存，
+超出内存预算时按最近最少使用的顺序释放
+"""
+
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+from asr.daemon_client import ModelDaemonClient, spawn_daemon
+from asr.backends import BACKEND_TORCH_INT8, quantize_model_int8
+from asr.model_loader import LoadProgress, create_model, download_models, warmup_model
+from asr.worker_pool import ASRWorkerPool
+
+logger = logging.getLogger(__name__)
+
+# 最多同时常驻的模型数（包括当前模型），没有设置内存预算时同样生效
+DEFAULT_MAX_RESIDENT_MODELS = 3
+
+
+class ModelNotLoadedError(Exception):
+    """当前没有可用的模型"""
+
+
+def params_key(model_params):
+    """模型参数对应的缓存键，参数相同的模型只加载一次"""
+    return tuple(sorted((name, repr(value)) for name, value in model_params.items()))
+
+
+def process_rss_bytes(pid=None):
+    """进程的常驻内存（字节），无法获取时返回 None
+
+    Args:
+        pid: 进程ID，None 表示当前进程
+    """
+    try:
+        import psutil
+
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    except ImportError:
+        pass
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def available_memory_bytes():
+    """系统当前可用的内存（字节），无法获取时返回 None"""
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class ModelEntry:
+    """一个已加载的模型及其使用计数"""
+
+    def __init__(self, model, model_params, generation, memory_bytes=0, warmed_up=True):
+        self.model = model
+        self.model_params = dict(model_params)
+        self.key = params_key(model_params)
+        # 每次替换模型时递增，流式会话据此判断缓存是否仍然有效
+        self.generation = generation
+        # 加载前后进程常驻内存的增量，用于按内存预算淘汰（加载时有其他请求
+        # 在推理会偏大）
+        self.memory_bytes = memory_bytes
+        # 是否完成过一次成功的推理（预热或真实请求），就绪检查以此为准
+        self.warmed_up = warmed_up
+        self.inflight = 0
+        self.retired = False
+        self.last_used = time.time()
+        self.lock = threading.Lock()
+
+    def exclusive(self):
+        """调用模型时持有的锁
+
+        服务进程中的模型可能同时被调度线程和后台线程使用，同一时间只能有
+        一个线程调用；工作进程池和模型守护进程自行分配任务，不需要加锁。
+        """
+        if isinstance(self.model, (ASRWorkerPool, ModelDaemonClient)):
+            return nullcontext()
+        return self.lock
+
+
+class ModelManager:
+    """ASR 模型管理器（蓝绿切换 + 多模型常驻）
+
+    新模型在后台线程中加载并预热，期间旧模型继续处理请求；加载完成后在锁内
+    替换当前模型引用。
+
+    请求也可以指定其他模型参数，对应的模型在服务进程中加载后常驻内存，
+    以模型参数为键保存，下次使用不再加载。设置了内存预算时被替换的当前模型
+    同样保留，否则在最后一个使用它的请求结束后释放。所有常驻模型的内存之和
+    超过预算或常驻模型数超过上限时，按最近最少使用的顺序淘汰（当前模型
+    除外），被淘汰的模型在最后一个使用它的请求结束后才释放。
+
+    每个模型的内存按加载前后进程常驻内存的差值估算。加载期间其他线程仍在
+    推理，推理产生的临时内存也会计入，预算只是近似的上限。
+
+    设置 daemon_socket 后模型在模型守护进程中加载，这里只保存调用它的客户端，
+    服务进程重启后守护进程中的模型仍然可用。
+    """
+
+    def __init__(
+        self, memory_budget_bytes=0, max_resident_models=DEFAULT_MAX_RESIDENT_MODELS
+    ):
+        """初始化模型管理器
+
+        Args:
+            memory_budget_bytes: 常驻模型的内存预算（字节），0 表示不限制
+            max_resident_models: 最多同时常驻的模型数，0 表示不限制
+        """
+        self._lock = threading.Lock()
+        self._current = None
+        self._generation = 0
+        # 参数键 -> ModelEntry，按最近使用的顺序排列（最近使用的在最后）
+        self._resident = OrderedDict()
+        # 参数键 -> 加载完成事件，同一组参数同时只加载一次
+        self._resident_loading = {}
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_resident_models = max_resident_models
+        # 模型守护进程的套接字路径，设置后模型在守护进程中加载，服务进程只持有客户端
+        self.daemon_socket = None
+        self.loading = False
+        self.load_error = None
+        self.progress = LoadProgress()
+
+        # 常驻模型的命中、加载和淘汰次数
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def model(self):
+        """当前模型，未加载时为 None"""
+        entry = self._current
+        return entry.model if entry else None
+
+    @property
+    def model_params(self):
+        """当前模型的参数，未加载时为 None"""
+        entry = self._current
+        return entry.model_params if entry else None
+
+    def is_loaded(self):
+        """是否有可用的模型"""
+        return self._current is not None
+
+    def is_warmed_up(self):
+        """当前模型是否完成过一次成功的推理
+
+        预热失败的模型仍然可以处理请求，第一个成功的请求之后视为完成预热。
+        """
+        entry = self._current
+        return entry is not None and entry.warmed_up
+
+    def begin_load(self):
+        """标记开始加载，已经在加载中时返回 False
+
+        Returns:
+            bool: 是否可以开始加载
+        """
+        with self._lock:
+            if self.loading:
+                return False
+            self.loading = True
+            self.load_error = None
+            return True
+
+    def load(self, model_params, num_workers=0, worker_timeout=120, num_threads=None):
+        """加载并预热新模型，成功后替换当前模型（调用前需 begin_load 成功）
+
+        Args:
+            model_params: 模型参数字典
+            num_workers: ASR 工作进程数，0 表示在当前进程中加载
+            worker_timeout: 工作进程单个任务的超时时间（秒）
+            num_threads: 每个工作进程的 torch 线程数，None 表示平分 CPU 核心
+
+        Returns:
+            bool: 是否加载成功
+        """
+        self.progress.reset()
+        try:
+            if num_workers == 0 and self._promote(model_params):
+                # 模型已经常驻内存，直接切换
+                for name in ("import", "download", "build", "quantize", "warmup"):
+                    self.progress.skip(name, "模型已常驻内存")
+                self.progress.mark_ready()
+                return True
+
+            if self.daemon_socket:
+                # 守护进程中已经加载的模型立即可用，否则由守护进程下载、加载和预热
+                for name in ("import", "download", "quantize", "warmup"):
+                    self.progress.skip(name, "由模型守护进程完成")
+                with self.progress.stage("build"):
+                    model = self._create_daemon_client(model_params, worker_timeout)
+                self._swap(model, model_params)
+                self.progress.mark_ready()
+                logger.info("已连接模型守护进程中的 FunASR 模型")
+                return True
+
+            logger.info("正在加载 FunASR 模型...")
+            logger.info(f"模型参数: {model_params}")
+            rss_before = process_rss_bytes()
+
+            with self.progress.stage("import"):
+                import funasr
+
+            with self.progress.stage("download"):
+                downloaded = download_models(model_params)
+            if not downloaded:
+                self.progress.skip("download", "由构建阶段下载")
+
+            if num_workers > 0:
+                # 多进程模式：每个工作进程持有自己的模型
+                model = ASRWorkerPool(
+                    model_params,
+                    num_workers=num_workers,
+                    task_timeout=worker_timeout,
+                    num_threads=num_threads,
+                )
+                with self.progress.stage("build"):
+                    model.start()
+                    if not model.wait_ready():
+                        model.stop()
+                        raise RuntimeError(model.last_error or "ASR 工作进程启动失败")
+                # 工作进程在报告就绪之前已各自完成量化和预热
+                self.progress.skip("quantize", "已在工作进程中完成")
+                self.progress.skip("warmup", "已在工作进程中完成")
+            else:
+                # 创建模型
+                with self.progress.stage("build"):
+                    model = create_model(model_params, quantize=False)
+
+                # int8 量化单独记录耗时，加载耗时中可以区分构建和量化
+                if getattr(model, "inference_backend", None) == BACKEND_TORCH_INT8:
+                    with self.progress.stage("quantize"):
+                        quantize_model_int8(model)
+                else:
+                    self.progress.skip("quantize", "未使用 int8 量化")
+
+                # 用合成音频预热，首个真实请求不再承担首次推理的初始化开销
+                warmed_up = True
+                try:
+                    with self.progress.stage("warmup"):
+                        warmup_model(model, model_params)
+                except Exception as e:
+                    warmed_up = False
+                    logger.warning(f"模型预热失败，首次识别可能较慢: {e}")
+
+            rss_after = process_rss_bytes()
+            memory_bytes = (
+                max(0, rss_after - rss_before)
+                if num_workers == 0 and rss_before is not None and rss_after
+                else 0
+            )
+            self._swap(
+                model,
+                model_params,
+                memory_bytes,
+                warmed_up=num_workers > 0 or warmed_up,
+            )
+            self.progress.mark_ready()
+            logger.info("FunASR 模型加载完成")
+            return True
+        except Exception as e:
+            logger.error(f"加载 FunASR 模型失败: {e}")
+            self.load_error = str(e)
+            return False
+        finally:
+            with self._lock:
+                self.loading = False
+
+    def ensure_loaded(self, model_params, count_hit=True):
+        """确保指定参数的模型已经常驻内存，未加载时在当前线程中加载
+
+        已经常驻的模型直接返回，不产生加载延迟；多个线程同时请求同一个未加载
+        的模型时只加载一次，其余线程等待加载完成。
+
+        Args:
+            model_params: 模型参数字典
+            count_hit: 模型已经常驻时是否计入命中次数（加载总是计入未命中）
+
+        Returns:
+            ModelEntry: 模型条目
+
+        Raises:
+            加载失败时抛出加载过程中的异常
+        """
+        key = params_key(model_params)
+        while True:
+            with self._lock:
+                entry = self._find(key)
+                if entry is not None:
+                    if count_hit:
+                        self.hits += 1
+                    return entry
+                event = self._resident_loading.get(key)
+                if event is None:
+                    self.misses += 1
+                    event = threading.Event()
+                    self._resident_loading[key] = event
+                    break
+            # 其他线程正在加载同一个模型
+            event.wait()
+
+        try:
+            logger.info(f"加载常驻模型: {model_params}")
+            started = time.perf_counter()
+            warmed_up = True
+            if self.daemon_socket:
+                # 模型占用守护进程的内存，由守护进程按它自己的预算淘汰
+                model = self._create_daemon_client(model_params)
+                memory_bytes = 0
+            else:
+                rss_before = process_rss_bytes()
+                model = create_model(model_params)
+                try:
+                    warmup_model(model, model_params)
+                except Exception as e:
+                    warmed_up = False
+                    logger.warning(f"常驻模型预热失败，首次识别可能较慢: {e}")
+                rss_after = process_rss_bytes()
+                memory_bytes = (
+                    max(0, rss_after - rss_before)
+                    if rss_before is not None and rss_after
+                    else 0
+                )
+            with self._lock:
+                self._generation += 1
+                entry = ModelEntry(
+                    model,
+                    model_params,
+                    self._generation,
+                    memory_bytes=memory_bytes,
+                    warmed_up=warmed_up,
+                )
+                self._resident[key] = entry
+                self.loads += 1
+            logger.info(
+                f"常驻模型加载完成: {model_params['model']}，"
+                f"耗时 {time.perf_counter() - started:.1f}s，"
+                f"内存 {memory_bytes / 1024 / 1024:.0f}MB"
+            )
+            self._evict_over_budget()
+            return entry
+        finally:
+            with self._lock:
+                self._resident_loading.pop(key, None)
+            event.set()
+
+    def is_resident(self, model_params):
+        """指定参数的模型是否已经常驻内存"""
+        with self._lock:
+            return self._find(params_key(model_params), touch=False) is not None
+
+    def is_loading_resident(self, model_params):
+        """指定参数的模型是否正在加载"""
+        with self._lock:
+            return params_key(model_params) in self._resident_loading
+
+    def get_resident_status(self):
+        """常驻模型的状态
+
+        Returns:
+            dict: models 按最近使用的顺序排列（最近使用的在前），以及预算和计数
+        """
+        with self._lock:
+            current_key = self._current.key if self._current else None
+            models = [
+                {
+                    "model": entry.model_params.get("model"),
+                    "model_params": entry.model_params,
+                    "current": key == current_key,
+                    "memory_bytes": entry.memory_bytes,
+                    "inflight": entry.inflight,
+                    "last_used": entry.last_used,
+                }
+                for key, entry in reversed(self._resident.items())
+            ]
+            return {
+                "models": models,
+                "memory_bytes": sum(m["memory_bytes"] for m in models),
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "max_resident_models": self.max_resident_models,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+    def resident_count(self):
+        """常驻模型数"""
+        with self._lock:
+            return len(self._resident)
+
+    def resident_memory_bytes(self):
+        """常驻模型占用的内存之和（字节）"""
+        with self._lock:
+            return sum(entry.memory_bytes for entry in self._resident.values())
+
+    @contextmanager
+    def use(self, model_params=None, count_hit=True):
+        """获取模型用于一次推理，期间模型不会被释放
+
+        Args:
+            model_params: 需要使用的模型参数，None 表示当前模型；指定的模型
+                不在内存中时先在当前线程中加载
+            count_hit: 是否计入常驻模型的命中次数（请求已经调用过
+                ensure_loaded 时为 False，同一个请求只计一次）
+
+        Yields:
+            ModelEntry: 模型条目
+        """
+        key = params_key(model_params) if model_params is not None else None
+        while True:
+            if key is not None:
+                self.ensure_loaded(model_params, count_hit=count_hit)
+            with self._lock:
+                entry = self._current if key is None else self._find(key)
+                if entry is None:
+                    if key is None:
+                        raise ModelNotLoadedError("模型尚未加载")
+                    # 刚加载完成就被淘汰，重新加载
+                    continue
+                entry.inflight += 1
+                entry.last_used = time.time()
+                break
+        try:
+            yield entry
+            # 推理成功说明模型可用，预热失败的模型从此视为就绪
+            entry.warmed_up = True
+        finally:
+            with self._lock:
+                entry.inflight -= 1
+                release = entry.retired and entry.inflight == 0
+            if release:
+                self._release(entry)
+
+    def unload(self):
+        """卸载所有模型（正在使用的请求结束后释放）"""
+        with self._lock:
+            entries = list(self._resident.values())
+            if self._current is not None and self._current not in entries:
+                entries.append(self._current)
+            self._resident.clear()
+            self._current = None
+            released = []
+            for entry in entries:
+                entry.retired = True
+                if entry.inflight == 0:
+                    released.append(entry)
+        for entry in released:
+            self._release(entry)
+
+    def _find(self, key, touch=True):
+        """查找常驻模型（调用方持有锁），找到时标记为最近使用"""
+        entry = self._resident.get(key)
+        if entry is not None and touch:
+            self._resident.move_to_end(key)
+        return entry
+
+    def _promote(self, model_params):
+        """把已经常驻的模型设为当前模型
+
+        Returns:
+            bool: 模型是否常驻内存
+        """
+        with self._lock:
+            entry = self._find(params_key(model_params))
+            if entry is None or entry is self._current:
+                return entry is not None
+            self._generation += 1
+            entry.generation = self._generation
+            old = self._current
+            self._current = entry
+            release = self._retire_replaced(old)
+        logger.info(
+            f"已切换到常驻模型 (第 {self._generation} 代): {model_params['model']}"
+        )
+        if release:
+            self._release(old)
+        return True
+
+    def _create_daemon_client(self, model_params, task_timeout=120):
+        """在守护进程中加载模型，返回调用它的客户端
+
+        守护进程没有运行时先启动它，内存预算和常驻模型数上限同样交给守护进程。
+        """
+        spawn_daemon(
+            self.daemon_socket,
+            memory_budget_mb=self.memory_budget_bytes / 1024 / 1024,
+            max_resident_models=self.max_resident_models,
+        )
+        client = ModelDaemonClient(
+            self.daemon_socket, model_params, task_timeout=task_timeout
+        )
+        client.start()
+        return client
+
+    def _retire_replaced(self, old):
+        """处理被替换的当前模型（调用方持有锁）
+
+        设置了内存预算时，服务进程中的模型继续常驻，可以再次切换回来，超出
+        预算后按最近最少使用的顺序淘汰；没有预算时不常驻，否则每次切换参数
+        都会多占一份模型的内存。工作进程池占用独立的进程，总是不常驻；以相同
+        参数重新加载的旧实例已经被新实例取代，同样不常驻。不常驻的模型在最后
+        一个请求结束后释放。
+
+        Returns:
+            bool: 是否需要立即释放
+        """
+        if old is None:
+            return False
+        if (
+            self.memory_budget_bytes
+            and not isinstance(old.model, ASRWorkerPool)
+            and self._resident.get(old.key) is old
+        ):
+            return False
+        if self._resident.get(old.key) is old:
+            del self._resident[old.key]
+        old.retired = True
+        if old.inflight:
+            logger.info(f"旧模型仍有 {old.inflight} 个请求在使用，结束后释放")
+        return old.inflight == 0
+
+    def _swap(self, model, model_params, memory_bytes=0, warmed_up=True):
+        """原子替换当前模型"""
+        with self._lock:
+            self._generation += 1
+            old = self._current
+            entry = ModelEntry(
+                model,
+                model_params,
+                self._generation,
+                memory_bytes=memory_bytes,
+                warmed_up=warmed_up,
+            )
+            replaced = self._resident.pop(entry.key, None)
+            self._resident[entry.key] = entry
+            self._current = entry
+            release = self._retire_replaced(old)
+            if replaced is not None and replaced is not old:
+                # 相同参数重新加载（例如工作进程数变化），旧实例不再常驻
+                replaced.retired = True
+                release_replaced = replaced.inflight == 0
+            else:
+                release_replaced = False
+        logger.info(
+            f"已切换到新模型 (第 {self._generation} 代): {model_params['model']}"
+        )
+        if release:
+            self._release(old)
+        if release_replaced:
+            self._release(replaced)
+        self._evict_over_budget()
+
+    def _evict_over_budget(self):
+        """常驻模型的内存超过预算或数量超过上限时，淘汰最近最少使用的模型
+
+        当前模型和最近使用的模型不淘汰，单个模型超过预算时仍然可以使用。
+        """
+        if not self.memory_budget_bytes and not self.max_resident_models:
+            return
+        released = []
+        with self._lock:
+            total = sum(entry.memory_bytes for entry in self._resident.values())
+            count = len(self._resident)
+            # 最近使用的模型（通常是刚加载、即将使用的模型）不淘汰
+            for key in list(self._resident)[:-1]:
+                if not self._over_limit(total, count):
+                    break
+                entry = self._resident[key]
+                if entry is self._current:
+                    continue
+                del self._resident[key]
+                total -= entry.memory_bytes
+                count -= 1
+                entry.retired = True
+                self.evictions += 1
+                logger.info(
+                    f"常驻模型超出内存预算或数量上限，淘汰最近最少使用的模型: "
+                    f"{entry.model_params['model']}"
+                )
+                if entry.inflight == 0:
+                    released.append(entry)
+        for entry in released:
+            self._release(entry)
+
+    def _over_limit(self, total_bytes, count):
+        """常驻模型是否超出内存预算或数量上限"""
+        if self.memory_budget_bytes and total_bytes > self.memory_budget_bytes:
+            return True
+        return bool(self.max_resident_models) and count > self.max_resident_models
+
+    def _release(self, entry):
+        """释放旧模型占用的资源"""
+        logger.info(f"释放第 {entry.generation} 代模型: {entry.model_params['model']}")
+        if isinstance(entry.model, ModelDaemonClient):
+            # 只关闭连接，守护进程中的模型继续常驻
+            entry.model.stop()
+            entry.model = None
+            return
+        if isinstance(entry.model, ASRWorkerPool):
+            entry.model.stop()
+        entry.model = None
+        gc.collect()
+        try:
+            import torch
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
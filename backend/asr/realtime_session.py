@@ -0,0 +1,206 @@
+"""
+实时录音会话登记 - 服务端分配记录ID，会话期间的分片文本保存在内存中，结束时一次写入数据库
+"""
+
+import logging
+import threading
+import time
+
+from asr.streaming import RepeatedHeaderDetector, SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# 会话最长空闲时间（秒），超过后结束会话并把已识别的内容写入数据库
+DEFAULT_IDLE_SECONDS = 300
+
+
+class RealtimeSession:
+    """一次实时录音的状态
+
+    同时进行的录音可能很多，使用 __slots__ 减少每个会话的内存占用。
+    """
+
+    __slots__ = (
+        "record_id",
+        "auto_insert",
+        "incremental",
+        "chunks",
+        "audio_seconds",
+        "inference_seconds",
+        "created_at",
+        "last_active",
+        "finalized",
+        "final_text",
+        "audio_parts",
+        "max_audio_seconds",
+        "header_detector",
+        "lock",
+    )
+
+    def __init__(
+        self, record_id, auto_insert=False, incremental=False, max_audio_seconds=0
+    ):
+        self.record_id = record_id
+        self.auto_insert = auto_insert
+        self.incremental = incremental
+        # [(分片索引, 文本, 音频路径), ...]，结束时一次写入数据库
+        self.chunks = []
+        self.audio_seconds = 0.0
+        self.inference_seconds = 0.0
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.finalized = False
+        # 结束时加过标点的完整文本，为 None 时按分片拼接
+        self.final_text = None
+        # 两遍识别时保留整段录音的音频，max_audio_seconds 为 0 表示不保留
+        self.audio_parts = [] if max_audio_seconds > 0 else None
+        self.max_audio_seconds = max_audio_seconds
+        self.header_detector = None
+        self.lock = threading.Lock()
+
+    @property
+    def text(self):
+        """目前为止按分片索引拼接的完整文本"""
+        if self.final_text is not None:
+            return self.final_text
+        return "".join(text for _, text, _ in sorted(self.chunks, key=_chunk_order))
+
+    def add_chunk(self, chunk_index, text, audio_path=None):
+        """记录一个分片的识别结果"""
+        with self.lock:
+            self.chunks.append((chunk_index, text, audio_path))
+            self.last_active = time.time()
+
+    def add_audio(self, samples, strip_header=False):
+        """保留一段新音频用于第二遍识别
+
+        Args:
+            samples: 解码后的音频采样
+            strip_header: 开头是否带有重复的 webm 文件头音频
+        """
+        with self.lock:
+            if self.audio_parts is None or samples is None:
+                return
+            if strip_header:
+                if self.header_detector is None:
+                    self.header_detector = RepeatedHeaderDetector(self.record_id)
+                samples = self.header_detector.strip(samples)
+            kept = sum(len(part) for part in self.audio_parts) + len(samples)
+            if kept > self.max_audio_seconds * SAMPLE_RATE:
+                logger.info(
+                    f"实时录音 {self.record_id} 超过 {self.max_audio_seconds}s，"
+                    "不再保留音频用于第二遍识别"
+                )
+                self.audio_parts = None
+                return
+            self.audio_parts.append(samples)
+
+    def add_timing(self, audio_seconds, inference_seconds):
+        """累计送入模型的音频时长和推理耗时"""
+        with self.lock:
+            self.audio_seconds += audio_seconds
+            self.inference_seconds += inference_seconds
+            self.last_active = time.time()
+
+    def to_dict(self):
+        """会话状态，用于接口返回"""
+        with self.lock:
+            return {
+                "record_id": self.record_id,
+                "auto_insert": self.auto_insert,
+                "incremental": self.incremental,
+                "chunks": len(self.chunks),
+                "text": self.text,
+                "audio_seconds": round(self.audio_seconds, 3),
+                "inference_seconds": round(self.inference_seconds, 3),
+                "created_at": self.created_at,
+                "idle_seconds": round(time.time() - self.last_active, 3),
+                "finalized": self.finalized,
+            }
+
+
+def _chunk_order(chunk):
+    return chunk[0] if chunk[0] is not None else -1
+
+
+class SessionRegistry:
+    """按记录ID登记进行中的实时录音会话"""
+
+    def __init__(self, max_idle_seconds=DEFAULT_IDLE_SECONDS, on_evict=None):
+        """初始化会话登记
+
+        Args:
+            max_idle_seconds: 会话最长空闲时间（秒）
+            on_evict: 空闲会话被移除时调用的函数，参数为会话（用于写入数据库）
+        """
+        self.max_idle_seconds = max_idle_seconds
+        self.on_evict = on_evict
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def open(self, record_id, **kwargs):
+        """登记一个新会话
+
+        Args:
+            record_id: 服务端分配的记录ID
+            **kwargs: RealtimeSession 的其他参数
+
+        Returns:
+            RealtimeSession
+        """
+        self.evict_idle()
+        session = RealtimeSession(record_id, **kwargs)
+        with self._lock:
+            self._sessions[record_id] = session
+        logger.info(f"登记实时录音会话: {record_id}")
+        return session
+
+    def get(self, record_id):
+        """获取会话，不存在时返回 None"""
+        with self._lock:
+            return self._sessions.get(record_id)
+
+    def pop(self, record_id):
+        """移除并返回会话"""
+        with self._lock:
+            return self._sessions.pop(record_id, None)
+
+    def count(self):
+        """当前会话数"""
+        with self._lock:
+            return len(self._sessions)
+
+    def evict_idle(self):
+        """移除长时间没有新分片的会话
+
+        Returns:
+            被移除的会话数
+        """
+        now = time.time()
+        with self._lock:
+            expired = [
+                record_id
+                for record_id, session in self._sessions.items()
+                if now - session.last_active > self.max_idle_seconds
+            ]
+            sessions = [self._sessions.pop(record_id) for record_id in expired]
+        for session in sessions:
+            logger.info(f"实时录音会话 {session.record_id} 空闲超时，结束会话")
+            self._evict(session)
+        return len(sessions)
+
+    def close_all(self):
+        """结束所有会话（服务退出时调用）"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            self._evict(session)
+
+    def _evict(self, session):
+        if self.on_evict is None:
+            return
+        try:
+            self.on_evict(session)
+        except Exception as e:
+            logger.error(f"结束实时录音会话 {session.record_id} 失败: {e}")
@@ -0,0 +1,153 @@
+"""
+识别结果缓存 - 按解码后音频的哈希和识别参数缓存结果，重复提交的音频不再经过模型
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from asr.backends import resolve_backend
+
+logger = logging.getLogger(__name__)
+
+# 默认的内存上限（字节）
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+# 每个条目除结果文本以外的固定开销估计（字节）
+ENTRY_OVERHEAD = 256
+# 不参与缓存键的参数（流式模型一次性识别时传入的空缓存）
+IGNORED_KWARGS = ("cache",)
+
+
+def make_cache_key(samples, model_params, kwargs):
+    """根据音频内容、模型和识别参数生成缓存键
+
+    Args:
+        samples: float32 音频采样
+        model_params: 当前模型参数（模型名称、VAD/标点模型、热词、推理后端等）
+        kwargs: 传给 generate 的参数（语言、热词等）
+
+    Returns:
+        缓存键字符串
+    """
+    # 缓存键不涉及安全性，选用有硬件加速、速度最快的 sha1
+    digest = hashlib.sha1(samples.tobytes())
+    for name in ("model", "vad_model", "punc_model", "spk_model", "hotwords"):
+        digest.update(f"|{name}={model_params.get(name)}".encode("utf-8"))
+    # 不同推理后端的结果不同（ONNX 后端不支持热词），按实际使用的后端区分
+    backend = resolve_backend(model_params, warn=False)
+    digest.update(f"|backend={backend}".encode("utf-8"))
+    for name, value in sorted(kwargs.items()):
+        if name not in IGNORED_KWARGS:
+            digest.update(f"|{name}={value!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU 识别结果缓存
+
+    内存中按最近使用顺序保存结果，超过内存上限时淘汰最久未使用的条目。
+    提供 store（DBManager）时，结果同时写入 SQLite，服务重启后仍然有效。
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, store=None):
+        """初始化缓存
+
+        Args:
+            max_bytes: 内存中缓存结果的大小上限（字节）
+            store: 持久化存储，需要提供 get_cached_result/save_cached_result
+        """
+        self.max_bytes = max_bytes
+        self.store = store
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+
+    def get(self, key):
+        """查找缓存结果
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            结果字典的副本，未命中时返回 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(entry[0])
+
+        if self.store is not None:
+            payload = self.store.get_cached_result(key)
+            if payload:
+                try:
+                    result = json.loads(payload)
+                except ValueError:
+                    result = None
+                if isinstance(result, dict):
+                    self._put(key, result, payload)
+                    with self._lock:
+                        self.hits += 1
+                        self.store_hits += 1
+                    return dict(result)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, result):
+        """保存识别结果
+
+        Args:
+            key: 缓存键
+            result: 识别结果字典
+        """
+        try:
+            payload = json.dumps(result, ensure_ascii=False)
+        except (TypeError, ValueError):
+            # 结果中包含无法序列化的内容（例如张量）时不缓存
+            return
+        self._put(key, dict(result), payload)
+        if self.store is not None:
+            self.store.save_cached_result(key, payload)
+
+    def clear(self):
+        """清空内存中的缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_stats(self):
+        """获取命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "store_hits": self.store_hits,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "persistent": self.store is not None,
+            }
+
+    def _put(self, key, result, payload):
+        size = len(payload.encode("utf-8")) + len(key) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            self._entries[key] = (result, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
@@ -0,0 +1,275 @@
+"""
+推理调度器 - 把并发的识别请求在几毫秒内攒成一批，合并为一次 generate 调用
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# 批大小分桶
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+class _InferenceRequest:
+    """调度队列中的一个请求"""
+
+    def __init__(self, audio=None, kwargs=None, func=None):
+        self.audio = audio
+        self.kwargs = kwargs or {}
+        # 不可批处理的调用（例如带缓存的流式推理）
+        self.func = func
+        self.key = None if func is not None else _batch_key(self.kwargs)
+        self.enqueued_at = time.perf_counter()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+def _batch_key(kwargs):
+    """只有参数完全相同的请求才能合并到同一批"""
+    return tuple(sorted((name, repr(value)) for name, value in kwargs.items()))
+
+
+class InferenceScheduler:
+    """动态微批调度器
+
+    请求线程调用 submit 后阻塞等待结果；调度线程取出第一个请求后，在
+    max_wait_ms 内继续收集参数相同的请求，最多 max_batch_size 个，然后
+    通过 run_batch 一次性推理，并把结果逐个交还给等待的请求。所有模型调用
+    都经过调度线程，因此同一个模型不会被多个请求线程同时调用。
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=10, num_workers=1):
+        """初始化调度器
+
+        Args:
+            run_batch: 批量推理函数，参数为 (音频列表, 参数字典)，返回结果列表
+            max_batch_size: 每批最多的请求数
+            max_wait_ms: 第一个请求进入队列后最多等待的毫秒数
+            num_workers: 并行执行批次的调度线程数
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.num_workers = num_workers
+
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._running = False
+
+        self.latency_histogram = Histogram()
+        self.queue_wait_histogram = Histogram()
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.total_requests = 0
+        self.total_batches = 0
+        self.total_errors = 0
+
+    def start(self):
+        """启动调度线程"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._threads = [
+                threading.Thread(
+                    target=self._worker_loop, name=f"asr-scheduler-{i}", daemon=True
+                )
+                for i in range(self.num_workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(
+            f"推理调度器已启动: 批大小上限 {self.max_batch_size}, "
+            f"等待 {self.max_wait_ms}ms, 线程数 {self.num_workers}"
+        )
+
+    def set_num_workers(self, num_workers):
+        """调整调度线程数（例如模型切换为多进程池或切换回进程内模型之后）
+
+        减少时多余的线程执行完手头的批次后退出。
+        """
+        with self._condition:
+            self.num_workers = max(1, num_workers)
+            if not self._running:
+                return
+            # 移出列表的线程在取下一批之前退出
+            del self._threads[self.num_workers :]
+            new_threads = [
+                threading.Thread(
+                    target=self._worker_loop, name=f"asr-scheduler-{i}", daemon=True
+                )
+                for i in range(len(self._threads), self.num_workers)
+            ]
+            self._threads.extend(new_threads)
+            self._condition.notify_all()
+        for thread in new_threads:
+            thread.start()
+
+    def stop(self):
+        """停止调度线程，队列中剩余的请求返回错误"""
+        with self._condition:
+            self._running = False
+            pending = list(self._queue)
+            self._queue.clear()
+            self._condition.notify_all()
+        for item in pending:
+            item.error = RuntimeError("推理调度器已停止")
+            item.done.set()
+
+    def submit(self, audio, timeout=None, **kwargs):
+        """提交一个识别请求并等待结果
+
+        Args:
+            audio: 音频输入（采样数组或文件路径）
+            timeout: 最长等待秒数，None 表示一直等待
+            **kwargs: 传给 generate 的参数
+
+        Returns:
+            该音频对应的识别结果字典
+        """
+        return self._wait(self._enqueue(_InferenceRequest(audio, kwargs)), timeout)
+
+    def run_exclusive(self, func, timeout=None):
+        """在调度线程中单独执行一个不可批处理的调用
+
+        Args:
+            func: 无参数的可调用对象
+            timeout: 最长等待秒数
+
+        Returns:
+            func 的返回值
+        """
+        return self._wait(self._enqueue(_InferenceRequest(func=func)), timeout)
+
+    def queue_depth(self):
+        """当前排队的请求数"""
+        with self._condition:
+            return len(self._queue)
+
+    def get_stats(self):
+        """获取调度统计信息"""
+        with self._condition:
+            queue_depth = len(self._queue)
+            total_requests = self.total_requests
+            total_batches = self.total_batches
+            total_errors = self.total_errors
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": queue_depth,
+            "total_requests": total_requests,
+            "total_batches": total_batches,
+            "total_errors": total_errors,
+            "latency_seconds": self.latency_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot(),
+            "batch_size": self.batch_size_histogram.snapshot(),
+        }
+
+    def _enqueue(self, item):
+        if not self._running:
+            self.start()
+        with self._condition:
+            self._queue.append(item)
+            self.total_requests += 1
+            self._condition.notify()
+        return item
+
+    def _count_error(self):
+        # 请求线程和多个调度线程都会更新计数
+        with self._condition:
+            self.total_errors += 1
+
+    def _wait(self, item, timeout):
+        if not item.done.wait(timeout):
+            raise TimeoutError("等待识别结果超时")
+        self.latency_histogram.observe(time.perf_counter() - item.enqueued_at)
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _next_batch(self):
+        """取出下一批请求，队列为空时阻塞；线程被 set_num_workers 移出时返回 None"""
+        current = threading.current_thread()
+        with self._condition:
+            while self._running and not self._queue and current in self._threads:
+                self._condition.wait()
+            if not self._running or current not in self._threads:
+                return None
+
+            first = self._queue.popleft()
+            if first.func is not None:
+                return [first]
+
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait_ms / 1000.0
+            while len(batch) < self.max_batch_size:
+                # 收集参数相同的请求，其他请求留在队列中
+                for item in list(self._queue):
+                    if item.key == first.key:
+                        self._queue.remove(item)
+                        batch.append(item)
+                        if len(batch) >= self.max_batch_size:
+                            break
+                remaining = deadline - time.perf_counter()
+                if len(batch) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+                if not self._running:
+                    break
+            return batch
+
+    def _worker_loop(self):
+        while self._running:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._execute(batch)
+
+    def _execute(self, batch):
+        started = time.perf_counter()
+        for item in batch:
+            self.queue_wait_histogram.observe(started - item.enqueued_at)
+
+        first = batch[0]
+        if first.func is not None:
+            try:
+                first.result = first.func()
+            except Exception as e:
+                first.error = e
+                self._count_error()
+            first.done.set()
+            return
+
+        with self._condition:
+            self.total_batches += 1
+        self.batch_size_histogram.observe(len(batch))
+        try:
+            results = self.run_batch([item.audio for item in batch], first.kwargs)
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"批量推理结果数量不匹配: {len(results)} != {len(batch)}"
+                )
+            for item, result in zip(batch, results):
+                item.result = result
+        except Exception as e:
+            if len(batch) == 1:
+                first.error = e
+                self._count_error()
+            else:
+                # 批量推理失败时逐个重试，避免一个坏音频拖累整批请求
+                logger.warning(f"批量推理失败，逐个重试: {e}")
+                for item in batch:
+                    try:
+                        item.result = self.run_batch([item.audio], item.kwargs)[0]
+                    except Exception as item_error:
+                        item.error = item_error
+                        self._count_error()
+        finally:
+            for item in batch:
+                item.done.set()
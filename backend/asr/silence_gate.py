@@ -0,0 +1,226 @@
+"""
+静音门限模块 - 在送入 ASR 之前用能量和过零率快速判断分片是否有语音，跳过静音分片
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+
+from asr.backends import resolve_device
+from asr.streaming import SAMPLE_RATE, RepeatedHeaderDetector
+
+logger = logging.getLogger(__name__)
+
+# 默认的能量门限（dBFS）
+DEFAULT_THRESHOLD_DB = -45.0
+# 分帧长度（毫秒）
+DEFAULT_FRAME_MS = 30
+# 至少需要多长的语音帧才认为分片有语音（毫秒）
+DEFAULT_MIN_SPEECH_MS = 90
+# 过零率高于该值的帧多半是噪声（嘶声、风扇声），需要更高的能量才算语音
+NOISY_ZCR = 0.35
+# 高过零率帧额外需要的能量（dB）
+NOISY_EXTRA_DB = 10.0
+# 会话统计在空闲多久之后清理（秒），与流式会话保持一致
+SESSION_IDLE_SECONDS = 300
+
+
+def frame_features(samples, frame_length):
+    """计算每一帧的能量（dBFS）和过零率
+
+    Args:
+        samples: float32 音频采样
+        frame_length: 每帧的采样点数
+
+    Returns:
+        (能量数组, 过零率数组)
+    """
+    num_frames = len(samples) // frame_length
+    if num_frames == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+    frames = samples[: num_frames * frame_length].reshape(num_frames, frame_length)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+    energy_db = 20.0 * np.log10(rms + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return energy_db, zcr
+
+
+class SilenceGate:
+    """静音门限
+
+    第一级：把分片按 30ms 分帧，能量高于门限的帧记为语音帧；过零率很高的帧
+    （宽带噪声）需要高出门限 10dB 才算。语音帧总时长不足 min_speech_ms 的分片
+    直接判定为静音。
+    第二级（可选）：第一级判定有语音的分片再交给 fsmn-vad 确认，过滤掉敲键盘
+    等能量高但不是语音的声音。
+    """
+
+    def __init__(
+        self,
+        threshold_db=DEFAULT_THRESHOLD_DB,
+        min_speech_ms=DEFAULT_MIN_SPEECH_MS,
+        frame_ms=DEFAULT_FRAME_MS,
+        vad_model=None,
+        device="cpu",
+    ):
+        """初始化静音门限
+
+        Args:
+            threshold_db: 语音帧的能量门限（dBFS）
+            min_speech_ms: 判定为有语音所需的最短语音时长（毫秒）
+            frame_ms: 分帧长度（毫秒）
+            vad_model: 第二级使用的 VAD 模型名称，None 表示只用能量判断
+            device: VAD 模型使用的设备
+        """
+        self.threshold_db = threshold_db
+        self.frame_length = SAMPLE_RATE * frame_ms // 1000
+        self.min_speech_frames = max(1, -(-min_speech_ms // frame_ms))
+        self.vad_model_name = vad_model
+        self.device = device
+
+        self._vad = None
+        self._vad_lock = threading.Lock()
+        self._lock = threading.Lock()
+        # 会话ID -> {"chunks", "skipped", "header", "last_active"}
+        self._sessions = {}
+        self.total_chunks = 0
+        self.total_skipped = 0
+
+    def is_speech(self, samples):
+        """判断一段音频是否包含语音
+
+        Args:
+            samples: float32 音频采样
+
+        Returns:
+            bool: 是否包含语音
+        """
+        if samples is None or len(samples) == 0:
+            return False
+
+        energy_db, zcr = frame_features(samples, self.frame_length)
+        voiced = (energy_db >= self.threshold_db) & (
+            (zcr < NOISY_ZCR) | (energy_db >= self.threshold_db + NOISY_EXTRA_DB)
+        )
+        if int(np.count_nonzero(voiced)) < self.min_speech_frames:
+            return False
+
+        if self.vad_model_name:
+            return self._vad_has_speech(samples)
+        return True
+
+    def check(self, session_id, samples, strip_header=True):
+        """判断会话的一个分片是否需要识别，并记录跳过次数
+
+        Args:
+            session_id: 会话（记录）ID，None 表示不属于任何会话
+            samples: 解码后的音频采样
+            strip_header: 是否去掉分片开头重复的文件头音频后再判断
+
+        Returns:
+            bool: True 表示有语音需要识别，False 表示静音可以跳过
+        """
+        stats = None
+        if session_id is not None:
+            with self._lock:
+                self._cleanup_idle()
+                stats = self._sessions.get(session_id)
+                if stats is None:
+                    stats = {
+                        "chunks": 0,
+                        "skipped": 0,
+                        "header": RepeatedHeaderDetector(session_id),
+                    }
+                    self._sessions[session_id] = stats
+                stats["last_active"] = time.time()
+
+        analyzed = samples
+        if stats is not None and strip_header:
+            # 重复的文件头只参与判断，不影响送入模型的音频
+            analyzed = stats["header"].strip(samples)
+
+        try:
+            speech = self.is_speech(analyzed)
+        except Exception as e:
+            # 判断失败时宁可多识别一次，也不能丢掉语音
+            logger.warning(f"静音判断失败，按有语音处理: {e}")
+            speech = True
+
+        with self._lock:
+            self.total_chunks += 1
+            if not speech:
+                self.total_skipped += 1
+            if stats is not None:
+                stats["chunks"] += 1
+                if not speech:
+                    stats["skipped"] += 1
+
+        if not speech:
+            logger.info(f"会话 {session_id} 的分片为静音，跳过识别")
+        return speech
+
+    def get_session_stats(self, session_id):
+        """获取会话的分片数和跳过数"""
+        with self._lock:
+            stats = self._sessions.get(session_id)
+            if stats is None:
+                return {"chunks": 0, "skipped": 0}
+            return {"chunks": stats["chunks"], "skipped": stats["skipped"]}
+
+    def pop_session(self, session_id):
+        """会话结束，移除并返回它的统计信息"""
+        with self._lock:
+            stats = self._sessions.pop(session_id, None)
+        if stats is None:
+            return {"chunks": 0, "skipped": 0}
+        if stats["skipped"]:
+            logger.info(
+                f"会话 {session_id} 共 {stats['chunks']} 个分片，"
+                f"跳过静音分片 {stats['skipped']} 个"
+            )
+        return {"chunks": stats["chunks"], "skipped": stats["skipped"]}
+
+    def get_stats(self):
+        """获取全局统计信息"""
+        with self._lock:
+            return {
+                "threshold_db": self.threshold_db,
+                "vad_model": self.vad_model_name,
+                "total_chunks": self.total_chunks,
+                "total_skipped": self.total_skipped,
+                "active_sessions": len(self._sessions),
+            }
+
+    def _cleanup_idle(self):
+        """清理没有收到结束标记的会话统计（调用方持有锁）"""
+        now = time.time()
+        expired = [
+            session_id
+            for session_id, stats in self._sessions.items()
+            if now - stats["last_active"] > SESSION_IDLE_SECONDS
+        ]
+        for session_id in expired:
+            del self._sessions[session_id]
+
+    def _vad_has_speech(self, samples):
+        """用 VAD 模型确认是否有语音片段"""
+        with self._vad_lock:
+            if self._vad is None:
+                import funasr
+
+                logger.info(f"正在加载静音门限的 VAD 模型: {self.vad_model_name}")
+                self._vad = funasr.AutoModel(
+                    model=self.vad_model_name,
+                    device=resolve_device(self.device),
+                    disable_update=True,
+                )
+            result = self._vad.generate(input=samples)
+
+        if not result:
+            return False
+        segments = result[0].get("value") or []
+        return len(segments) > 0
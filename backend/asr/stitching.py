@@ -0,0 +1,249 @@
+"""
+分片拼接模块 - 相邻实时分片之间保留一段重叠音频，按字级时间戳合并识别结果
+"""
+
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+from asr.streaming import SAMPLE_RATE, RepeatedHeaderDetector
+
+logger = logging.getLogger(__name__)
+
+# 相邻分片之间重叠的音频时长（秒）
+DEFAULT_OVERLAP_SECONDS = 0.8
+
+# 英文单词、数字作为一个词，其余非空白字符（中文等）逐字切分
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9']+|[^\sA-Za-z0-9']")
+# 分界线之后多长时间内与上一个词相同的词视为重复（毫秒）
+BOUNDARY_TOLERANCE_MS = 150
+# 不占时间戳的标点符号
+_PUNCTUATION = set('，。？！、；：,.?!;:…“”"‘’（）()《》')
+# 英文标点之后的英文单词前需要空格（切分时丢弃了原文中的空白）
+_ASCII_PUNCTUATION = ",.?!;:"
+
+
+def split_tokens(text):
+    """把识别文本切分为与时间戳一一对应的词，标点附在前一个词后面
+
+    Args:
+        text: 识别文本
+
+    Returns:
+        词列表
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text or ""):
+        token = match.group()
+        if token in _PUNCTUATION:
+            if tokens:
+                tokens[-1] += token
+            continue
+        tokens.append(token)
+    return tokens
+
+
+def _is_word(token):
+    return bool(token) and token[0].isascii() and token[0].isalnum()
+
+
+def _ends_with_word(token):
+    """词以英文单词结尾（后面可以带英文标点）"""
+    return _is_word(token.rstrip(_ASCII_PUNCTUATION)[-1:])
+
+
+def join_tokens(tokens, previous=None):
+    """把词拼接为文本，相邻的英文单词之间加空格
+
+    Args:
+        tokens: 词列表
+        previous: 前面已经输出的最后一个词，用于判断开头是否需要空格
+
+    Returns:
+        拼接后的文本
+    """
+    parts = []
+    for token in tokens:
+        if previous is not None and _ends_with_word(previous) and _is_word(token):
+            parts.append(" ")
+        parts.append(token)
+        previous = token
+    return "".join(parts)
+
+
+def _strip_punctuation(token):
+    return token.rstrip("".join(_PUNCTUATION))
+
+
+class ChunkStitcher:
+    """一次实时录音的分片拼接状态
+
+    每个分片识别时在前面拼接上一个分片末尾 overlap 秒的音频。重叠区的中点是
+    两个分片的分界线：分界线之前的词归前一个分片，之后的词归后一个分片，
+    词的归属按时间戳中点判断。落在分片边界附近被截断的词，在下一个分片中
+    处于重叠区中间，可以被完整识别。
+
+    每个分片只需要保存重叠音频和最后一个分片尚未确认的结尾，开销与重叠
+    时长成正比，与录音总长度无关。
+    """
+
+    def __init__(
+        self, session_id, overlap_seconds=DEFAULT_OVERLAP_SECONDS, strip_header=True
+    ):
+        """初始化拼接状态
+
+        Args:
+            session_id: 会话（记录）ID
+            overlap_seconds: 相邻分片重叠的音频时长（秒）
+            strip_header: 分片开头是否带有重复的文件头音频（前端实时分片）
+        """
+        self.session_id = session_id
+        self.overlap_samples = int(SAMPLE_RATE * overlap_seconds)
+        self.header_detector = (
+            RepeatedHeaderDetector(session_id) if strip_header else None
+        )
+        self.auto_insert = False
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.lock = threading.Lock()
+
+        # None 表示还不知道模型是否输出时间戳，由第一个分片的结果决定
+        self.enabled = None
+        # 上一个分片末尾的重叠音频
+        self._tail = np.zeros(0, dtype=np.float32)
+        # 本次送入模型的音频中重叠部分的长度（采样点）
+        self._offset = 0
+        self._length = 0
+        # 最后一个分片分界线之后的词，下一个分片到来时被重新识别
+        self._pending = []
+        # 已经输出的最后一个词
+        self._last_token = None
+
+    def prepare(self, samples):
+        """在新分片前拼接重叠音频
+
+        Args:
+            samples: 解码后的分片音频
+
+        Returns:
+            需要送入模型的音频
+        """
+        self.last_active = time.time()
+        new_samples = samples
+        if self.header_detector is not None:
+            new_samples = self.header_detector.strip(samples)
+        if self.enabled is False or self.overlap_samples == 0:
+            return new_samples
+
+        audio = new_samples
+        if len(self._tail):
+            audio = np.concatenate([self._tail, new_samples])
+        self._offset = len(self._tail)
+        self._length = len(audio)
+        self._tail = audio[-self.overlap_samples :].copy()
+        return audio
+
+    def prime(self, samples):
+        """用之前已经处理过的音频作为下一个分片的重叠部分（例如任务中断后恢复）
+
+        Args:
+            samples: 紧接在下一个分片之前的音频
+        """
+        if self.overlap_samples:
+            self._tail = np.asarray(samples[-self.overlap_samples :], dtype=np.float32)
+
+    def merge(self, text, timestamps):
+        """合并一个分片的识别结果
+
+        Args:
+            text: 分片的识别文本
+            timestamps: 每个词的 [开始, 结束] 毫秒时间，没有时为 None
+
+        Returns:
+            本分片新确认的文本
+        """
+        tokens = split_tokens(text)
+        if self.enabled is None and tokens:
+            # 模型不输出时间戳时无法判断重叠区的归属，退回到直接拼接
+            self.enabled = bool(timestamps)
+            if not self.enabled:
+                logger.info(
+                    f"会话 {self.session_id} 的识别结果没有时间戳，不做重叠拼接"
+                )
+        if self.enabled is False:
+            return text
+        if not tokens:
+            self._pending = []
+            return ""
+
+        spans = self._align(tokens, timestamps)
+
+        sample_ms = 1000.0 / SAMPLE_RATE
+        start_ms = self._offset / 2 * sample_ms
+        end_ms = (self._length - len(self._tail) / 2) * sample_ms
+
+        owned = []
+        pending = []
+        for token, (begin, end) in zip(tokens, spans):
+            middle = (begin + end) / 2
+            if middle < start_ms:
+                continue
+            if (
+                not owned
+                and not pending
+                and self._is_boundary_duplicate(token, middle - start_ms)
+            ):
+                # 两个分片对分界线附近同一个词的时间估计略有偏差，避免重复输出
+                continue
+            if middle < end_ms:
+                owned.append(token)
+            else:
+                pending.append(token)
+
+        self._pending = pending
+        return self._emit(owned)
+
+    def finish(self):
+        """录音结束，输出最后一个分片分界线之后的文本
+
+        Returns:
+            剩余的文本
+        """
+        pending, self._pending = self._pending, []
+        return self._emit(pending)
+
+    def _is_boundary_duplicate(self, token, distance_ms):
+        """分界线之后紧挨着的词与上一个分片输出的最后一个词相同"""
+        if not self._offset or self._last_token is None:
+            return False
+        return distance_ms < BOUNDARY_TOLERANCE_MS and _strip_punctuation(
+            token
+        ) == _strip_punctuation(self._last_token)
+
+    def _emit(self, tokens):
+        if not tokens:
+            return ""
+        text = join_tokens(tokens, self._last_token)
+        self._last_token = tokens[-1]
+        return text
+
+    def _align(self, tokens, timestamps):
+        """返回与每个词对应的时间区间
+
+        词数和时间戳数量一致时直接对应；不一致时（例如标点模型改写了文本）
+        在时间戳覆盖的范围内（没有时间戳时在整个分片内）按词数均匀估计。
+        """
+        if timestamps and len(timestamps) == len(tokens):
+            return [(float(span[0]), float(span[1])) for span in timestamps]
+
+        if timestamps:
+            begin = float(timestamps[0][0])
+            end = float(timestamps[-1][1])
+        else:
+            begin = 0.0
+            end = self._length * 1000.0 / SAMPLE_RATE
+        step = (end - begin) / max(len(tokens), 1)
+        return [(begin + i * step, begin + (i + 1) * step) for i in range(len(tokens))]
@@ -0,0 +1,272 @@
+"""
+流式识别会话 - 在多次请求之间保留 paraformer-zh-streaming 的解码缓存
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 采样率，FunASR 模型统一使用 16kHz
+SAMPLE_RATE = 16000
+
+# paraformer 流式模型的默认分块配置: [0, 10, 5] 表示每块 600ms，向后看 300ms
+DEFAULT_CHUNK_SIZE = [0, 10, 5]
+DEFAULT_ENCODER_CHUNK_LOOK_BACK = 4
+DEFAULT_DECODER_CHUNK_LOOK_BACK = 1
+
+# 结束时如果没有剩余音频，补一小段静音用于冲刷解码器缓存
+FINAL_PADDING_SAMPLES = 1600
+
+# 重复文件头音频的最大长度（前端每个分片都会拼接第一个 200ms 录音块），
+# 限制长度可以避免开头的静音被误判为重复部分
+MAX_HEADER_SAMPLES = SAMPLE_RATE // 2
+
+
+def is_streaming_model(model_name):
+    """判断模型是否为支持缓存的流式模型"""
+    return bool(model_name) and "streaming" in model_name
+
+
+class RepeatedHeaderDetector:
+    """识别并去掉实时分片中重复的开头音频
+
+    前端的每个实时分片都会拼接录音的第一个数据块（webm 文件头），
+    解码后每个分片开头都会重复这一段音频。第一个分片全部是新音频；
+    第二个分片与第一个分片的公共前缀长度即为重复部分的长度。
+    """
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id
+        # 第一个分片的开头部分，以及后续分片中重复出现的文件头长度
+        self._first_samples = None
+        self._header_length = None
+
+    def strip(self, samples):
+        """去掉重复部分
+
+        Args:
+            samples: 解码后的音频采样
+
+        Returns:
+            去掉重复部分后的新音频
+        """
+        if self._first_samples is None:
+            self._first_samples = samples[:MAX_HEADER_SAMPLES].copy()
+            return samples
+
+        if self._header_length is None:
+            length = min(len(self._first_samples), len(samples))
+            diff = np.nonzero(self._first_samples[:length] != samples[:length])[0]
+            self._header_length = int(diff[0]) if len(diff) else length
+            logger.info(
+                f"会话 {self.session_id} 检测到重复的文件头音频: {self._header_length} 个采样点"
+            )
+
+        return samples[self._header_length :]
+
+
+class StreamingSession:
+    """单个实时录音的流式识别会话
+
+    会话保存 FunASR 流式模型的 cache 字典，每次只把新增的音频按 600ms
+    子块送入模型，从而避免在每个 2 秒分片边界重新预热编码器和解码器。
+    """
+
+    def __init__(
+        self,
+        session_id,
+        chunk_size=None,
+        encoder_chunk_look_back=DEFAULT_ENCODER_CHUNK_LOOK_BACK,
+        decoder_chunk_look_back=DEFAULT_DECODER_CHUNK_LOOK_BACK,
+    ):
+        """初始化流式会话
+
+        Args:
+            session_id: 会话ID（实时录音的记录ID）
+            chunk_size: 流式分块配置，默认 [0, 10, 5]
+            encoder_chunk_look_back: 编码器自注意力回看的块数
+            decoder_chunk_look_back: 解码器交叉注意力回看的块数
+        """
+        self.session_id = session_id
+        self.chunk_size = list(chunk_size or DEFAULT_CHUNK_SIZE)
+        self.encoder_chunk_look_back = encoder_chunk_look_back
+        self.decoder_chunk_look_back = decoder_chunk_look_back
+        # 每个子块的采样点数，chunk_size[1] 个 60ms 帧
+        self.chunk_stride = self.chunk_size[1] * 960
+
+        self.cache = {}
+        # 生成缓存的模型代数，模型被替换后缓存需要重置
+        self.model_generation = None
+        self.text = ""
+        self.auto_insert = False
+        self.is_finished = False
+        self.created_at = time.time()
+        self.last_active = self.created_at
+
+        # 尚未凑满一个子块的音频
+        self._pending = np.zeros(0, dtype=np.float32)
+        self.header_detector = RepeatedHeaderDetector(session_id)
+        self.lock = threading.Lock()
+
+    def _stream_kwargs(self, is_final):
+        """构造流式推理参数（不含 cache）"""
+        return {
+            "is_final": is_final,
+            "chunk_size": self.chunk_size,
+            "encoder_chunk_look_back": self.encoder_chunk_look_back,
+            "decoder_chunk_look_back": self.decoder_chunk_look_back,
+        }
+
+    def reset_cache(self, model_generation=None):
+        """丢弃解码器缓存（例如模型被替换后），已识别的文本保留"""
+        self.cache = {}
+        self.model_generation = model_generation
+
+    def strip_repeated_header(self, samples):
+        """去掉分片中重复的开头音频，见 RepeatedHeaderDetector"""
+        return self.header_detector.strip(samples)
+
+    def feed(self, model, samples, is_final=False):
+        """送入新的音频并返回各个子块的识别结果
+
+        Args:
+            model: FunASR AutoModel 实例
+            samples: 新增的 16kHz float32 音频
+            is_final: 是否为最后一段音频
+
+        Returns:
+            每个 600ms 子块的部分识别文本列表（不含空文本）
+        """
+        self.last_active = time.time()
+
+        if samples is not None and len(samples):
+            self._pending = np.concatenate(
+                [self._pending, np.asarray(samples, dtype=np.float32)]
+            )
+
+        partials = []
+        while len(self._pending) >= self.chunk_stride:
+            chunk = self._pending[: self.chunk_stride]
+            self._pending = self._pending[self.chunk_stride :]
+            last = is_final and len(self._pending) == 0
+            partials.append(self._infer(model, chunk, last))
+            if last:
+                self.is_finished = True
+
+        if is_final and not self.is_finished:
+            chunk = self._pending
+            if len(chunk) == 0:
+                chunk = np.zeros(FINAL_PADDING_SAMPLES, dtype=np.float32)
+            self._pending = np.zeros(0, dtype=np.float32)
+            partials.append(self._infer(model, chunk, True))
+            self.is_finished = True
+
+        partials = [text for text in partials if text]
+        self.text += "".join(partials)
+        return partials
+
+    def _infer(self, model, chunk, is_final):
+        """对一个子块执行流式推理
+
+        直接调用 AutoModel.inference，绕过 VAD 切分，cache 才能在调用之间保留。
+        这里不经过标点模型，部分结果没有标点，录音结束后对完整文本统一加标点。
+        使用工作进程池时，cache 保存在会话绑定的工作进程中。
+        """
+        if hasattr(model, "stream_step"):
+            result = model.stream_step(
+                self.session_id, chunk, **self._stream_kwargs(is_final)
+            )
+        else:
+            result = model.inference(
+                input=chunk, cache=self.cache, **self._stream_kwargs(is_final)
+            )
+        if not result:
+            return ""
+        return result[0].get("text", "")
+
+
+class StreamingSessionManager:
+    """按记录ID管理识别会话"""
+
+    def __init__(self, max_idle_seconds=300, session_class=None, **session_kwargs):
+        """初始化会话管理器
+
+        Args:
+            max_idle_seconds: 会话最长空闲时间，超过后被清理
+            session_class: 会话类型，默认为 StreamingSession
+            **session_kwargs: 创建会话时传入的参数
+        """
+        self.max_idle_seconds = max_idle_seconds
+        self.session_class = session_class or StreamingSession
+        self.session_kwargs = session_kwargs
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, session_id, **kwargs):
+        """获取会话，不存在时创建
+
+        Args:
+            session_id: 会话ID
+            **kwargs: 创建会话时覆盖的参数
+        """
+        with self._lock:
+            self._cleanup_idle()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self.session_class(
+                    session_id, **dict(self.session_kwargs, **kwargs)
+                )
+                self._sessions[session_id] = session
+                logger.info(f"创建识别会话: {session_id}")
+            return session
+
+    def get(self, session_id):
+        """获取会话，不存在时返回None"""
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def pop(self, session_id):
+        """移除并返回会话"""
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def items(self):
+        """当前所有 (会话ID, 会话) 的列表"""
+        with self._lock:
+            return list(self._sessions.items())
+
+    def count(self):
+        """当前会话数"""
+        with self._lock:
+            return len(self._sessions)
+
+    def clear(self):
+        """清空所有会话（例如重新加载模型后缓存不再有效）"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            self._close(session)
+
+    def _cleanup_idle(self):
+        """清理长时间没有新音频的会话"""
+        now = time.time()
+        expired = [
+            session_id
+            for session_id, session in self._sessions.items()
+            if now - session.last_active > self.max_idle_seconds
+        ]
+        for session_id in expired:
+            self._close(self._sessions.pop(session_id))
+            logger.info(f"清理空闲的识别会话: {session_id}")
+
+    @staticmethod
+    def _close(session):
+        """释放会话占用的外部资源（例如增量解码器的 ffmpeg 进程）"""
+        close = getattr(session, "close", None)
+        if close is not None:
+            close()
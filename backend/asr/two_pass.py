@@ -0,0 +1,135 @@
+"""
+两遍识别 - 录音时由流式模型快速输出结果，录音结束后在后台用离线模型重新识别整段音频，更新保存的记录
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from asr.streaming import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# 第二遍识别的状态
+FINAL_PENDING = "pending"
+FINAL_RUNNING = "running"
+FINAL_DONE = "done"
+FINAL_FAILED = "failed"
+
+# 保留最近多少条记录的第二遍识别状态，供客户端查询
+DEFAULT_MAX_RESULTS = 200
+# 单条录音第二遍识别保留的最长音频（秒），更长的录音只保留第一遍的结果
+DEFAULT_MAX_AUDIO_SECONDS = 1800
+
+
+class FinalPassRunner:
+    """后台执行第二遍识别
+
+    第二遍识别在独立的线程中依次执行，不占用实时识别的调度线程；结果写回
+    数据库后通知等待中的客户端。
+    """
+
+    def __init__(self, recognize, on_result, max_workers=1, max_results=None):
+        """初始化第二遍识别
+
+        Args:
+            recognize: 识别函数，参数为整段音频采样，返回识别文本
+            on_result: 识别完成后调用的函数，参数为 (记录ID, 文本)，用于更新数据库
+            max_workers: 同时进行的第二遍识别数
+            max_results: 保留状态的记录数
+        """
+        self.recognize = recognize
+        self.on_result = on_result
+        self.max_results = max_results or DEFAULT_MAX_RESULTS
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="final-pass"
+        )
+        self._condition = threading.Condition()
+        self._results = OrderedDict()
+
+    def submit(self, record_id, audio_parts, first_pass_text=""):
+        """提交一条录音的第二遍识别
+
+        Args:
+            record_id: 记录ID
+            audio_parts: 按顺序排列的音频采样列表
+            first_pass_text: 第一遍（流式）识别的文本
+        """
+        with self._condition:
+            self._results[record_id] = {
+                "record_id": record_id,
+                "status": FINAL_PENDING,
+                "first_pass_text": first_pass_text,
+                "text": None,
+                "error": None,
+                "submitted_at": time.time(),
+                "finished_at": None,
+            }
+            self._results.move_to_end(record_id)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            self._condition.notify_all()
+        self._executor.submit(self._run, record_id, audio_parts)
+
+    def get_status(self, record_id):
+        """第二遍识别的状态，没有提交过时返回 None"""
+        with self._condition:
+            status = self._results.get(record_id)
+            return dict(status) if status else None
+
+    def wait(self, record_id, timeout):
+        """等待第二遍识别结束
+
+        Args:
+            record_id: 记录ID
+            timeout: 最长等待秒数
+
+        Returns:
+            状态字典，没有提交过时返回 None
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                status = self._results.get(record_id)
+                if status is None or status["status"] in (FINAL_DONE, FINAL_FAILED):
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return dict(status) if status else None
+
+    def shutdown(self):
+        """停止接收新的任务（已提交的任务不再等待）"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _update(self, record_id, **fields):
+        with self._condition:
+            status = self._results.get(record_id)
+            if status is not None:
+                status.update(fields)
+            self._condition.notify_all()
+
+    def _run(self, record_id, audio_parts):
+        self._update(record_id, status=FINAL_RUNNING)
+        try:
+            samples = np.concatenate(audio_parts) if audio_parts else np.zeros(0)
+            started = time.perf_counter()
+            text = self.recognize(samples) if len(samples) else ""
+            logger.info(
+                f"记录 {record_id} 第二遍识别完成: {len(samples) / SAMPLE_RATE:.1f}s 音频，"
+                f"耗时 {time.perf_counter() - started:.2f}s"
+            )
+            self.on_result(record_id, text)
+            self._update(
+                record_id, status=FINAL_DONE, text=text, finished_at=time.time()
+            )
+        except Exception as e:
+            logger.error(f"记录 {record_id} 第二遍识别失败: {e}")
+            self._update(
+                record_id, status=FINAL_FAILED, error=str(e), finished_at=time.time()
+            )
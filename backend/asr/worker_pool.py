@@ -0,0 +1,449 @@
+"""
+ASR 工作进程池 - 每个进程持有独立的 FunASR 模型，音频通过共享内存传递
+"""
+
+import os
+import time
+import logging
+import threading
+import itertools
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from asr.model_loader import create_model, warmup_model
+from asr.long_audio import run_model_stage
+
+logger = logging.getLogger(__name__)
+
+# 流式缓存超过该时间未使用时由工作进程自行清理（秒）
+STREAM_CACHE_IDLE_SECONDS = 600
+
+# 工作进程异常退出后重启的最长退避时间（秒）
+MAX_RESTART_DELAY = 30
+
+
+class WorkerError(Exception):
+    """工作进程崩溃、超时或推理失败"""
+
+
+def _write_shared_samples(arrays):
+    """把多段音频拷贝到一块共享内存中
+
+    Returns:
+        (SharedMemory, 每段长度列表)
+    """
+    arrays = [np.asarray(array, dtype=np.float32).reshape(-1) for array in arrays]
+    lengths = [len(array) for array in arrays]
+    total = sum(lengths)
+    shm = shared_memory.SharedMemory(create=True, size=max(total, 1) * 4)
+    buffer = np.ndarray((total,), dtype=np.float32, buffer=shm.buf)
+    offset = 0
+    for array in arrays:
+        buffer[offset : offset + len(array)] = array
+        offset += len(array)
+    del buffer
+    return shm, lengths
+
+
+def _read_shared_samples(name, lengths):
+    """从共享内存中读取音频（拷贝一份，模型可能在内部保留引用）"""
+    # 工作进程与主进程共用资源跟踪器，共享内存由主进程负责 unlink
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        buffer = np.ndarray((sum(lengths),), dtype=np.float32, buffer=shm.buf)
+        arrays = []
+        offset = 0
+        for length in lengths:
+            arrays.append(buffer[offset : offset + length].copy())
+            offset += length
+        del buffer
+        return arrays
+    finally:
+        shm.close()
+
+
+def _worker_main(worker_id, model_params, conn, num_threads):
+    """工作进程入口：加载模型后循环处理任务"""
+    try:
+        if num_threads:
+            import torch
+
+            torch.set_num_threads(num_threads)
+            # 每个工作进程依次处理任务，算子间并行只会与其他进程争抢核心
+            torch.set_num_interop_threads(1)
+        model = create_model(model_params)
+        warmup_model(model, model_params)
+    except Exception as e:
+        conn.send({"type": "error", "error": f"加载模型失败: {e}"})
+        return
+
+    conn.send({"type": "ready", "pid": os.getpid()})
+    logger.info(f"ASR 工作进程 {worker_id} 已就绪 (pid {os.getpid()})")
+
+    # 流式会话缓存: 会话ID -> (cache, 最后使用时间)
+    caches = {}
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if task["type"] == "stop":
+            break
+
+        try:
+            samples = _read_shared_samples(task["shm_name"], task["lengths"])
+
+            if task["type"] == "generate":
+                inputs = samples[0] if len(samples) == 1 else samples
+                result = model.generate(input=inputs, **task["kwargs"])
+            elif task["type"] == "stage":
+                inputs = task["text"] if task.get("text") is not None else samples[0]
+                result = run_model_stage(model, task["stage"], inputs, **task["kwargs"])
+            else:
+                session_id = task["session_id"]
+                cache = caches.get(session_id, ({}, 0))[0]
+                caches[session_id] = (cache, time.time())
+                result = model.inference(
+                    input=samples[0], cache=cache, **task["kwargs"]
+                )
+                if task["kwargs"].get("is_final"):
+                    caches.pop(session_id, None)
+
+            conn.send({"type": "result", "task_id": task["task_id"], "result": result})
+        except Exception as e:
+            conn.send(
+                {"type": "error", "task_id": task.get("task_id"), "error": str(e)}
+            )
+
+        # 清理长时间未使用的流式缓存
+        now = time.time()
+        for session_id in [
+            key
+            for key, (_, used_at) in caches.items()
+            if now - used_at > STREAM_CACHE_IDLE_SECONDS
+        ]:
+            del caches[session_id]
+
+
+class _WorkerHandle:
+    """主进程中对一个工作进程的引用"""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.process = None
+        self.conn = None
+        self.pid = None
+        self.ready = False
+        self.busy = False
+        self.failed = False
+        self.restarts = 0
+        self.next_restart_at = 0
+        self.task_started_at = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class ASRWorkerPool:
+    """ASR 工作进程池
+
+    对外提供与 AutoModel 相同的 generate 接口，供推理调度器使用；流式识别
+    通过 stream_step 固定路由到同一个工作进程，会话缓存保留在该进程中。
+    后台监控线程负责重启崩溃的进程，推理超时的进程会被强制结束并重启。
+    """
+
+    def __init__(self, model_params, num_workers=2, task_timeout=120, num_threads=None):
+        """初始化工作进程池
+
+        Args:
+            model_params: 模型参数字典，每个工作进程用它创建模型
+            num_workers: 工作进程数
+            task_timeout: 单个任务的超时时间（秒）
+            num_threads: 每个工作进程的 torch 线程数，默认平分 CPU 核心
+        """
+        self.model_params = dict(model_params)
+        self.num_workers = num_workers
+        self.task_timeout = task_timeout
+        self.num_threads = num_threads or max(
+            1, (os.cpu_count() or 1) // max(1, num_workers)
+        )
+        self.last_error = None
+
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = [_WorkerHandle(i) for i in range(num_workers)]
+        self._condition = threading.Condition()
+        self._task_ids = itertools.count(1)
+        self._session_affinity = {}
+        self._running = False
+        self._monitor_thread = None
+
+    def start(self):
+        """启动所有工作进程和监控线程"""
+        self._running = True
+        for handle in self._workers:
+            self._spawn(handle)
+        self._monitor_thread = threading.Thread(
+            target=self._monitor_loop, name="asr-worker-monitor", daemon=True
+        )
+        self._monitor_thread.start()
+
+    def wait_ready(self, timeout=None):
+        """等待至少一个工作进程加载完成
+
+        Returns:
+            bool: 是否有可用的工作进程
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while True:
+                if any(handle.ready for handle in self._workers):
+                    return True
+                if all(handle.failed for handle in self._workers):
+                    return False
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining if remaining is not None else 1.0)
+
+    def stop(self):
+        """停止所有工作进程"""
+        self._running = False
+        for handle in self._workers:
+            try:
+                if handle.conn is not None:
+                    handle.conn.send({"type": "stop"})
+            except (OSError, ValueError):
+                pass
+        for handle in self._workers:
+            if handle.process is not None:
+                handle.process.join(timeout=5)
+                if handle.process.is_alive():
+                    handle.process.terminate()
+        with self._condition:
+            self._condition.notify_all()
+
+    def generate(self, input, **kwargs):
+        """在任一空闲工作进程中执行识别（接口与 AutoModel.generate 相同）
+
+        Args:
+            input: 单个采样数组或采样数组列表
+            **kwargs: generate 参数
+
+        Returns:
+            识别结果列表
+        """
+        arrays = input if isinstance(input, (list, tuple)) else [input]
+        handle = self._acquire()
+        try:
+            return self._run_task(
+                handle, {"type": "generate", "kwargs": kwargs}, arrays
+            )
+        finally:
+            self._release(handle)
+
+    def stream_step(self, session_id, samples, **kwargs):
+        """在会话绑定的工作进程中执行一步流式推理
+
+        Args:
+            session_id: 流式会话ID
+            samples: 本步的音频采样
+            **kwargs: 流式推理参数（is_final、chunk_size 等，不含 cache）
+
+        Returns:
+            识别结果列表
+        """
+        with self._condition:
+            worker_id = self._session_affinity.get(session_id)
+            if worker_id is None:
+                # 新会话分配给当前绑定会话最少的工作进程
+                loads = [0] * self.num_workers
+                for bound in self._session_affinity.values():
+                    loads[bound] += 1
+                worker_id = loads.index(min(loads))
+                self._session_affinity[session_id] = worker_id
+            if kwargs.get("is_final"):
+                self._session_affinity.pop(session_id, None)
+
+        handle = self._acquire(self._workers[worker_id])
+        try:
+            return self._run_task(
+                handle,
+                {"type": "stream", "session_id": session_id, "kwargs": kwargs},
+                [samples],
+            )
+        finally:
+            self._release(handle)
+
+    def run_stage(self, stage, input, **kwargs):
+        """在任一空闲工作进程中单独执行 VAD、识别或标点阶段
+
+        Args:
+            stage: 阶段名称（见 asr.long_audio.run_model_stage）
+            input: 音频采样，标点阶段为文本
+            **kwargs: 推理参数
+
+        Returns:
+            结果列表，模型没有配置该阶段时返回 None
+        """
+        task = {"type": "stage", "stage": stage, "kwargs": kwargs}
+        if isinstance(input, str):
+            task["text"] = input
+            arrays = []
+        else:
+            arrays = [input]
+        handle = self._acquire()
+        try:
+            return self._run_task(handle, task, arrays)
+        finally:
+            self._release(handle)
+
+    def get_status(self):
+        """获取工作进程状态"""
+        with self._condition:
+            return [
+                {
+                    "worker_id": handle.worker_id,
+                    "pid": handle.pid,
+                    "alive": handle.is_alive(),
+                    "ready": handle.ready,
+                    "busy": handle.busy,
+                    "restarts": handle.restarts,
+                }
+                for handle in self._workers
+            ]
+
+    def _spawn(self, handle):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(handle.worker_id, self.model_params, child_conn, self.num_threads),
+            name=f"asr-worker-{handle.worker_id}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        handle.process = process
+        handle.conn = parent_conn
+        handle.pid = process.pid
+        handle.ready = False
+        handle.busy = False
+        handle.task_started_at = None
+        logger.info(f"启动 ASR 工作进程 {handle.worker_id} (pid {process.pid})")
+
+    def _restart(self, handle, reason):
+        """结束并重新启动工作进程（调用方需持有锁）"""
+        logger.warning(f"重启 ASR 工作进程 {handle.worker_id}: {reason}")
+        if handle.process is not None and handle.process.is_alive():
+            handle.process.kill()
+            handle.process.join(timeout=5)
+        if handle.conn is not None:
+            handle.conn.close()
+        # 绑定在该进程上的流式会话缓存已丢失
+        for session_id, worker_id in list(self._session_affinity.items()):
+            if worker_id == handle.worker_id:
+                del self._session_affinity[session_id]
+        handle.restarts += 1
+        handle.ready = False
+        handle.next_restart_at = time.time() + min(
+            MAX_RESTART_DELAY, 2 ** min(handle.restarts, 5)
+        )
+        handle.process = None
+
+    def _monitor_loop(self):
+        """监控工作进程：接收就绪消息，重启崩溃的进程"""
+        while self._running:
+            with self._condition:
+                for handle in self._workers:
+                    if handle.process is None:
+                        if time.time() >= handle.next_restart_at and not handle.failed:
+                            self._spawn(handle)
+                        continue
+
+                    if not handle.ready and handle.conn.poll():
+                        try:
+                            message = handle.conn.recv()
+                        except (EOFError, OSError):
+                            message = {"type": "error", "error": "工作进程意外退出"}
+                        if message["type"] == "ready":
+                            handle.ready = True
+                            self._condition.notify_all()
+                        else:
+                            self.last_error = message.get("error")
+                            logger.error(
+                                f"ASR 工作进程 {handle.worker_id} 启动失败: {self.last_error}"
+                            )
+                            # 模型加载失败通常不是偶发问题，不再重启
+                            handle.failed = True
+                            handle.process.join(timeout=5)
+                            handle.process = None
+                            self._condition.notify_all()
+                        continue
+
+                    if not handle.busy and not handle.is_alive():
+                        self._restart(handle, "进程已退出")
+                        self._condition.notify_all()
+            time.sleep(0.5)
+
+    def _acquire(self, preferred=None):
+        """获取一个空闲的工作进程，preferred 指定时只等待该进程"""
+        with self._condition:
+            while True:
+                if not self._running:
+                    raise WorkerError("ASR 工作进程池已停止")
+                candidates = [preferred] if preferred is not None else self._workers
+                for handle in candidates:
+                    if handle.ready and not handle.busy:
+                        handle.busy = True
+                        return handle
+                if all(handle.failed for handle in candidates):
+                    raise WorkerError(self.last_error or "没有可用的 ASR 工作进程")
+                self._condition.wait(1.0)
+
+    def _release(self, handle):
+        with self._condition:
+            handle.busy = False
+            handle.task_started_at = None
+            self._condition.notify_all()
+
+    def _run_task(self, handle, task, arrays):
+        """把音频写入共享内存并等待工作进程返回结果"""
+        shm, lengths = _write_shared_samples(arrays)
+        try:
+            task.update(
+                task_id=next(self._task_ids), shm_name=shm.name, lengths=lengths
+            )
+            handle.task_started_at = time.time()
+            try:
+                handle.conn.send(task)
+            except (OSError, ValueError) as e:
+                with self._condition:
+                    self._restart(handle, f"发送任务失败: {e}")
+                raise WorkerError(f"ASR 工作进程不可用: {e}")
+
+            deadline = handle.task_started_at + self.task_timeout
+            while not handle.conn.poll(0.1):
+                if not handle.is_alive():
+                    with self._condition:
+                        self._restart(handle, "推理过程中进程崩溃")
+                    raise WorkerError("ASR 工作进程在推理过程中崩溃")
+                if time.time() > deadline:
+                    with self._condition:
+                        self._restart(handle, f"推理超过 {self.task_timeout} 秒")
+                    raise WorkerError("ASR 工作进程推理超时")
+
+            try:
+                message = handle.conn.recv()
+            except (EOFError, OSError):
+                with self._condition:
+                    self._restart(handle, "推理过程中进程崩溃")
+                raise WorkerError("ASR 工作进程在推理过程中崩溃")
+            if message["type"] == "error":
+                raise WorkerError(message["error"])
+            return message["result"]
+        finally:
+            shm.close()
+            shm.unlink()
@@ -7,6 +7,25 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# 文件转写任务的字段
+JOB_FIELDS = (
+    "id",
+    "status",
+    "file_path",
+    "file_name",
+    "options_json",
+    "record_id",
+    "progress",
+    "processed_seconds",
+    "duration_seconds",
+    "next_chunk_index",
+    "error",
+    "created_at",
+    "updated_at",
+    "started_at",
+    "finished_at",
+)
+
 
 class DBManager:
     """SQLite数据库管理类，负责初始化数据库、创建表和提供CRUD操作"""
@@ -151,6 +170,41 @@ class DBManager:
             """
             )
 
+            # 创建文件转写任务表
+            cursor.execute(
+                """
+            CREATE TABLE IF NOT EXISTS transcription_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                file_name TEXT,
+                options_json TEXT,
+                record_id INTEGER,
+                progress REAL DEFAULT 0,
+                processed_seconds REAL DEFAULT 0,
+                duration_seconds REAL,
+                next_chunk_index INTEGER DEFAULT 0,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+            """
+            )
+
+            # 创建识别结果缓存表
+            cursor.execute(
+                """
+            CREATE TABLE IF NOT EXISTS asr_result_cache (
+                cache_key TEXT PRIMARY KEY,
+                result_json TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+            )
+
             conn.commit()
             logger.info("数据库初始化成功")
 
@@ -1658,6 +1712,32 @@ class DBManager:
             if conn:
                 conn.close()
 
+    def delete_chunks_from(self, record_id, start_index):
+        """删除指定记录中序号不小于 start_index 的分片（任务中断后重新处理）
+
+        Args:
+            record_id: 主记录ID
+            start_index: 起始分片序号
+
+        Returns:
+            bool: 是否删除成功
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM recognition_chunks WHERE record_id = ? AND chunk_index >= ?",
+                (record_id, start_index),
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"删除分片记录失败: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
     def delete_record(self, record_id):
         """软删除一条识别记录
 
@@ -1853,3 +1933,342 @@ class DBManager:
         finally:
             if conn:
                 conn.close()
+
+    def get_cached_result(self, cache_key):
+        """获取缓存的识别结果
+
+        Args:
+            cache_key: 缓存键
+
+        Returns:
+            识别结果的 JSON 字符串，不存在时返回 None
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "SELECT result_json FROM asr_result_cache WHERE cache_key = ?",
+                (cache_key,),
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+
+            cursor.execute(
+                "UPDATE asr_result_cache SET last_used_at = ? WHERE cache_key = ?",
+                (datetime.now().isoformat(), cache_key),
+            )
+            conn.commit()
+            return row[0]
+        except Exception as e:
+            logger.error(f"获取缓存的识别结果失败: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    def save_cached_result(self, cache_key, result_json, max_entries=5000):
+        """保存识别结果到缓存表，超过条数上限时删除最久未使用的结果
+
+        Args:
+            cache_key: 缓存键
+            result_json: 识别结果的 JSON 字符串
+            max_entries: 缓存表最多保留的条数
+
+        Returns:
+            是否保存成功
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            now = datetime.now().isoformat()
+            cursor.execute(
+                """
+            INSERT OR REPLACE INTO asr_result_cache (cache_key, result_json, created_at, last_used_at)
+            VALUES (?, ?, ?, ?)
+            """,
+                (cache_key, result_json, now, now),
+            )
+            cursor.execute(
+                """
+            DELETE FROM asr_result_cache WHERE cache_key NOT IN (
+                SELECT cache_key FROM asr_result_cache
+                ORDER BY last_used_at DESC LIMIT ?
+            )
+            """,
+                (max_entries,),
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"保存识别结果缓存失败: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def clear_cached_results(self):
+        """清空识别结果缓存表
+
+        Returns:
+            是否清空成功
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM asr_result_cache")
+            conn.commit()
+            logger.info("清空识别结果缓存成功")
+            return True
+        except Exception as e:
+            logger.error(f"清空识别结果缓存失败: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def add_job(self, job_id, file_path, file_name=None, options=None):
+        """添加一个文件转写任务
+
+        Args:
+            job_id: 任务ID
+            file_path: 待转写文件的路径
+            file_name: 上传时的原始文件名
+            options: 识别参数字典
+
+        Returns:
+            是否添加成功
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            now = datetime.now().isoformat()
+            cursor.execute(
+                """
+            INSERT INTO transcription_jobs (id, status, file_path, file_name, options_json, created_at, updated_at)
+            VALUES (?, 'queued', ?, ?, ?, ?, ?)
+            """,
+                (
+                    job_id,
+                    file_path,
+                    file_name,
+                    json.dumps(options or {}, ensure_ascii=False),
+                    now,
+                    now,
+                ),
+            )
+            conn.commit()
+            logger.info(f"添加转写任务成功，ID: {job_id}")
+            return True
+        except Exception as e:
+            logger.error(f"添加转写任务失败: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def get_job(self, job_id):
+        """获取一个文件转写任务
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            任务字典，不存在时返回 None
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM transcription_jobs WHERE id = ?",
+                (job_id,),
+            )
+            row = cursor.fetchone()
+            return self._job_from_row(row) if row else None
+        except Exception as e:
+            logger.error(f"获取转写任务失败: {e}")
+            return None
+        finally:
+            if conn:
+                conn.close()
+
+    def get_jobs(self, status=None, limit=100):
+        """获取文件转写任务列表（按创建时间排序）
+
+        Args:
+            status: 只返回指定状态的任务，可以是状态列表
+            limit: 最多返回的条数
+
+        Returns:
+            任务字典列表
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            sql = f"SELECT {', '.join(JOB_FIELDS)} FROM transcription_jobs"
+            params = []
+            if status:
+                statuses = [status] if isinstance(status, str) else list(status)
+                sql += f" WHERE status IN ({', '.join('?' for _ in statuses)})"
+                params.extend(statuses)
+            sql += " ORDER BY created_at LIMIT ?"
+            params.append(limit)
+
+            cursor.execute(sql, params)
+            return [self._job_from_row(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"获取转写任务列表失败: {e}")
+            return []
+        finally:
+            if conn:
+                conn.close()
+
+    def update_job(self, job_id, **fields):
+        """更新文件转写任务的字段
+
+        Args:
+            job_id: 任务ID
+            **fields: 需要更新的字段（status、progress、error 等）
+
+        Returns:
+            是否更新成功
+        """
+        fields = {k: v for k, v in fields.items() if k in JOB_FIELDS}
+        if not fields:
+            return False
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            fields["updated_at"] = datetime.now().isoformat()
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            cursor.execute(
+                f"UPDATE transcription_jobs SET {assignments} WHERE id = ?",
+                list(fields.values()) + [job_id],
+            )
+            conn.commit()
+            return cursor.rowcount > 0
+        except Exception as e:
+            logger.error(f"更新转写任务失败: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def requeue_interrupted_jobs(self):
+        """把服务异常退出时仍在运行的任务重新放回队列
+
+        Returns:
+            重新排队的任务数
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "UPDATE transcription_jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (datetime.now().isoformat(),),
+            )
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"恢复转写任务失败: {e}")
+            return 0
+        finally:
+            if conn:
+                conn.close()
+
+    def update_record_text(self, record_id, text, audio_path=None):
+        """更新识别记录的文本（以及音频路径）
+
+        Args:
+            record_id: 记录ID
+            text: 完整文本
+            audio_path: 音频文件路径，None 表示不修改
+
+        Returns:
+            是否更新成功
+        """
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            if audio_path is None:
+                cursor.execute(
+                    "UPDATE recognition_records SET text = ? WHERE id = ?",
+                    (text, record_id),
+                )
+            else:
+                cursor.execute(
+                    "UPDATE recognition_records SET text = ?, audio_path = ? WHERE id = ?",
+                    (text, audio_path, record_id),
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"更新记录文本失败: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def save_record_chunks(self, record_id, chunks, text, audio_path=None):
+        """在一个事务中写入实时录音的所有分片并更新主记录
+
+        Args:
+            record_id: 主记录ID
+            chunks: [(分片索引, 文本, 音频路径), ...]
+            text: 完整文本
+            audio_path: 主记录的音频文件路径，None 表示不修改
+
+        Returns:
+            是否保存成功
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+
+            created_at = datetime.now().isoformat()
+            cursor.executemany(
+                """
+            INSERT INTO recognition_chunks (record_id, chunk_index, text, audio_path, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+                [
+                    (record_id, chunk_index, chunk_text, chunk_audio_path, created_at)
+                    for chunk_index, chunk_text, chunk_audio_path in chunks
+                ],
+            )
+            if audio_path is None:
+                cursor.execute(
+                    "UPDATE recognition_records SET text = ? WHERE id = ?",
+                    (text, record_id),
+                )
+            else:
+                cursor.execute(
+                    "UPDATE recognition_records SET text = ?, audio_path = ? WHERE id = ?",
+                    (text, audio_path, record_id),
+                )
+            conn.commit()
+            logger.info(f"保存记录 {record_id} 的 {len(chunks)} 个分片")
+            return True
+        except Exception as e:
+            logger.error(f"保存实时录音分片失败: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
+    def _job_from_row(self, row):
+        job = dict(zip(JOB_FIELDS, row))
+        try:
+            job["options"] = json.loads(job.pop("options_json") or "{}")
+        except ValueError:
+            job["options"] = {}
+        return job
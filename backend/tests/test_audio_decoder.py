@@ -0,0 +1,138 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+import utils.audio_decoder as audio_decoder
+from utils.audio_decoder import (
+    SAMPLE_RATE,
+    AudioDecodeError,
+    StreamDecoder,
+    decode_audio_bytes,
+    decode_base64_audio,
+    iter_audio_frames,
+    probe_duration,
+    supports_stream_decoding,
+)
+
+
+def wav_bytes(samples, sample_rate=SAMPLE_RATE, channels=1):
+    """把 int16 采样（多声道时按帧交错）写成 WAV 字节"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def test_wav_is_decoded_in_process():
+    samples = decode_audio_bytes(wav_bytes([0, 16384, -16384, -32768]))
+
+    assert samples.dtype == np.float32
+    np.testing.assert_allclose(samples, [0.0, 0.5, -0.5, -1.0])
+
+
+def test_stereo_wav_is_mixed_down_to_mono():
+    samples = decode_audio_bytes(wav_bytes([16384, 0, -16384, -16384], channels=2))
+
+    np.testing.assert_allclose(samples, [0.25, -0.5])
+
+
+def test_wav_with_other_sample_rate_is_not_parsed_in_process(monkeypatch):
+    decoded = []
+    monkeypatch.setattr(audio_decoder, "av", None)
+    monkeypatch.setattr(
+        audio_decoder,
+        "_decode_with_ffmpeg",
+        lambda audio_bytes, sample_rate: decoded.append(sample_rate) or np.zeros(1),
+    )
+
+    decode_audio_bytes(wav_bytes([0, 0], sample_rate=8000))
+
+    # 需要重采样，交给 ffmpeg 处理
+    assert decoded == [SAMPLE_RATE]
+
+
+def test_empty_audio_is_rejected():
+    with pytest.raises(AudioDecodeError):
+        decode_audio_bytes(b"")
+
+
+def test_base64_with_data_url_prefix():
+    assert decode_base64_audio("data:audio/webm;base64,aGVsbG8=") == b"hello"
+    assert decode_base64_audio("aGVsbG8=") == b"hello"
+
+    with pytest.raises(AudioDecodeError):
+        decode_base64_audio("not base64!")
+
+
+def test_iter_audio_frames_reads_wav_in_fixed_frames(tmp_path):
+    path = tmp_path / "audio.wav"
+    path.write_bytes(wav_bytes(np.arange(25) * 100))
+
+    frames = list(iter_audio_frames(str(path), 10 / SAMPLE_RATE))
+
+    assert [len(frame) for frame in frames] == [10, 10, 5]
+    np.testing.assert_allclose(np.concatenate(frames) * 32768, np.arange(25) * 100)
+
+
+def test_iter_audio_frames_starts_at_offset(tmp_path):
+    path = tmp_path / "audio.wav"
+    path.write_bytes(wav_bytes(np.arange(25) * 100))
+
+    frames = list(iter_audio_frames(str(path), 10 / SAMPLE_RATE, 20 / SAMPLE_RATE))
+
+    np.testing.assert_allclose(np.concatenate(frames) * 32768, np.arange(20, 25) * 100)
+
+
+def test_probe_duration_of_wav(tmp_path):
+    path = tmp_path / "audio.wav"
+    path.write_bytes(wav_bytes(np.zeros(SAMPLE_RATE * 3 // 2)))
+
+    assert probe_duration(str(path)) == pytest.approx(1.5)
+
+
+def test_probe_duration_without_ffmpeg(tmp_path, monkeypatch):
+    path = tmp_path / "audio.webm"
+    path.write_bytes(b"\x1a\x45\xdf\xa3")
+    monkeypatch.setattr(audio_decoder, "find_ffmpeg", lambda: None)
+
+    assert probe_duration(str(path)) is None
+
+
+def stream_decode(fragments, order):
+    decoder = StreamDecoder("test", timeout=0.5)
+    decoded = [decoder.feed_fragment(index, fragments[index]) for index in order]
+    decoded.append(decoder.finish())
+    return np.concatenate(decoded)
+
+
+@pytest.mark.skipif(not supports_stream_decoding(), reason="需要 ffmpeg")
+def test_stream_decoder_writes_fragments_in_index_order():
+    samples = (np.sin(np.arange(SAMPLE_RATE) / 10) * 10000).astype(np.int16)
+    data = wav_bytes(samples)
+    size = len(data) // 4 + 1
+    fragments = [data[i : i + size] for i in range(0, len(data), size)]
+
+    expected = stream_decode(fragments, range(4))
+    # 乱序到达的片段按索引写入，重复到达的片段被忽略
+    decoded = stream_decode(fragments, [0, 2, 1, 1, 3])
+
+    assert len(expected) > SAMPLE_RATE // 2
+    np.testing.assert_array_equal(decoded, expected)
+
+
+@pytest.mark.skipif(not supports_stream_decoding(), reason="需要 ffmpeg")
+def test_stream_decoder_stays_failed_after_an_error():
+    decoder = StreamDecoder("test", timeout=0.5)
+    decoder.close()
+
+    with pytest.raises(AudioDecodeError):
+        decoder.feed_fragment(0, b"\x00" * 65536)
+    # 之后的片段没有容器头，不再写入
+    with pytest.raises(AudioDecodeError):
+        decoder.feed_fragment(1, b"\x00")
+    assert decoder.error
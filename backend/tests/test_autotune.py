@@ -0,0 +1,163 @@
+import os
+
+import asr.autotune as autotune
+from asr.autotune import (
+    CONFIG_VERSION,
+    Autotuner,
+    choose_config,
+    max_workers_by_memory,
+    measure_worker_bytes,
+    thread_candidates,
+)
+
+GIB = 1024**3
+
+
+def test_thread_candidates_are_powers_of_two_and_cpu_count():
+    assert thread_candidates(1) == [1]
+    assert thread_candidates(8) == [1, 2, 4, 8]
+    assert thread_candidates(6) == [1, 2, 4, 6]
+
+
+def test_choose_config_prefers_throughput_within_latency_tolerance():
+    results = [
+        {"torch_threads": 1, "latency_ms": 140},
+        {"torch_threads": 2, "latency_ms": 110},
+        {"torch_threads": 8, "latency_ms": 100},
+    ]
+
+    config = choose_config("cpu", 8, results)
+
+    assert config == {
+        "torch_threads": 1,
+        "asr_workers": 8,
+        "estimated_throughput": round(8 * 1000 / 140, 2),
+    }
+
+
+def test_choose_config_skips_configurations_that_are_too_slow():
+    results = [
+        {"torch_threads": 1, "latency_ms": 400},
+        {"torch_threads": 4, "latency_ms": 100},
+    ]
+
+    config = choose_config("cpu", 4, results)
+
+    assert config["torch_threads"] == 4
+    assert config["asr_workers"] == 0
+
+
+def test_choose_config_caps_workers_by_memory():
+    results = [
+        {"torch_threads": 1, "latency_ms": 100},
+        {"torch_threads": 2, "latency_ms": 60},
+    ]
+
+    config = choose_config("cpu", 8, results, max_workers=3)
+
+    # 内存只容纳 3 个进程时，每个进程使用 2 个线程更快
+    assert config["torch_threads"] == 2
+    assert config["asr_workers"] == 3
+
+
+def test_choose_config_uses_a_single_process_on_gpu():
+    results = [
+        {"torch_threads": 1, "latency_ms": 20},
+        {"torch_threads": 4, "latency_ms": 18},
+    ]
+
+    config = choose_config("cuda", 8, results)
+
+    assert config["torch_threads"] == 4
+    assert config["asr_workers"] == 0
+
+
+def test_max_workers_by_memory():
+    assert max_workers_by_memory(GIB, 10 * GIB) == 8
+    assert max_workers_by_memory(4 * GIB, 2 * GIB) == 1
+    assert max_workers_by_memory(None, 10 * GIB) is None
+    assert max_workers_by_memory(GIB, None) is None
+
+
+def test_saved_config_is_validated(tmp_path, monkeypatch):
+    monkeypatch.setattr(autotune, "detect_device", lambda: ("cpu", {}))
+    tuner = Autotuner(str(tmp_path))
+    assert tuner.load() is None
+
+    config = {
+        "version": CONFIG_VERSION,
+        "cpu_count": os.cpu_count() or 1,
+        "model": "paraformer-zh",
+        "device": "cpu",
+        "backend": "torch",
+        "torch_threads": 2,
+        "asr_workers": 0,
+    }
+    tuner._save(config)
+
+    assert tuner.load() == config
+    assert tuner.is_valid(config, {"model": "paraformer-zh"})
+    assert not tuner.is_valid(config, {"model": "sensevoice"})
+    assert not tuner.is_valid(
+        dict(config, version=CONFIG_VERSION - 1), {"model": "paraformer-zh"}
+    )
+    assert not tuner.is_valid(dict(config, device="cuda"), {"model": "paraformer-zh"})
+    # 换用其他推理后端后需要重新校准
+    assert not tuner.is_valid(
+        config, {"model": "paraformer-zh", "backend": "torch-int8", "device": "cpu"}
+    )
+
+
+def test_unreadable_config_is_ignored(tmp_path):
+    tuner = Autotuner(str(tmp_path))
+    with open(tuner.path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+
+    assert tuner.load() is None
+
+
+class FakeWorkerPool:
+    """记录创建参数的工作进程池，ready 控制是否启动成功"""
+
+    ready = True
+    instances = []
+
+    def __init__(self, model_params, num_workers=2, num_threads=None):
+        self.num_workers = num_workers
+        self.num_threads = num_threads
+        self.stopped = False
+        self.last_error = "加载模型失败"
+        FakeWorkerPool.instances.append(self)
+
+    def start(self):
+        pass
+
+    def wait_ready(self, timeout=None):
+        return self.ready
+
+    def get_status(self):
+        return [{"pid": 4321}]
+
+    def stop(self):
+        self.stopped = True
+
+
+def test_measure_worker_bytes_reads_worker_process_memory(monkeypatch):
+    FakeWorkerPool.instances = []
+    monkeypatch.setattr(autotune, "ASRWorkerPool", FakeWorkerPool)
+    monkeypatch.setattr(
+        autotune, "process_rss_bytes", lambda pid=None: GIB if pid == 4321 else None
+    )
+
+    assert measure_worker_bytes({"model": "paraformer-zh"}, 2) == GIB
+    pool = FakeWorkerPool.instances[0]
+    assert (pool.num_workers, pool.num_threads, pool.stopped) == (1, 2, True)
+
+
+def test_measure_worker_bytes_returns_none_when_worker_fails(monkeypatch):
+    FakeWorkerPool.instances = []
+    monkeypatch.setattr(autotune, "ASRWorkerPool", FakeWorkerPool)
+    monkeypatch.setattr(FakeWorkerPool, "ready", False)
+
+    assert measure_worker_bytes({"model": "paraformer-zh"}, 2) is None
+    assert FakeWorkerPool.instances[0].stopped
@@ -0,0 +1,78 @@
+import pytest
+
+import asr.backends as backends
+from asr.backends import (
+    BACKEND_ONNX,
+    BACKEND_TORCH,
+    BACKEND_TORCH_INT8,
+    BackendStats,
+    model_backend,
+    resolve_backend,
+)
+
+
+def params(backend, model="paraformer-zh", device="cpu"):
+    return {"model": model, "device": device, "backend": backend}
+
+
+@pytest.fixture
+def onnx_installed(monkeypatch):
+    monkeypatch.setattr(backends, "funasr_onnx", object())
+
+
+def test_default_backend_is_torch():
+    model_params = {"model": "paraformer-zh", "device": "cpu"}
+
+    assert resolve_backend(model_params) == BACKEND_TORCH
+    assert resolve_backend(params(None)) == BACKEND_TORCH
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        resolve_backend(params("tensorrt"))
+
+
+def test_onnx_backend(onnx_installed):
+    assert resolve_backend(params(BACKEND_ONNX)) == BACKEND_ONNX
+
+
+def test_onnx_falls_back_for_streaming_models(onnx_installed):
+    assert (
+        resolve_backend(params(BACKEND_ONNX, model="paraformer-zh-streaming"))
+        == BACKEND_TORCH
+    )
+
+
+def test_onnx_falls_back_when_not_installed(monkeypatch):
+    monkeypatch.setattr(backends, "funasr_onnx", None)
+
+    assert resolve_backend(params(BACKEND_ONNX)) == BACKEND_TORCH
+
+
+def test_int8_only_on_cpu():
+    assert resolve_backend(params(BACKEND_TORCH_INT8)) == BACKEND_TORCH_INT8
+    assert resolve_backend(params(BACKEND_TORCH_INT8, device="cuda")) == BACKEND_TORCH
+
+
+def test_model_backend_prefers_the_loaded_model():
+    class Model:
+        inference_backend = BACKEND_ONNX
+
+    assert model_backend(Model(), params(BACKEND_TORCH)) == BACKEND_ONNX
+    assert model_backend(object(), params(BACKEND_TORCH_INT8)) == BACKEND_TORCH_INT8
+    assert model_backend(object(), {}) == BACKEND_TORCH
+
+
+def test_backend_stats():
+    stats = BackendStats()
+    stats.record(BACKEND_ONNX, 0.2, 2.0)
+    stats.record(BACKEND_ONNX, 0.4, 2.0)
+    stats.record(BACKEND_TORCH, 0.1, 0.0)
+
+    snapshot = stats.snapshot()
+
+    assert snapshot[BACKEND_ONNX]["requests"] == 2
+    assert snapshot[BACKEND_ONNX]["avg_latency_ms"] == 300.0
+    assert snapshot[BACKEND_ONNX]["last_latency_ms"] == 400.0
+    assert snapshot[BACKEND_ONNX]["rtf"] == 0.15
+    assert snapshot[BACKEND_TORCH]["rtf"] is None
@@ -0,0 +1,75 @@
+import io
+
+from utils.binary_transport import BodyBuffer, parse_bool, parse_int, read_stream_params
+
+
+class ChunkedStream:
+    """每次最多返回 chunk_size 字节、没有 readinto 的流"""
+
+    def __init__(self, data, chunk_size):
+        self.data = data
+        self.chunk_size = chunk_size
+
+    def read(self, size):
+        data = self.data[: min(size, self.chunk_size)]
+        self.data = self.data[len(data) :]
+        return data
+
+
+def test_parse_bool_and_int():
+    assert parse_bool("true") and parse_bool("1") and parse_bool(" Yes ")
+    assert not parse_bool("0") and not parse_bool(None) and not parse_bool("")
+    assert parse_bool(True)
+    assert parse_int("12") == 12
+    assert parse_int("") is None and parse_int(None) is None and parse_int("x") is None
+
+
+def test_stream_params_precedence():
+    params = read_stream_params(
+        args={"record_id": "2", "chunk_index": "3"},
+        headers={"X-Record-Id": "1", "X-Is-Last-Chunk": "true"},
+        form={"chunk_index": "4"},
+    )
+
+    assert params["record_id"] == 2
+    assert params["chunk_index"] == 4
+    assert params["is_last_chunk"] is True
+    assert params["auto_insert"] is False
+
+
+def test_stream_params_from_headers_only():
+    params = read_stream_params(
+        {}, {"X-Record-Id": "7", "X-Chunk-Index": "0", "X-Auto-Insert": "1"}
+    )
+
+    assert (params["record_id"], params["chunk_index"]) == (7, 0)
+    assert params["auto_insert"] is True
+
+
+def test_body_buffer_reads_exact_length():
+    buffer = BodyBuffer()
+
+    assert bytes(buffer.read(io.BytesIO(b"hello world"), 5)) == b"hello"
+    assert bytes(buffer.read(ChunkedStream(b"abcdefgh", 3), 8)) == b"abcdefgh"
+    # 流提前结束时返回实际读到的数据
+    assert bytes(buffer.read(io.BytesIO(b"abc"), 10)) == b"abc"
+
+
+def test_body_buffer_is_reused_per_thread():
+    buffer = BodyBuffer()
+
+    first = buffer.read(io.BytesIO(b"a" * 10), 10)
+    second = buffer.read(io.BytesIO(b"b" * 10), 10)
+
+    assert first.obj is second.obj
+
+
+def test_large_buffer_is_not_retained():
+    buffer = BodyBuffer(max_retained_bytes=100 * 1024)
+    data = b"x" * (200 * 1024)
+
+    view = buffer.read(io.BytesIO(data), len(data))
+    small = buffer.read(io.BytesIO(b"y"), 1)
+
+    assert bytes(view) == data
+    assert small.obj is not view.obj
@@ -0,0 +1,166 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from asr.chunk_queue import ChunkQueue, ChunkQueueTotals, PendingChunk
+from asr.streaming import SAMPLE_RATE
+
+
+def samples(seconds, value):
+    return np.full(int(seconds * SAMPLE_RATE), value, dtype=np.float32)
+
+
+class BlockingProcess:
+    """第一次调用阻塞到 release，用来模拟识别进行中有分片排队"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.batches = []
+
+    def __call__(self, batch, audio):
+        self.batches.append(([chunk.chunk_index for chunk in batch], audio))
+        if len(self.batches) == 1:
+            self.started.set()
+            self.released.wait(5)
+        return batch[-1].chunk_index
+
+
+def submit_in_thread(queue, results, chunk_index, audio, process, is_last=False):
+    def target():
+        results[chunk_index] = queue.run(chunk_index, audio, is_last, process)
+
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread
+
+
+def wait_pending(queue, count):
+    deadline = time.time() + 5
+    while len(queue._pending) < count and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(queue._pending) == count
+
+
+def test_single_chunk_is_processed_directly():
+    queue = ChunkQueue("s", strip_header=False)
+    audio = samples(1, 0.5)
+
+    chunk = queue.run(0, audio, False, lambda batch, merged: len(merged))
+
+    assert chunk.done and not chunk.coalesced and not chunk.dropped
+    assert chunk.result == len(audio)
+
+
+def test_queued_chunks_are_coalesced_into_one_inference():
+    totals = ChunkQueueTotals()
+    queue = ChunkQueue("s", strip_header=False, totals=totals)
+    process = BlockingProcess()
+    results = {}
+
+    first = submit_in_thread(queue, results, 0, samples(1, 0), process)
+    assert process.started.wait(5)
+    second = submit_in_thread(queue, results, 1, samples(1, 1), process)
+    wait_pending(queue, 1)
+    # 索引 3 先于 2 到达，处理时仍按索引排序
+    third = submit_in_thread(queue, results, 3, samples(1, 3), process)
+    wait_pending(queue, 2)
+    fourth = submit_in_thread(queue, results, 2, samples(1, 2), process)
+    wait_pending(queue, 3)
+    process.released.set()
+    for thread in (first, second, third, fourth):
+        thread.join(5)
+
+    assert results[0].result == 0
+    assert results[1].coalesced and results[1].result is None
+    assert results[3].coalesced
+    assert results[2].result == 3
+    indexes, merged = process.batches[1]
+    assert indexes == [1, 2, 3]
+    assert np.array_equal(
+        merged, np.concatenate([samples(1, 1), samples(1, 2), samples(1, 3)])
+    )
+    assert totals.coalesced == 2
+    assert totals.dropped == 0
+
+
+def test_backlog_over_limit_drops_oldest_chunks():
+    totals = ChunkQueueTotals()
+    queue = ChunkQueue("s", strip_header=False, max_pending_seconds=2, totals=totals)
+    process = BlockingProcess()
+    results = {}
+
+    threads = [submit_in_thread(queue, results, 0, samples(1, 0), process)]
+    assert process.started.wait(5)
+    for index in (1, 2, 3):
+        threads.append(
+            submit_in_thread(queue, results, index, samples(1, index), process)
+        )
+        wait_pending(queue, min(index, 2))
+    process.released.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results[1].dropped and not results[1].coalesced
+    assert process.batches[1][0] == [2, 3]
+    assert totals.dropped == 1
+
+
+def test_trim_keeps_last_chunk():
+    queue = ChunkQueue("s", strip_header=False, max_pending_seconds=1)
+    queue._pending = [
+        PendingChunk(0, samples(2, 0), True),
+        PendingChunk(1, samples(2, 1), False),
+    ]
+
+    assert queue._trim() == 0
+    assert len(queue._pending) == 2
+
+
+def test_merge_strips_repeated_header():
+    queue = ChunkQueue("s", strip_header=True)
+    rng = np.random.RandomState(0)
+    header = rng.randn(1600).astype(np.float32)
+    bodies = [rng.randn(4000).astype(np.float32) for _ in range(3)]
+    batch = [
+        PendingChunk(index, np.concatenate([header, body]), False)
+        for index, body in enumerate(bodies)
+    ]
+
+    merged = queue._merge(batch)
+
+    expected = np.concatenate([header, bodies[0], bodies[1], bodies[2]])
+    assert np.array_equal(merged, expected)
+
+
+def test_marker_without_audio_merges_to_none():
+    queue = ChunkQueue("s", strip_header=False)
+
+    chunk = queue.run(5, None, True, lambda batch, merged: merged)
+
+    assert chunk.result is None
+
+
+def test_process_error_is_raised_to_the_caller():
+    queue = ChunkQueue("s", strip_header=False)
+
+    def fail(batch, merged):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        queue.run(0, samples(1, 0), False, fail)
+    # 出错后队列可以继续使用
+    assert queue.run(1, samples(1, 1), False, lambda batch, merged: 1).result == 1
+
+
+def test_hint_reports_slow_down_when_lagging():
+    queue = ChunkQueue("s", strip_header=False, slow_down_seconds=1)
+    assert queue.hint() == {"lag_seconds": 0.0, "slow_down": False}
+
+    chunk = PendingChunk(0, samples(1, 0), False)
+    chunk.received_at -= 5
+    queue._pending = [chunk]
+
+    assert queue.hint()["slow_down"]
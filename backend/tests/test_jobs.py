@@ -0,0 +1,137 @@
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from asr.jobs import (
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_RUNNING,
+    TERMINAL_STATUSES,
+    JobManager,
+)
+from asr.streaming import SAMPLE_RATE
+from db.db_manager import DBManager
+
+
+def write_wav(path, seconds):
+    """第 n 秒的采样值都是 n * 1000，识别结果可以看出送入的是哪一秒"""
+    samples = np.repeat(np.arange(seconds) * 1000, SAMPLE_RATE).astype(np.int16)
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(samples.tobytes())
+    return str(path)
+
+
+class FakeRecognizer:
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, audio, options):
+        text = f"s{int(round(audio[0] * 32768 / 1000))}"
+        self.texts.append(text)
+        return text, None
+
+
+@pytest.fixture
+def db(tmp_path):
+    return DBManager(db_path=str(tmp_path))
+
+
+@pytest.fixture
+def make_manager(db, tmp_path):
+    managers = []
+
+    def make(recognize):
+        manager = JobManager(
+            db,
+            str(tmp_path / "jobs"),
+            recognize,
+            window_seconds=1,
+            overlap_seconds=0,
+        )
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.stop()
+
+
+def wait_finished(manager, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get_job(job_id)
+        if job["status"] in TERMINAL_STATUSES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"任务 {job_id} 没有结束")
+
+
+def record_text(db, record_id):
+    return "".join(chunk["text"] for chunk in db.get_chunks_by_record_id(record_id))
+
+
+def test_job_transcribes_file_window_by_window(make_manager, db, tmp_path):
+    recognize = FakeRecognizer()
+    manager = make_manager(recognize)
+    manager.start()
+
+    job = manager.submit_path(write_wav(tmp_path / "a.wav", 3))
+    job = wait_finished(manager, job["id"])
+
+    assert job["status"] == JOB_DONE
+    assert job["progress"] == 1.0
+    assert recognize.texts == ["s0", "s1", "s2"]
+    assert record_text(db, job["record_id"]) == "s0s1s2"
+
+
+def test_interrupted_job_resumes_from_recorded_progress(make_manager, db, tmp_path):
+    manager = make_manager(FakeRecognizer())
+    job = manager.submit_path(write_wav(tmp_path / "a.wav", 3))
+    record_id = db.add_record(text="", mode="file", is_chunked=True)
+    db.add_chunk(record_id=record_id, chunk_index=0, text="s0")
+    # 进度记录之前已经写入的分片在恢复时重新识别
+    db.add_chunk(record_id=record_id, chunk_index=1, text="stale")
+    db.update_job(
+        job["id"],
+        status=JOB_RUNNING,
+        record_id=record_id,
+        processed_seconds=1.0,
+        next_chunk_index=1,
+    )
+
+    recognize = FakeRecognizer()
+    restarted = make_manager(recognize)
+    restarted.start()
+    job = wait_finished(restarted, job["id"])
+
+    assert job["status"] == JOB_DONE
+    assert recognize.texts == ["s1", "s2"]
+    assert record_text(db, record_id) == "s0s1s2"
+
+
+def test_queued_job_can_be_cancelled(make_manager, tmp_path):
+    manager = make_manager(FakeRecognizer())
+    job = manager.submit_path(write_wav(tmp_path / "a.wav", 1))
+
+    assert manager.cancel(job["id"])
+    assert manager.get_job(job["id"])["status"] == JOB_CANCELLED
+    assert not manager.cancel(job["id"])
+
+
+def test_failed_recognition_marks_job_failed(make_manager, tmp_path):
+    def recognize(audio, options):
+        raise RuntimeError("模型出错")
+
+    manager = make_manager(recognize)
+    manager.start()
+    job = manager.submit_path(write_wav(tmp_path / "a.wav", 1))
+    job = wait_finished(manager, job["id"])
+
+    assert job["status"] == JOB_FAILED
+    assert job["error"] == "模型出错"
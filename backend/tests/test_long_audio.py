@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from asr.long_audio import (
+    STAGE_ASR,
+    STAGE_PUNC,
+    STAGE_VAD,
+    LongAudioTranscriber,
+    group_segments,
+)
+from asr.streaming import SAMPLE_RATE
+
+
+def test_group_segments_merges_neighbours_up_to_max_length():
+    segments = [[12000, 15000], [0, 4000], [5000, 9000], [20000, 20000]]
+
+    assert group_segments(segments, max_seconds=10) == [(0, 9000), (12000, 15000)]
+    assert group_segments([[0, 30000]], max_seconds=10) == [(0, 30000)]
+    assert group_segments([]) == []
+
+
+class FakeStages:
+    """VAD 返回固定的语音段，识别结果是语音段开始的秒数"""
+
+    def __init__(self, segments, timestamps=True):
+        self.segments = segments
+        self.timestamps = timestamps
+        self.calls = []
+
+    def __call__(self, stage, input, **kwargs):
+        self.calls.append(stage)
+        if stage == STAGE_VAD:
+            return [{"value": self.segments}]
+        if stage == STAGE_PUNC:
+            return [{"text": input + "。"}]
+        second = int(round(input[0]))
+        result = {"text": f"s{second}"}
+        if self.timestamps:
+            result["timestamp"] = [[100, 300]]
+        return [result]
+
+
+def audio(seconds):
+    """每一秒的采样值等于该秒的序号"""
+    return np.repeat(np.arange(seconds, dtype=np.float32), SAMPLE_RATE)
+
+
+def test_segments_are_recognized_in_order_and_punctuated_once():
+    stages = FakeStages([[0, 1000], [5000, 6000], [9000, 9500]])
+    transcriber = LongAudioTranscriber(stages, parallelism=3, max_segment_seconds=2)
+
+    result = transcriber.transcribe(audio(10))
+
+    assert result["text"] == "s0 s5 s9。"
+    assert [segment["start"] for segment in result["segments"]] == [0, 5000, 9000]
+    assert result["timestamp"] == [[100, 300], [5100, 5300], [9100, 9300]]
+    assert stages.calls.count(STAGE_ASR) == 3
+    assert stages.calls.count(STAGE_PUNC) == 1
+
+
+def test_missing_timestamps():
+    stages = FakeStages([[0, 1000], [5000, 6000]], timestamps=False)
+
+    result = LongAudioTranscriber(stages, max_segment_seconds=2).transcribe(audio(6))
+
+    assert result["timestamp"] is None
+
+
+def test_model_without_vad_is_rejected():
+    transcriber = LongAudioTranscriber(lambda stage, input, **kwargs: None)
+
+    with pytest.raises(RuntimeError):
+        transcriber.transcribe(audio(1))
@@ -0,0 +1,78 @@
+from utils.metrics import Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+
+    assert snapshot["buckets"] == {"0.1": 2, "1": 3, "+Inf": 4}
+    assert snapshot["count"] == 4
+    assert snapshot["sum"] == 3.65
+
+
+def test_render_labeled_histogram_and_counter():
+    registry = MetricsRegistry()
+    latency = registry.histogram("stage_seconds", "阶段耗时", buckets=(1.0,))
+    requests = registry.counter("requests_total", "请求数")
+    latency.labels(stage="asr").observe(0.5)
+    requests.inc(endpoint="/api/recognize")
+    requests.inc(2, endpoint="/api/recognize")
+
+    lines = registry.render().splitlines()
+
+    assert lines == [
+        "# HELP stage_seconds 阶段耗时",
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{stage="asr",le="1"} 1',
+        'stage_seconds_bucket{stage="asr",le="+Inf"} 1',
+        'stage_seconds_sum{stage="asr"} 0.5',
+        'stage_seconds_count{stage="asr"} 1',
+        "# HELP requests_total 请求数",
+        "# TYPE requests_total counter",
+        'requests_total{endpoint="/api/recognize"} 3',
+    ]
+
+
+def test_render_gauges_and_escapes_labels():
+    registry = MetricsRegistry()
+    registry.gauge("model_loaded", "模型是否已加载", lambda: True)
+    registry.gauge("queue_depth", "队列长度", lambda: [((("model", 'a"b'),), 2)])
+    registry.gauge("skipped", "取值为空时不输出", lambda: None)
+
+    text = registry.render()
+
+    assert "model_loaded 1\n" in text
+    assert 'queue_depth{model="a\\"b"} 2\n' in text
+    assert "# TYPE skipped gauge\n" in text
+    assert "\nskipped " not in text
+
+
+def test_failing_metric_does_not_break_render():
+    registry = MetricsRegistry()
+
+    def fail():
+        raise RuntimeError("not ready")
+
+    registry.gauge("broken", "取值失败", fail)
+    registry.counter_func("jobs_total", "任务数", lambda: 5)
+
+    text = registry.render()
+
+    assert "broken" not in text
+    assert "jobs_total 5\n" in text
+
+
+def test_time_records_duration_even_on_error():
+    registry = MetricsRegistry()
+    latency = registry.histogram("stage_seconds", "阶段耗时")
+
+    try:
+        with latency.time(stage="decode"):
+            raise ValueError("bad audio")
+    except ValueError:
+        pass
+
+    assert latency.labels(stage="decode").snapshot()["count"] == 1
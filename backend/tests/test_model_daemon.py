@@ -0,0 +1,100 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import asr.model_manager as model_manager
+from asr.daemon_client import (
+    ModelDaemonClient,
+    ModelDaemonError,
+    ping_daemon,
+    request_daemon,
+)
+from asr.model_daemon import ModelDaemon
+
+
+class FakeModel:
+    """generate 返回音频长度，流式推理返回会话缓存中累计的步数"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def generate(self, input, **kwargs):
+        return [{"text": f"{self.name}:{len(input)}"}]
+
+    def inference(self, input, cache=None, **kwargs):
+        cache["steps"] = cache.get("steps", 0) + 1
+        return [{"text": str(cache["steps"])}]
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        model_manager,
+        "create_model",
+        lambda model_params, **kwargs: FakeModel(model_params["model"]),
+    )
+    monkeypatch.setattr(model_manager, "warmup_model", lambda *args, **kwargs: None)
+    socket_path = str(tmp_path / "models.sock")
+    daemon = ModelDaemon(socket_path)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while ping_daemon(socket_path) is None:
+        assert time.monotonic() < deadline, "守护进程没有启动"
+        time.sleep(0.02)
+    yield socket_path
+    daemon.shutdown()
+    thread.join(5)
+
+
+def params(name):
+    return {"model": name, "device": "cpu"}
+
+
+def test_client_loads_and_runs_models_in_daemon(daemon):
+    client = ModelDaemonClient(daemon, params("a"))
+    client.start()
+
+    assert client.generate(np.zeros(3, dtype=np.float32)) == [{"text": "a:3"}]
+    assert client.stream_step("s1", np.zeros(1))[0]["text"] == "1"
+    assert client.stream_step("s1", np.zeros(1))[0]["text"] == "2"
+    # 最后一步之后会话缓存被清理
+    assert client.stream_step("s1", np.zeros(1), is_final=True)[0]["text"] == "3"
+    assert client.stream_step("s1", np.zeros(1))[0]["text"] == "1"
+
+    health = client.health()
+    assert health["requests"] == 5
+    assert [model["model"] for model in health["models"]["models"]] == ["a"]
+    client.stop()
+
+
+def test_model_stays_resident_across_clients(daemon):
+    first = ModelDaemonClient(daemon, params("a"))
+    first.start()
+    first.stop()
+
+    second = ModelDaemonClient(daemon, params("a"))
+    second.start()
+
+    assert request_daemon(daemon, {"type": "load", "model_params": params("a")})[
+        "resident"
+    ]
+    second.stop()
+
+
+def test_errors_are_returned_to_the_client(daemon):
+    with pytest.raises(ModelDaemonError):
+        request_daemon(daemon, {"type": "unknown"})
+
+    assert ping_daemon(daemon)["errors"] == 1
+
+
+def test_shutdown_request_stops_the_daemon(daemon):
+    request_daemon(daemon, {"type": "shutdown"})
+
+    deadline = time.monotonic() + 5
+    while ping_daemon(daemon) is not None:
+        assert time.monotonic() < deadline, "守护进程没有退出"
+        time.sleep(0.02)
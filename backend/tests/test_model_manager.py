@@ -0,0 +1,215 @@
+import threading
+import time
+
+import pytest
+
+import asr.model_manager as model_manager
+from asr.model_manager import ModelManager, ModelNotLoadedError
+
+MODEL_BYTES = 100
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+
+@pytest.fixture
+def fake_loader(monkeypatch):
+    """每加载一个模型进程内存增加 MODEL_BYTES，记录创建的模型"""
+    state = {"rss": 1000, "created": [], "warmup_error": None}
+
+    def create_model(model_params, quantize=True):
+        time.sleep(0.01)
+        state["rss"] += MODEL_BYTES
+        state["created"].append(model_params["model"])
+        return FakeModel(model_params["model"])
+
+    def warmup_model(model, model_params, seconds=None):
+        if state["warmup_error"]:
+            raise RuntimeError(state["warmup_error"])
+
+    monkeypatch.setattr(model_manager, "create_model", create_model)
+    monkeypatch.setattr(model_manager, "warmup_model", warmup_model)
+    monkeypatch.setattr(model_manager, "process_rss_bytes", lambda: state["rss"])
+    return state
+
+
+def params(name):
+    return {"model": name, "device": "cpu"}
+
+
+def test_use_without_model_raises():
+    manager = ModelManager()
+
+    with pytest.raises(ModelNotLoadedError):
+        with manager.use():
+            pass
+
+
+def test_swap_without_budget_releases_old_model():
+    manager = ModelManager()
+    first = FakeModel("a")
+    manager._swap(first, params("a"))
+    with manager.use() as entry:
+        old_entry = entry
+
+    manager._swap(FakeModel("b"), params("b"))
+
+    assert manager.model.name == "b"
+    assert manager.resident_count() == 1
+    assert old_entry.retired and old_entry.model is None
+    assert not manager._promote(params("a"))
+
+
+def test_swap_keeps_old_model_in_use_until_request_finishes():
+    manager = ModelManager()
+    manager._swap(FakeModel("a"), params("a"))
+
+    with manager.use() as entry:
+        manager._swap(FakeModel("b"), params("b"))
+        assert entry.retired
+        assert entry.model.name == "a"
+
+    assert entry.model is None
+    with manager.use() as entry:
+        assert entry.model.name == "b"
+
+
+def test_swap_with_budget_keeps_old_model_resident():
+    manager = ModelManager(memory_budget_bytes=10 * MODEL_BYTES)
+    manager._swap(FakeModel("a"), params("a"), memory_bytes=MODEL_BYTES)
+    generation = manager._current.generation
+    manager._swap(FakeModel("b"), params("b"), memory_bytes=MODEL_BYTES)
+
+    assert manager.resident_count() == 2
+    assert manager._promote(params("a"))
+    assert manager.model.name == "a"
+    assert manager._current.generation > generation
+
+
+@pytest.mark.parametrize("budget", [0, 10 * MODEL_BYTES])
+def test_reloading_same_params_releases_previous_instance(budget):
+    manager = ModelManager(memory_budget_bytes=budget)
+    manager._swap(FakeModel("a"), params("a"))
+    old = manager._current
+
+    manager._swap(FakeModel("a"), params("a"))
+
+    assert manager.resident_count() == 1
+    assert manager.is_resident(params("a"))
+    assert old.retired and old.model is None
+
+
+def test_ensure_loaded_loads_once_and_counts_hits(fake_loader):
+    manager = ModelManager()
+
+    entry = manager.ensure_loaded(params("a"))
+    assert manager.ensure_loaded(params("a")) is entry
+    manager.ensure_loaded(params("a"), count_hit=False)
+
+    status = manager.get_resident_status()
+    assert (status["hits"], status["misses"], status["loads"]) == (1, 1, 1)
+    assert entry.memory_bytes == MODEL_BYTES
+    assert fake_loader["created"] == ["a"]
+
+
+def test_concurrent_requests_share_one_load(fake_loader):
+    manager = ModelManager()
+    entries = []
+    threads = [
+        threading.Thread(
+            target=lambda: entries.append(manager.ensure_loaded(params("a")))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert fake_loader["created"] == ["a"]
+    assert len(entries) == 4 and all(entry is entries[0] for entry in entries)
+
+
+def test_least_recently_used_model_is_evicted_over_budget(fake_loader):
+    manager = ModelManager(memory_budget_bytes=int(2.5 * MODEL_BYTES))
+    first = manager.ensure_loaded(params("a"))
+    second = manager.ensure_loaded(params("b"))
+    manager.ensure_loaded(params("a"))
+
+    manager.ensure_loaded(params("c"))
+
+    assert not manager.is_resident(params("b"))
+    assert manager.is_resident(params("a")) and manager.is_resident(params("c"))
+    assert second.retired and second.model is None
+    assert not first.retired
+    assert manager.get_resident_status()["evictions"] == 1
+
+
+def test_current_model_is_not_evicted(fake_loader):
+    manager = ModelManager(memory_budget_bytes=int(1.5 * MODEL_BYTES))
+    manager._swap(FakeModel("a"), params("a"), memory_bytes=MODEL_BYTES)
+
+    manager.ensure_loaded(params("b"))
+    manager.ensure_loaded(params("c"))
+
+    assert manager.is_resident(params("a"))
+    assert not manager.is_resident(params("b"))
+    assert manager.is_resident(params("c"))
+
+
+def test_evicted_model_in_use_is_released_after_request(fake_loader):
+    manager = ModelManager(memory_budget_bytes=int(1.5 * MODEL_BYTES))
+
+    with manager.use(params("a")) as entry:
+        manager.ensure_loaded(params("b"))
+        assert entry.retired
+        assert entry.model is not None
+
+    assert entry.model is None
+
+
+def test_failed_warmup_is_cleared_by_a_successful_request(fake_loader):
+    manager = ModelManager()
+    fake_loader["warmup_error"] = "no audio device"
+    entry = manager.ensure_loaded(params("a"))
+    assert not entry.warmed_up
+
+    with manager.use(params("a"), count_hit=False):
+        pass
+
+    assert entry.warmed_up
+
+
+def test_unload_releases_all_models(fake_loader):
+    manager = ModelManager(memory_budget_bytes=10 * MODEL_BYTES)
+    manager._swap(FakeModel("a"), params("a"))
+    resident = manager.ensure_loaded(params("b"))
+
+    manager.unload()
+
+    assert not manager.is_loaded()
+    assert manager.resident_count() == 0
+    assert resident.model is None
+
+
+def test_resident_count_is_capped_without_budget(fake_loader):
+    manager = ModelManager(max_resident_models=2)
+    manager._swap(FakeModel("a"), params("a"))
+
+    first = manager.ensure_loaded(params("b"))
+    manager.ensure_loaded(params("c"))
+
+    assert manager.resident_count() == 2
+    assert manager.is_resident(params("a")) and manager.is_resident(params("c"))
+    assert first.retired and first.model is None
+
+
+def test_unlimited_resident_models(fake_loader):
+    manager = ModelManager(max_resident_models=0)
+    for name in "abcde":
+        manager.ensure_loaded(params(name))
+
+    assert manager.resident_count() == 5
+    assert manager.get_resident_status()["evictions"] == 0
@@ -0,0 +1,98 @@
+import numpy as np
+
+from asr.realtime_session import RealtimeSession, SessionRegistry
+from asr.streaming import SAMPLE_RATE
+
+
+def test_text_joins_chunks_in_index_order():
+    session = RealtimeSession(1)
+    session.add_chunk(2, "世界")
+    session.add_chunk(None, "")
+    session.add_chunk(0, "你")
+    session.add_chunk(1, "好")
+
+    assert session.text == "你好世界"
+
+    session.final_text = "你好，世界。"
+    assert session.text == "你好，世界。"
+
+
+def test_audio_is_not_kept_without_a_limit():
+    session = RealtimeSession(1)
+    session.add_audio(np.zeros(100, dtype=np.float32))
+
+    assert session.audio_parts is None
+
+
+def test_audio_over_limit_is_released():
+    session = RealtimeSession(1, max_audio_seconds=1)
+    session.add_audio(np.zeros(SAMPLE_RATE // 2, dtype=np.float32))
+    assert len(session.audio_parts) == 1
+
+    session.add_audio(np.zeros(SAMPLE_RATE, dtype=np.float32))
+
+    assert session.audio_parts is None
+
+
+def test_audio_strips_repeated_header():
+    session = RealtimeSession(1, max_audio_seconds=10)
+    rng = np.random.RandomState(0)
+    header = rng.randn(1600).astype(np.float32)
+    bodies = [rng.randn(4000).astype(np.float32) for _ in range(2)]
+
+    for body in bodies:
+        session.add_audio(np.concatenate([header, body]), strip_header=True)
+
+    assert np.array_equal(session.audio_parts[1], bodies[1])
+
+
+def test_registry_evicts_idle_sessions():
+    evicted = []
+    registry = SessionRegistry(max_idle_seconds=10, on_evict=evicted.append)
+    idle = registry.open(1)
+    registry.open(2)
+    idle.last_active -= 60
+
+    assert registry.evict_idle() == 1
+    assert evicted == [idle]
+    assert registry.get(1) is None
+    assert registry.count() == 1
+
+
+def test_registry_open_evicts_idle_sessions():
+    evicted = []
+    registry = SessionRegistry(max_idle_seconds=10, on_evict=evicted.append)
+    registry.open(1).last_active -= 60
+
+    registry.open(2, auto_insert=True)
+
+    assert [session.record_id for session in evicted] == [1]
+    assert registry.get(2).auto_insert
+
+
+def test_registry_eviction_errors_do_not_stop_other_sessions():
+    evicted = []
+
+    def on_evict(session):
+        if session.record_id == 1:
+            raise RuntimeError("database is locked")
+        evicted.append(session.record_id)
+
+    registry = SessionRegistry(on_evict=on_evict)
+    registry.open(1)
+    registry.open(2)
+
+    registry.close_all()
+
+    assert evicted == [2]
+    assert registry.count() == 0
+
+
+def test_registry_pop_does_not_evict():
+    evicted = []
+    registry = SessionRegistry(on_evict=evicted.append)
+    session = registry.open(1)
+
+    assert registry.pop(1) is session
+    assert registry.pop(1) is None
+    assert evicted == []
@@ -0,0 +1,111 @@
+import numpy as np
+
+from asr.result_cache import ENTRY_OVERHEAD, ResultCache, make_cache_key
+from db.db_manager import DBManager
+
+MODEL_PARAMS = {
+    "model": "paraformer-zh",
+    "vad_model": "fsmn-vad",
+    "punc_model": "ct-punc",
+    "device": "cpu",
+}
+
+
+def entry_size(key, text):
+    cache = ResultCache()
+    cache.put(key, {"text": text})
+    return cache.get_stats()["size_bytes"]
+
+
+def test_cache_key_depends_on_audio_model_and_kwargs():
+    samples = np.zeros(1600, dtype=np.float32)
+    key = make_cache_key(samples, MODEL_PARAMS, {"language": "zh"})
+
+    assert key == make_cache_key(samples.copy(), dict(MODEL_PARAMS), {"language": "zh"})
+    assert key != make_cache_key(samples + 0.1, MODEL_PARAMS, {"language": "zh"})
+    assert key != make_cache_key(samples, MODEL_PARAMS, {"language": "en"})
+    assert key != make_cache_key(
+        samples, dict(MODEL_PARAMS, hotwords="魔搭"), {"language": "zh"}
+    )
+    assert key != make_cache_key(
+        samples, dict(MODEL_PARAMS, backend="torch-int8"), {"language": "zh"}
+    )
+
+
+def test_cache_key_ignores_streaming_cache_argument():
+    samples = np.zeros(1600, dtype=np.float32)
+
+    assert make_cache_key(samples, MODEL_PARAMS, {"cache": {}}) == make_cache_key(
+        samples, MODEL_PARAMS, {}
+    )
+
+
+def test_get_returns_copy_and_counts_hits():
+    cache = ResultCache()
+    cache.put("a", {"text": "你好"})
+
+    result = cache.get("a")
+    result["text"] = "changed"
+
+    assert cache.get("a") == {"text": "你好"}
+    assert cache.get("missing") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == round(2 / 3, 4)
+
+
+def test_evicts_least_recently_used_entries():
+    size = entry_size("a", "x")
+    assert size == len('{"text": "x"}') + 1 + ENTRY_OVERHEAD
+    cache = ResultCache(max_bytes=size * 2)
+    cache.put("a", {"text": "x"})
+    cache.put("b", {"text": "y"})
+    cache.get("a")
+
+    cache.put("c", {"text": "z"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"text": "x"}
+    assert cache.get("c") == {"text": "z"}
+    assert cache.get_stats()["size_bytes"] == size * 2
+
+
+def test_replacing_a_key_does_not_grow_size():
+    cache = ResultCache()
+    cache.put("a", {"text": "x"})
+    cache.put("a", {"text": "y"})
+
+    assert cache.get_stats()["entries"] == 1
+    assert cache.get_stats()["size_bytes"] == entry_size("a", "y")
+
+
+def test_skips_oversized_and_unserializable_results():
+    cache = ResultCache(max_bytes=ENTRY_OVERHEAD + 10)
+    cache.put("a", {"text": "x" * 100})
+    cache.put("b", {"text": object()})
+
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_results_persist_in_sqlite_store(tmp_path):
+    store = DBManager(db_path=str(tmp_path))
+    cache = ResultCache(store=store)
+    cache.put("a", {"text": "持久化", "timestamp": [[0, 100]]})
+
+    restarted = ResultCache(store=DBManager(db_path=str(tmp_path)))
+
+    assert restarted.get("a") == {"text": "持久化", "timestamp": [[0, 100]]}
+    # 从存储读出后留在内存中，再次命中不再访问存储
+    assert restarted.get("a") == {"text": "持久化", "timestamp": [[0, 100]]}
+    stats = restarted.get_stats()
+    assert (stats["hits"], stats["store_hits"], stats["entries"]) == (2, 1, 1)
+    assert stats["persistent"]
+
+
+def test_store_keeps_most_recently_used_entries(tmp_path):
+    store = DBManager(db_path=str(tmp_path))
+    for index in range(4):
+        store.save_cached_result(f"k{index}", f'{{"text": "{index}"}}', max_entries=3)
+
+    assert store.get_cached_result("k0") is None
+    assert store.get_cached_result("k3") == '{"text": "3"}'
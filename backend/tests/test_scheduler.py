@@ -0,0 +1,185 @@
+import threading
+import time
+
+import pytest
+
+from asr.scheduler import InferenceScheduler
+
+
+class RecordingBatch:
+    """记录每次批量推理的输入，fail 中的音频会让整批失败"""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, audios, kwargs):
+        with self.lock:
+            self.batches.append((list(audios), dict(kwargs)))
+        if self.fail.intersection(audios):
+            raise ValueError("bad audio")
+        return [{"text": f"{audio}-{kwargs.get('language', '')}"} for audio in audios]
+
+
+def submit_all(scheduler, requests):
+    """并发提交 (音频, 参数) 列表，返回结果或异常"""
+    results = [None] * len(requests)
+
+    def target(index, audio, kwargs):
+        try:
+            results[index] = scheduler.submit(audio, timeout=5, **kwargs)
+        except Exception as e:
+            results[index] = e
+
+    threads = [
+        threading.Thread(target=target, args=(index, audio, kwargs))
+        for index, (audio, kwargs) in enumerate(requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(run_batch, **kwargs):
+        scheduler = InferenceScheduler(run_batch, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def test_concurrent_requests_are_batched(make_scheduler):
+    run_batch = RecordingBatch()
+    scheduler = make_scheduler(run_batch, max_batch_size=8, max_wait_ms=200)
+
+    results = submit_all(scheduler, [(name, {}) for name in "abcd"])
+
+    assert [result["text"] for result in results] == ["a-", "b-", "c-", "d-"]
+    assert len(run_batch.batches) == 1
+    assert sorted(run_batch.batches[0][0]) == ["a", "b", "c", "d"]
+    stats = scheduler.get_stats()
+    assert (stats["total_requests"], stats["total_batches"]) == (4, 1)
+
+
+def test_batch_size_is_capped(make_scheduler):
+    run_batch = RecordingBatch()
+    scheduler = make_scheduler(run_batch, max_batch_size=2, max_wait_ms=200)
+
+    submit_all(scheduler, [(name, {}) for name in "abcde"])
+
+    assert all(len(audios) <= 2 for audios, kwargs in run_batch.batches)
+    assert sum(len(audios) for audios, kwargs in run_batch.batches) == 5
+
+
+def test_requests_with_different_kwargs_are_not_mixed(make_scheduler):
+    run_batch = RecordingBatch()
+    scheduler = make_scheduler(run_batch, max_wait_ms=200)
+
+    results = submit_all(
+        scheduler, [("a", {"language": "zh"}), ("b", {"language": "en"})]
+    )
+
+    assert [result["text"] for result in results] == ["a-zh", "b-en"]
+    assert sorted(kwargs["language"] for audios, kwargs in run_batch.batches) == [
+        "en",
+        "zh",
+    ]
+
+
+def test_failed_batch_is_retried_item_by_item(make_scheduler):
+    run_batch = RecordingBatch(fail={"bad"})
+    scheduler = make_scheduler(run_batch, max_wait_ms=200)
+
+    results = submit_all(scheduler, [("a", {}), ("bad", {}), ("c", {})])
+
+    assert results[0]["text"] == "a-"
+    assert isinstance(results[1], ValueError)
+    assert results[2]["text"] == "c-"
+    assert scheduler.get_stats()["total_errors"] == 1
+
+
+def test_run_exclusive_returns_result_and_raises_errors(make_scheduler):
+    scheduler = make_scheduler(RecordingBatch())
+
+    assert scheduler.run_exclusive(lambda: 42, timeout=5) == 42
+
+    def fail():
+        raise KeyError("cache")
+
+    with pytest.raises(KeyError):
+        scheduler.run_exclusive(fail, timeout=5)
+
+
+def test_stop_fails_pending_requests():
+    started = threading.Event()
+    release = threading.Event()
+
+    def run_batch(audios, kwargs):
+        started.set()
+        release.wait(5)
+        return [{} for _ in audios]
+
+    scheduler = InferenceScheduler(run_batch, max_wait_ms=0)
+    results = {}
+    first = threading.Thread(target=lambda: scheduler.submit("a", timeout=5))
+    first.start()
+    started.wait(5)
+
+    def target():
+        try:
+            scheduler.submit("b", timeout=5)
+        except RuntimeError as e:
+            results["b"] = e
+
+    second = threading.Thread(target=target)
+    second.start()
+    while scheduler.queue_depth() == 0:
+        started.wait(0.01)
+    scheduler.stop()
+    release.set()
+    first.join()
+    second.join()
+
+    assert isinstance(results["b"], RuntimeError)
+
+
+def test_set_num_workers_grows_and_shrinks_threads():
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0}
+
+    def run_batch(audios, kwargs):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.2)
+        with lock:
+            state["active"] -= 1
+        return [{} for _ in audios]
+
+    def peak_concurrency(count):
+        state["peak"] = 0
+        submit_all(scheduler, [(str(i), {"i": i}) for i in range(count)])
+        return state["peak"]
+
+    scheduler = InferenceScheduler(run_batch, max_wait_ms=0, num_workers=4)
+    try:
+        assert peak_concurrency(4) == 4
+
+        scheduler.set_num_workers(1)
+        assert peak_concurrency(3) == 1
+        # 移出的线程执行完手头的批次后退出
+        assert len(scheduler._threads) == 1
+
+        scheduler.set_num_workers(3)
+        assert peak_concurrency(3) == 3
+    finally:
+        scheduler.stop()
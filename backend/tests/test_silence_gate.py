@@ -0,0 +1,69 @@
+import numpy as np
+
+from asr.silence_gate import SilenceGate, frame_features
+from asr.streaming import SAMPLE_RATE
+
+
+def tone(seconds, amplitude=0.3, frequency=220):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def test_frame_features():
+    energy_db, zcr = frame_features(np.full(960, 0.1, dtype=np.float32), 480)
+
+    np.testing.assert_allclose(energy_db, [-20.0, -20.0], atol=1e-3)
+    np.testing.assert_array_equal(zcr, [0.0, 0.0])
+    assert len(frame_features(np.zeros(100, dtype=np.float32), 480)[0]) == 0
+
+
+def test_silence_and_speech():
+    gate = SilenceGate()
+
+    assert not gate.is_speech(np.zeros(SAMPLE_RATE, dtype=np.float32))
+    assert not gate.is_speech(tone(1.0, amplitude=0.001))
+    assert gate.is_speech(tone(1.0))
+    assert not gate.is_speech(None)
+
+
+def test_short_burst_is_not_speech():
+    audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    # 只有两帧（60ms）有声音，不足默认的 90ms
+    audio[:960] = tone(0.06)
+
+    assert not SilenceGate().is_speech(audio)
+
+
+def test_noisy_frames_need_more_energy():
+    rng = np.random.default_rng(0)
+    noise = rng.uniform(-1, 1, SAMPLE_RATE).astype(np.float32)
+    gate = SilenceGate(threshold_db=-45.0)
+
+    # 约 -40dBFS 的宽带噪声高于门限，但过零率高，需要再高 10dB
+    assert not gate.is_speech(noise * 0.017)
+    assert gate.is_speech(noise * 0.3)
+
+
+def test_session_stats_count_skipped_chunks():
+    gate = SilenceGate()
+
+    assert gate.check(1, tone(0.5), strip_header=False)
+    assert not gate.check(1, np.zeros(8000, dtype=np.float32), strip_header=False)
+    assert not gate.check(None, np.zeros(8000, dtype=np.float32))
+
+    assert gate.get_session_stats(1) == {"chunks": 2, "skipped": 1}
+    assert gate.get_stats()["total_chunks"] == 3
+    assert gate.get_stats()["total_skipped"] == 2
+    assert gate.pop_session(1) == {"chunks": 2, "skipped": 1}
+    assert gate.get_session_stats(1) == {"chunks": 0, "skipped": 0}
+
+
+def test_check_treats_errors_as_speech(monkeypatch):
+    gate = SilenceGate()
+
+    def fail(samples):
+        raise ValueError("bad samples")
+
+    monkeypatch.setattr(gate, "is_speech", fail)
+
+    assert gate.check(1, np.zeros(8000, dtype=np.float32))
@@ -0,0 +1,98 @@
+import numpy as np
+
+from asr.stitching import ChunkStitcher, join_tokens, split_tokens
+from asr.streaming import SAMPLE_RATE
+
+
+def seconds(value):
+    return np.zeros(int(value * SAMPLE_RATE), dtype=np.float32)
+
+
+def test_split_tokens_attaches_punctuation_to_previous_token():
+    assert split_tokens("今天，hello world's 2024!") == [
+        "今",
+        "天，",
+        "hello",
+        "world's",
+        "2024!",
+    ]
+    assert split_tokens("") == []
+
+
+def test_join_tokens_spaces_ascii_words_only():
+    assert join_tokens(["hello", "world"]) == "hello world"
+    assert join_tokens(["world"], previous="hello,") == " world"
+    assert join_tokens(["你", "好"], previous="hello") == "你好"
+
+
+def test_overlap_words_are_emitted_once():
+    stitcher = ChunkStitcher("s", overlap_seconds=0.8, strip_header=False)
+
+    # 第一个分片 2 秒，分界线在 1.6 秒（重叠区的中点）
+    audio = stitcher.prepare(seconds(2))
+    assert len(audio) == len(seconds(2))
+    first = stitcher.merge(
+        "今天天气很",
+        [[0, 400], [400, 800], [800, 1200], [1500, 1650], [1700, 1900]],
+    )
+    assert first == "今天天气"
+
+    # 第二个分片前面拼接 0.8 秒重叠音频，0.4 秒之前的词属于上一个分片
+    audio = stitcher.prepare(seconds(2))
+    assert len(audio) == len(seconds(2.8))
+    second = stitcher.merge(
+        "气很好啊", [[300, 450], [500, 700], [900, 1100], [2500, 2700]]
+    )
+    assert second == "很好"
+
+    assert stitcher.finish() == "啊"
+    assert stitcher.finish() == ""
+
+
+def test_boundary_duplicate_is_dropped():
+    stitcher = ChunkStitcher("s", overlap_seconds=0.8, strip_header=False)
+    stitcher.prepare(seconds(2))
+    assert stitcher.merge("你好", [[0, 400], [1400, 1580]]) == "你好"
+
+    stitcher.prepare(seconds(2))
+    # “好”的中点距分界线 20 毫秒，是上一个分片最后一个词的重复
+    assert stitcher.merge("好吗", [[380, 460], [600, 800]]) == "吗"
+
+
+def test_english_words_are_joined_across_chunks():
+    stitcher = ChunkStitcher("s", overlap_seconds=0.8, strip_header=False)
+    stitcher.prepare(seconds(2))
+    assert stitcher.merge("hello", [[0, 400]]) == "hello"
+
+    stitcher.prepare(seconds(2))
+    assert stitcher.merge("world", [[900, 1200]]) == " world"
+
+
+def test_token_count_mismatch_spreads_timestamps_evenly():
+    stitcher = ChunkStitcher("s", overlap_seconds=0.8, strip_header=False)
+    stitcher.prepare(seconds(2))
+
+    # 四个词只有两个时间戳，在 0~2000 毫秒内均匀估计，最后一个词落在分界线之后
+    assert stitcher.merge("一二三四", [[0, 100], [1900, 2000]]) == "一二三"
+    assert stitcher.finish() == "四"
+
+
+def test_without_timestamps_falls_back_to_concatenation():
+    stitcher = ChunkStitcher("s", overlap_seconds=0.8, strip_header=False)
+    stitcher.prepare(seconds(2))
+
+    assert stitcher.merge("第一段", None) == "第一段"
+    assert stitcher.enabled is False
+    # 关闭拼接后不再拼接重叠音频
+    assert len(stitcher.prepare(seconds(2))) == len(seconds(2))
+    assert stitcher.merge("第二段", None) == "第二段"
+
+
+def test_prime_supplies_overlap_after_resume():
+    stitcher = ChunkStitcher("s", overlap_seconds=0.5, strip_header=False)
+    stitcher.prime(np.ones(SAMPLE_RATE, dtype=np.float32))
+
+    audio = stitcher.prepare(seconds(1))
+
+    assert len(audio) == len(seconds(1.5))
+    assert np.all(audio[: len(seconds(0.5))] == 1)
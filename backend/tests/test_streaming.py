@@ -0,0 +1,111 @@
+import numpy as np
+
+from asr.streaming import (
+    FINAL_PADDING_SAMPLES,
+    MAX_HEADER_SAMPLES,
+    RepeatedHeaderDetector,
+    StreamingSession,
+    StreamingSessionManager,
+)
+
+
+def random_samples(length, seed):
+    return np.random.RandomState(seed).randn(length).astype(np.float32)
+
+
+class FakeStreamingModel:
+    """记录每次 inference 调用的音频长度和参数"""
+
+    def __init__(self):
+        self.calls = []
+
+    def inference(self, input, cache, **kwargs):
+        cache["steps"] = cache.get("steps", 0) + 1
+        self.calls.append((len(input), kwargs["is_final"]))
+        return [{"text": f"t{cache['steps']}"}]
+
+
+def test_header_detector_keeps_first_chunk():
+    detector = RepeatedHeaderDetector()
+    first = random_samples(8000, 0)
+    assert np.array_equal(detector.strip(first), first)
+
+
+def test_header_detector_strips_common_prefix_from_later_chunks():
+    detector = RepeatedHeaderDetector()
+    header = random_samples(3200, 0)
+    detector.strip(np.concatenate([header, random_samples(8000, 1)]))
+
+    body = random_samples(6000, 2)
+    assert np.array_equal(detector.strip(np.concatenate([header, body])), body)
+    # 之后的分片按同一个长度去掉
+    body = random_samples(5000, 3)
+    assert np.array_equal(detector.strip(np.concatenate([header, body])), body)
+
+
+def test_header_detector_caps_header_length():
+    detector = RepeatedHeaderDetector()
+    # 开头是很长的一段相同静音，重复部分最多按 MAX_HEADER_SAMPLES 计算
+    silence = np.zeros(MAX_HEADER_SAMPLES * 2, dtype=np.float32)
+    detector.strip(silence)
+    second = np.concatenate([silence, random_samples(1000, 1)])
+    assert len(detector.strip(second)) == len(second) - MAX_HEADER_SAMPLES
+
+
+def test_session_feeds_whole_blocks_and_keeps_remainder():
+    session = StreamingSession("s")
+    model = FakeStreamingModel()
+
+    partials = session.feed(model, np.zeros(session.chunk_stride * 2 + 100))
+
+    assert partials == ["t1", "t2"]
+    assert model.calls == [(session.chunk_stride, False)] * 2
+    assert session.text == "t1t2"
+    assert not session.is_finished
+
+
+def test_session_final_flushes_remainder():
+    session = StreamingSession("s")
+    model = FakeStreamingModel()
+    session.feed(model, np.zeros(session.chunk_stride + 100))
+
+    partials = session.feed(model, None, is_final=True)
+
+    assert partials == ["t2"]
+    assert model.calls[-1] == (100, True)
+    assert session.is_finished
+
+
+def test_session_final_pads_when_nothing_is_pending():
+    session = StreamingSession("s")
+    model = FakeStreamingModel()
+    session.feed(model, np.zeros(session.chunk_stride))
+
+    session.feed(model, None, is_final=True)
+
+    assert model.calls[-1] == (FINAL_PADDING_SAMPLES, True)
+
+
+def test_session_cache_survives_between_feeds_until_reset():
+    session = StreamingSession("s")
+    model = FakeStreamingModel()
+    session.feed(model, np.zeros(session.chunk_stride))
+    session.feed(model, np.zeros(session.chunk_stride))
+    assert session.cache["steps"] == 2
+
+    session.reset_cache(model_generation=3)
+
+    assert session.cache == {}
+    assert session.model_generation == 3
+    assert session.text == "t1t2"
+
+
+def test_session_manager_evicts_idle_sessions():
+    manager = StreamingSessionManager(max_idle_seconds=10)
+    idle = manager.get_or_create("idle")
+    idle.last_active -= 60
+
+    manager.get_or_create("active")
+
+    assert manager.get("idle") is None
+    assert manager.count() == 1
@@ -0,0 +1,81 @@
+import threading
+
+import numpy as np
+
+from asr.two_pass import (
+    FINAL_DONE,
+    FINAL_FAILED,
+    FINAL_PENDING,
+    FINAL_RUNNING,
+    FinalPassRunner,
+)
+
+
+def test_recognizes_concatenated_audio_and_stores_result():
+    saved = []
+    runner = FinalPassRunner(
+        lambda samples: f"{len(samples)}", lambda *args: saved.append(args)
+    )
+    parts = [np.zeros(100, dtype=np.float32), np.zeros(50, dtype=np.float32)]
+
+    runner.submit(1, parts, first_pass_text="first")
+    status = runner.wait(1, timeout=5)
+
+    assert status["status"] == FINAL_DONE
+    assert status["text"] == "150"
+    assert status["first_pass_text"] == "first"
+    assert saved == [(1, "150")]
+    runner.shutdown()
+
+
+def test_empty_audio_skips_recognition():
+    calls = []
+    runner = FinalPassRunner(calls.append, lambda *args: None)
+
+    runner.submit(1, [])
+
+    assert runner.wait(1, timeout=5)["text"] == ""
+    assert calls == []
+    runner.shutdown()
+
+
+def test_recognition_error_is_reported():
+    def fail(samples):
+        raise RuntimeError("out of memory")
+
+    saved = []
+    runner = FinalPassRunner(fail, lambda *args: saved.append(args))
+
+    runner.submit(1, [np.zeros(10, dtype=np.float32)])
+    status = runner.wait(1, timeout=5)
+
+    assert status["status"] == FINAL_FAILED
+    assert status["error"] == "out of memory"
+    assert saved == []
+    runner.shutdown()
+
+
+def test_wait_times_out_while_running():
+    release = threading.Event()
+    runner = FinalPassRunner(
+        lambda samples: "done" if release.wait(5) else "", lambda *args: None
+    )
+
+    runner.submit(1, [np.zeros(10, dtype=np.float32)])
+
+    assert runner.wait(1, timeout=0.1)["status"] in (FINAL_PENDING, FINAL_RUNNING)
+    release.set()
+    assert runner.wait(1, timeout=5)["text"] == "done"
+    runner.shutdown()
+
+
+def test_keeps_only_recent_statuses():
+    runner = FinalPassRunner(lambda samples: "", lambda *args: None, max_results=2)
+    for record_id in (1, 2, 3):
+        runner.submit(record_id, [])
+        runner.wait(record_id, timeout=5)
+
+    assert runner.get_status(1) is None
+    assert runner.wait(1, timeout=5) is None
+    assert runner.get_status(3)["status"] == FINAL_DONE
+    runner.shutdown()
@@ -0,0 +1,31 @@
+import numpy as np
+
+from asr.worker_pool import _read_shared_samples, _write_shared_samples
+
+
+def test_shared_memory_round_trip():
+    arrays = [np.arange(5, dtype=np.float32), np.zeros(0), np.array([0.5, -0.5])]
+
+    shm, lengths = _write_shared_samples(arrays)
+    try:
+        restored = _read_shared_samples(shm.name, lengths)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    assert lengths == [5, 0, 2]
+    for original, copy in zip(arrays, restored):
+        np.testing.assert_array_equal(copy, original)
+        assert copy.dtype == np.float32
+
+
+def test_restored_samples_do_not_reference_shared_memory():
+    shm, lengths = _write_shared_samples([np.ones(4, dtype=np.float32)])
+    try:
+        (restored,) = _read_shared_samples(shm.name, lengths)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # 共享内存释放后采样仍然可用
+    assert restored.sum() == 4
@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.ws_server import StreamSocketServer, is_available, pcm16_to_float
+
+pytestmark = pytest.mark.skipif(not is_available(), reason="需要 websockets")
+
+
+def test_pcm16_to_float():
+    data = np.array([0, 16384, -32768], dtype="<i2").tobytes()
+
+    np.testing.assert_allclose(pcm16_to_float(data), [0.0, 0.5, -1.0])
+
+
+class FakeSessions:
+    """记录每个分片的采样数，识别结果是分片序号"""
+
+    def __init__(self):
+        self.fed = []
+        self.closed = []
+
+    def open(self, request):
+        return {"record_id": 7, "chunk_index": 0}
+
+    def feed(self, state, samples, is_final):
+        self.fed.append((None if samples is None else len(samples), is_final))
+        if samples is None:
+            return []
+        text = f"c{state['chunk_index']}"
+        state["chunk_index"] += 1
+        return [text]
+
+    def close(self, state):
+        self.closed.append(state["record_id"])
+        return "full"
+
+
+@pytest.fixture
+def server():
+    from websockets.sync.client import connect
+
+    sessions = FakeSessions()
+    server = StreamSocketServer(
+        "127.0.0.1",
+        0,
+        sessions.open,
+        sessions.feed,
+        sessions.close,
+        chunk_samples=lambda: 4,
+    )
+    server.start()
+    port = server._server.socket.getsockname()[1]
+    yield sessions, lambda: connect(f"ws://127.0.0.1:{port}")
+    server.stop()
+
+
+def receive(connection):
+    return json.loads(connection.recv(timeout=5))
+
+
+def test_pcm_is_split_into_chunks_and_results_are_pushed(server):
+    sessions, connect = server
+    with connect() as connection:
+        connection.send(json.dumps({"type": "open"}))
+        assert receive(connection) == {
+            "type": "opened",
+            "record_id": 7,
+            "sample_rate": 16000,
+        }
+
+        connection.send(np.zeros(6, dtype="<i2").tobytes())
+        assert receive(connection)["text"] == "c0"
+        connection.send(np.zeros(3, dtype="<i2").tobytes())
+        assert receive(connection)["text"] == "c1"
+        connection.send(json.dumps({"type": "close"}))
+        # 剩余的 1 个采样作为最后一个分片识别
+        assert receive(connection)["text"] == "c2"
+        assert receive(connection) == {"type": "final", "record_id": 7, "text": "full"}
+
+    assert sessions.fed == [(4, False), (4, False), (1, True)]
+    assert sessions.closed == [7]
+
+
+def test_audio_before_open_and_unsupported_sample_rate_are_rejected(server):
+    sessions, connect = server
+    with connect() as connection:
+        connection.send(b"\x00\x00")
+        assert receive(connection)["type"] == "error"
+        connection.send(json.dumps({"type": "open", "sample_rate": 48000}))
+        assert receive(connection)["type"] == "error"
+
+    assert sessions.fed == []
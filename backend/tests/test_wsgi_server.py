@@ -0,0 +1,74 @@
+import threading
+import time
+
+from flask import Flask
+
+from utils.wsgi_server import RequestTracker
+
+
+def make_app(tracker, started, release):
+    app = Flask(__name__)
+    tracker.init_app(app)
+
+    @app.route("/api/slow")
+    def slow():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    @app.route("/api/status")
+    def status():
+        return "ok"
+
+    return app
+
+
+def test_drain_waits_for_inflight_requests_and_rejects_new_ones():
+    tracker = RequestTracker()
+    started = threading.Event()
+    release = threading.Event()
+    app = make_app(tracker, started, release)
+    responses = []
+
+    request_thread = threading.Thread(
+        target=lambda: responses.append(app.test_client().get("/api/slow"))
+    )
+    request_thread.start()
+    started.wait(5)
+    assert tracker.inflight == 1
+
+    drained = []
+    drain_thread = threading.Thread(target=lambda: drained.append(tracker.drain(5)))
+    drain_thread.start()
+    while not tracker.draining:
+        time.sleep(0.01)
+
+    client = app.test_client()
+    assert client.get("/api/slow").status_code == 503
+    # 健康检查在退出期间仍然可用
+    assert client.get("/api/status").status_code == 200
+    assert not drained
+
+    release.set()
+    request_thread.join()
+    drain_thread.join()
+
+    assert drained == [True]
+    assert responses[0].status_code == 200
+    assert tracker.inflight == 0
+
+
+def test_drain_times_out():
+    tracker = RequestTracker()
+    started = threading.Event()
+    release = threading.Event()
+    app = make_app(tracker, started, release)
+
+    request_thread = threading.Thread(target=lambda: app.test_client().get("/api/slow"))
+    request_thread.start()
+    started.wait(5)
+
+    assert not tracker.drain(0.05)
+
+    release.set()
+    request_thread.join()
@@ -0,0 +1,588 @@
+"""
+音频解码模块 - 在内存中把上传的音频解码为 16kHz 单声道 float32 采样
+"""
+
+import io
+import os
+import re
+import sys
+import base64
+import shutil
+import logging
+import time
+import threading
+import subprocess
+import wave
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# FunASR 模型统一使用的采样率
+SAMPLE_RATE = 16000
+
+# 增量解码时，写入片段后输出停止增长多长时间视为本片段解码完成（秒）
+STREAM_SETTLE_SECONDS = 0.05
+# 增量解码时写入第一个片段后最长等待的时间（秒），需要解析容器头
+STREAM_DECODE_TIMEOUT = 2.0
+# 已经开始输出后，写入后续片段最长等待的时间（秒）
+STREAM_FRAGMENT_TIMEOUT = 0.5
+# 乱序到达的片段最多暂存多少个，超过后认为缺失的片段不会再到达
+MAX_HELD_FRAGMENTS = 16
+
+# ffmpeg 输出信息中的媒体时长
+_DURATION_PATTERN = re.compile(rb"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+# PyAV 是可选依赖，安装后可以在进程内解码 webm/opus，不需要启动 ffmpeg 子进程
+try:
+    import av
+except ImportError:
+    av = None
+    logger.info("未安装 PyAV，音频将通过 ffmpeg 管道解码")
+
+
+class AudioDecodeError(Exception):
+    """音频数据无法解码（通常是空分片或不完整的容器数据）"""
+
+
+def find_ffmpeg():
+    """查找 ffmpeg 可执行文件
+
+    优先使用 scripts/setup_ffmpeg.py 安装到虚拟环境 bin 目录中的版本，
+    其次使用系统 PATH 中的 ffmpeg。
+
+    Returns:
+        ffmpeg 路径，找不到时返回 None
+    """
+    name = "ffmpeg.exe" if os.name == "nt" else "ffmpeg"
+    venv_ffmpeg = os.path.join(os.path.dirname(sys.executable), name)
+    if os.path.exists(venv_ffmpeg):
+        return venv_ffmpeg
+    return shutil.which("ffmpeg")
+
+
+def supports_stream_decoding():
+    """是否可以对实时片段增量解码（需要 ffmpeg）"""
+    return find_ffmpeg() is not None
+
+
+def decode_base64_audio(base64_audio):
+    """解码 base64 音频数据（支持 data URL 前缀）
+
+    Args:
+        base64_audio: base64 编码的音频字符串
+
+    Returns:
+        原始音频字节
+    """
+    try:
+        return base64.b64decode(
+            base64_audio.split(",")[1] if "," in base64_audio else base64_audio
+        )
+    except Exception as e:
+        raise AudioDecodeError(f"base64 解码失败: {e}")
+
+
+def decode_audio_bytes(audio_bytes, sample_rate=SAMPLE_RATE):
+    """把任意容器格式的音频字节解码为单声道 float32 采样
+
+    WAV 文件直接在进程内解析；其他格式（MediaRecorder 的 webm/opus 等）
+    优先使用 PyAV 在进程内解码，未安装时通过 ffmpeg 的标准输入输出管道
+    解码，不经过临时文件。
+
+    Args:
+        audio_bytes: 原始音频字节
+        sample_rate: 目标采样率
+
+    Returns:
+        np.ndarray: float32 采样，取值范围 [-1, 1]
+    """
+    if not audio_bytes:
+        raise AudioDecodeError("音频数据为空")
+
+    samples = _decode_wav(audio_bytes, sample_rate)
+    if samples is not None:
+        return samples
+
+    if av is not None:
+        try:
+            return _decode_with_av(audio_bytes, sample_rate)
+        except Exception as e:
+            logger.warning(f"PyAV 解码失败，改用 ffmpeg: {e}")
+
+    return _decode_with_ffmpeg(audio_bytes, sample_rate)
+
+
+def _decode_wav(audio_bytes, sample_rate):
+    """解析 16 位 PCM WAV，采样率不匹配或格式不支持时返回 None"""
+    if audio_bytes[:4] != b"RIFF" or audio_bytes[8:12] != b"WAVE":
+        return None
+
+    try:
+        with wave.open(io.BytesIO(audio_bytes), "rb") as wav_file:
+            if wav_file.getsampwidth() != 2 or wav_file.getframerate() != sample_rate:
+                return None
+            channels = wav_file.getnchannels()
+            frames = wav_file.readframes(wav_file.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    samples = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def _decode_with_av(audio_bytes, sample_rate):
+    """使用 PyAV 在进程内解码"""
+    resampler = av.AudioResampler(format="flt", layout="mono", rate=sample_rate)
+    pieces = []
+    with av.open(io.BytesIO(audio_bytes)) as container:
+        for frame in container.decode(audio=0):
+            for resampled in resampler.resample(frame):
+                pieces.append(resampled.to_ndarray().reshape(-1))
+        for resampled in resampler.resample(None):
+            pieces.append(resampled.to_ndarray().reshape(-1))
+
+    if not pieces:
+        raise AudioDecodeError("没有解码出音频帧")
+    return np.concatenate(pieces).astype(np.float32, copy=False)
+
+
+def _decode_with_ffmpeg(audio_bytes, sample_rate):
+    """通过 ffmpeg 管道解码（数据经标准输入输出传递，不写磁盘）"""
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        raise AudioDecodeError("未找到 ffmpeg，无法解码音频")
+
+    command = [
+        ffmpeg,
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-i",
+        "pipe:0",
+        "-f",
+        "f32le",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "pipe:1",
+    ]
+    process = subprocess.run(command, input=audio_bytes, capture_output=True)
+    if process.returncode != 0:
+        raise AudioDecodeError(
+            f"ffmpeg 解码失败: {process.stderr.decode('utf-8', errors='ignore').strip()}"
+        )
+    if not process.stdout:
+        raise AudioDecodeError("没有解码出音频帧")
+
+    return np.frombuffer(process.stdout, dtype=np.float32).copy()
+
+
+def probe_duration(file_path):
+    """获取音频/视频文件的时长
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        时长秒数，无法获取时返回 None
+    """
+    wav_params = _read_wav_params(file_path)
+    if wav_params is not None:
+        channels, frame_rate, frame_count = wav_params
+        return frame_count / frame_rate
+
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        return None
+    try:
+        # 不指定输出时 ffmpeg 只打印输入信息，读取文件头即可，不解码音频
+        process = subprocess.run(
+            [ffmpeg, "-hide_banner", "-i", file_path],
+            capture_output=True,
+            timeout=30,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"获取媒体时长失败: {e}")
+        return None
+
+    match = _DURATION_PATTERN.search(process.stderr)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def iter_audio_frames(
+    file_path, frame_seconds, start_seconds=0.0, sample_rate=SAMPLE_RATE
+):
+    """流式解码音频/视频文件，逐段产出固定时长的单声道 float32 采样
+
+    mp4/mkv/m4a/webm 等任意容器通过 ffmpeg 子进程解码，ffmpeg 边读文件边
+    输出 PCM，这里每次只从管道读取一段，内存占用与文件长度无关，第一段
+    解码出来后就可以开始识别。16kHz 16 位 WAV 直接按帧读取，不启动 ffmpeg。
+
+    Args:
+        file_path: 文件路径
+        frame_seconds: 每段的时长（秒），最后一段可能更短
+        start_seconds: 从第几秒开始解码
+        sample_rate: 目标采样率
+
+    Yields:
+        np.ndarray: float32 采样，取值范围 [-1, 1]
+    """
+    frame_samples = max(1, int(frame_seconds * sample_rate))
+
+    wav_params = _read_wav_params(file_path)
+    if wav_params is not None and wav_params[1] == sample_rate:
+        yield from _iter_wav_frames(
+            file_path, frame_samples, int(start_seconds * sample_rate)
+        )
+        return
+
+    ffmpeg = find_ffmpeg()
+    if ffmpeg is None:
+        raise AudioDecodeError("未找到 ffmpeg，无法解码音频")
+
+    command = [ffmpeg, "-hide_banner", "-loglevel", "error", "-nostdin"]
+    if start_seconds > 0:
+        # 放在 -i 之前按输入定位，不需要解码前面的内容
+        command += ["-ss", f"{start_seconds:.3f}"]
+    command += [
+        "-i",
+        file_path,
+        "-vn",
+        "-sn",
+        "-dn",
+        "-f",
+        "f32le",
+        "-ac",
+        "1",
+        "-ar",
+        str(sample_rate),
+        "pipe:1",
+    ]
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0
+    )
+
+    stderr_lines, stderr_thread = _drain_stderr(process)
+
+    frame_bytes = frame_samples * 4
+    produced = False
+    try:
+        while True:
+            data = _read_exactly(process.stdout, frame_bytes)
+            if not data:
+                break
+            # 不足 4 字节的尾部不构成完整采样
+            data = data[: len(data) - len(data) % 4]
+            if data:
+                produced = True
+                yield np.frombuffer(data, dtype=np.float32).copy()
+            if len(data) < frame_bytes:
+                break
+
+        process.wait()
+        stderr_thread.join(timeout=1)
+        if process.returncode != 0 or not produced:
+            message = b"".join(stderr_lines).decode("utf-8", errors="ignore").strip()
+            raise AudioDecodeError(f"ffmpeg 解码失败: {message or '没有解码出音频帧'}")
+    finally:
+        # 调用方提前停止迭代（例如任务被取消）时结束 ffmpeg 进程
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+def _drain_stderr(process):
+    """在后台线程中读取 ffmpeg 的错误输出，避免管道写满后 ffmpeg 阻塞
+
+    Returns:
+        (最近的错误输出行, 读取线程)
+    """
+    stderr_lines = deque(maxlen=20)
+    stderr_thread = threading.Thread(
+        target=lambda: stderr_lines.extend(process.stderr), daemon=True
+    )
+    stderr_thread.start()
+    return stderr_lines, stderr_thread
+
+
+def _read_exactly(stream, size):
+    """从管道读取 size 字节，只有到达末尾时才返回更少的数据"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        chunks.append(data)
+        remaining -= len(data)
+    return b"".join(chunks)
+
+
+def _read_wav_params(file_path):
+    """读取 16 位 PCM WAV 的 (声道数, 采样率, 帧数)，其他格式返回 None"""
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        with wave.open(file_path, "rb") as wav_file:
+            if wav_file.getsampwidth() != 2:
+                return None
+            return (
+                wav_file.getnchannels(),
+                wav_file.getframerate(),
+                wav_file.getnframes(),
+            )
+    except (OSError, wave.Error, EOFError):
+        return None
+
+
+def _iter_wav_frames(file_path, frame_samples, start_sample):
+    """逐段读取 16 位 PCM WAV"""
+    with wave.open(file_path, "rb") as wav_file:
+        channels = wav_file.getnchannels()
+        if start_sample:
+            wav_file.setpos(min(start_sample, wav_file.getnframes()))
+        while True:
+            frames = wav_file.readframes(frame_samples)
+            if not frames:
+                break
+            samples = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+            yield samples
+
+
+class StreamDecoder:
+    """单个实时录音的增量解码器
+
+    MediaRecorder 输出的 webm/opus 片段不能单独解码，只有第一个片段带有
+    容器头。每个会话保持一个 ffmpeg 进程，依次把片段写入它的标准输入，
+    解码状态保留在进程中：容器头只解析一次，每次只读出新增的 PCM 采样。
+
+    片段必须按顺序写入。上传请求可能乱序到达，feed_fragment 按片段索引
+    （从 0 开始）暂存提前到达的片段，缺失的片段到达后再依次写入。解码进程
+    出错后解码器保持失败状态：之后的片段没有容器头，换一个解码器也无法解码。
+    """
+
+    def __init__(
+        self,
+        session_id,
+        sample_rate=SAMPLE_RATE,
+        settle_seconds=STREAM_SETTLE_SECONDS,
+        timeout=STREAM_DECODE_TIMEOUT,
+    ):
+        """启动解码进程
+
+        Args:
+            session_id: 会话（记录）ID
+            sample_rate: 输出采样率
+            settle_seconds: 写入片段后输出停止增长多长时间视为解码完成（秒）
+            timeout: 写入第一个片段后最长等待解码输出的时间（秒）
+        """
+        ffmpeg = find_ffmpeg()
+        if ffmpeg is None:
+            raise AudioDecodeError("未找到 ffmpeg，无法增量解码")
+
+        self.session_id = session_id
+        self.settle_seconds = settle_seconds
+        self.timeout = timeout
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.lock = threading.Lock()
+        # 下一个应当写入的片段索引，以及提前到达、等待写入的片段
+        self.next_index = 0
+        self._held = {}
+        # 解码进程出错的原因，出错后不再接受新的片段
+        self.error = None
+
+        command = [
+            ffmpeg,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            # 输入来自管道，尽量少做探测，收到第一个片段就开始解码
+            "-probesize",
+            "2048",
+            "-analyzeduration",
+            "0",
+            "-fflags",
+            "nobuffer",
+            "-i",
+            "pipe:0",
+            "-vn",
+            "-f",
+            "f32le",
+            "-ac",
+            "1",
+            "-ar",
+            str(sample_rate),
+            # 每个音频帧都立即写出，不在输出缓冲区中攒数据
+            "-flush_packets",
+            "1",
+            "pipe:1",
+        ]
+        self._process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        self._stderr_lines, _ = _drain_stderr(self._process)
+
+        self._condition = threading.Condition()
+        self._output = bytearray()
+        self._eof = False
+        self._started = False
+        self._reader = threading.Thread(
+            target=self._read_loop, name=f"stream-decoder-{session_id}", daemon=True
+        )
+        self._reader.start()
+
+    def feed_fragment(self, index, data):
+        """按片段索引顺序写入一个 MediaRecorder 片段
+
+        Args:
+            index: 片段索引，None 表示不检查顺序直接写入
+            data: 片段字节
+
+        Returns:
+            np.ndarray: 新解码出的 float32 采样（可能为空）；片段提前到达时
+                暂存，返回空数组，缺失的片段到达时一起写入
+
+        Raises:
+            AudioDecodeError: 解码进程已经出错
+        """
+        if index is None:
+            return self.feed(data)
+        self.last_active = time.time()
+        if index < self.next_index:
+            logger.warning(f"会话 {self.session_id} 的片段 {index} 重复到达，忽略")
+            return np.zeros(0, dtype=np.float32)
+        self._held[index] = data
+        if self.next_index not in self._held:
+            if len(self._held) <= MAX_HELD_FRAGMENTS:
+                return np.zeros(0, dtype=np.float32)
+            logger.warning(
+                f"会话 {self.session_id} 的片段 {self.next_index} 一直没有到达，跳过"
+            )
+            self.next_index = min(self._held)
+        return self.feed(self._take_held(contiguous=True))
+
+    def feed(self, data):
+        """写入一个 MediaRecorder 片段
+
+        Args:
+            data: 片段字节（第一个片段带有容器头）
+
+        Returns:
+            np.ndarray: 本片段新解码出的 float32 采样（可能为空）
+
+        Raises:
+            AudioDecodeError: 解码进程已经出错或已退出
+        """
+        self.last_active = time.time()
+        if self.error is not None:
+            raise AudioDecodeError(f"增量解码已失败: {self.error}")
+        try:
+            self._process.stdin.write(data)
+            self._process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.error = self._error_message(e)
+            raise AudioDecodeError(f"ffmpeg 解码进程已退出: {self.error}")
+
+        # ffmpeg 异步输出解码结果，等到输出不再增长
+        timeout = (
+            min(self.timeout, STREAM_FRAGMENT_TIMEOUT)
+            if self._started
+            else self.timeout
+        )
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            size = len(self._output)
+            changed_at = time.monotonic()
+            while not self._eof:
+                now = time.monotonic()
+                if len(self._output) != size:
+                    size = len(self._output)
+                    changed_at = now
+                if size and now - changed_at >= self.settle_seconds:
+                    self._started = True
+                    break
+                if now >= deadline:
+                    break
+                self._condition.wait(min(self.settle_seconds, deadline - now))
+            return self._take()
+
+    def finish(self):
+        """录音结束：关闭输入，读出解码器中剩余的采样
+
+        Returns:
+            np.ndarray: 剩余的 float32 采样
+        """
+        # 缺失的片段不会再到达，暂存的片段按顺序写入
+        held = self._take_held(contiguous=False)
+        try:
+            if held and self.error is None:
+                self._process.stdin.write(held)
+            self._process.stdin.close()
+        except OSError:
+            pass
+        self._reader.join(timeout=self.timeout)
+        self.close()
+        with self._condition:
+            return self._take()
+
+    def close(self):
+        """结束解码进程"""
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+
+    def _take_held(self, contiguous):
+        """按索引顺序取出暂存的片段并拼接
+
+        Args:
+            contiguous: 为 True 时只取出从 next_index 开始连续的片段，否则
+                跳过缺失的索引取出全部片段
+        """
+        parts = []
+        for index in sorted(self._held):
+            if index != self.next_index and contiguous:
+                break
+            parts.append(self._held.pop(index))
+            self.next_index = index + 1
+        return b"".join(parts)
+
+    def _take(self):
+        """取出已经完整的采样（调用方持有锁）"""
+        size = len(self._output) - len(self._output) % 4
+        samples = np.frombuffer(bytes(self._output[:size]), dtype=np.float32)
+        del self._output[:size]
+        return samples
+
+    def _read_loop(self):
+        stdout = self._process.stdout
+        while True:
+            data = stdout.read(65536)
+            with self._condition:
+                if not data:
+                    self._eof = True
+                    self._condition.notify_all()
+                    return
+                self._output.extend(data)
+                self._condition.notify_all()
+
+    def _error_message(self, error):
+        message = b"".join(self._stderr_lines).decode("utf-8", errors="ignore")
+        return message.strip() or str(error)
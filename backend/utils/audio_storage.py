@@ -6,6 +6,11 @@ import wave
 import base64
 import io
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.metrics import Histogram
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +40,95 @@ class AudioStorage:
 
         logger.info(f"音频存储目录: {self.storage_dir}")
 
+        # 后台写文件的线程，避免磁盘写入阻塞识别请求
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="audio-writer"
+        )
+        # 后台写文件的耗时
+        self.write_histogram = Histogram()
+
+    def build_file_path(self, mode="onetime", chunk_index=None):
+        """生成新的音频文件路径
+
+        Args:
+            mode: 录音模式 ('onetime' 或 'realtime')
+            chunk_index: 分片索引，仅在realtime模式下使用
+
+        Returns:
+            音频文件的完整路径
+        """
+        timestamp = int(time.time() * 1000)
+        unique_id = str(uuid.uuid4())[:8]
+
+        if mode == "realtime" and chunk_index is not None:
+            # 实时录音模式，使用分片索引
+            filename = f"realtime_{timestamp}_{unique_id}_chunk_{chunk_index}.wav"
+        else:
+            # 一次性录音模式
+            filename = f"onetime_{timestamp}_{unique_id}.wav"
+
+        return os.path.join(self.storage_dir, filename)
+
+    def save_audio_bytes_async(self, audio_bytes, mode="onetime", chunk_index=None):
+        """在后台线程中保存音频数据，立即返回文件路径
+
+        Args:
+            audio_bytes: 原始音频字节
+            mode: 录音模式 ('onetime' 或 'realtime')
+            chunk_index: 分片索引，仅在realtime模式下使用
+
+        Returns:
+            将要写入的音频文件路径
+        """
+        file_path = self.build_file_path(mode=mode, chunk_index=chunk_index)
+        self._writer.submit(self._write_file, audio_bytes, file_path)
+        return file_path
+
+    def save_samples_async(
+        self, samples, mode="onetime", chunk_index=None, sample_rate=16000
+    ):
+        """在后台线程中把 float32 采样编码为 WAV 并保存，立即返回文件路径
+
+        Args:
+            samples: 单声道 float32 采样，取值范围 [-1, 1]
+            mode: 录音模式 ('onetime' 或 'realtime')
+            chunk_index: 分片索引，仅在realtime模式下使用
+            sample_rate: 采样率
+
+        Returns:
+            将要写入的音频文件路径
+        """
+        file_path = self.build_file_path(mode=mode, chunk_index=chunk_index)
+        self._writer.submit(self._write_samples, samples, file_path, sample_rate)
+        return file_path
+
+    def _write_samples(self, samples, file_path, sample_rate):
+        """编码并写入 WAV 文件（在后台线程中执行）"""
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+            wav_file.writeframes(pcm.tobytes())
+        self._write_file(buffer.getvalue(), file_path)
+
+    def _write_file(self, audio_bytes, file_path):
+        """写入音频文件（在后台线程中执行）"""
+        started = time.perf_counter()
+        try:
+            with open(file_path, "wb") as f:
+                f.write(audio_bytes)
+            logger.info(f"音频文件保存成功: {file_path}")
+        except Exception as e:
+            logger.error(f"保存音频文件失败: {e}")
+        finally:
+            self.write_histogram.observe(time.perf_counter() - started)
+
+    def close(self):
+        """等待后台写入完成"""
+        self._writer.shutdown(wait=True)
+
     def save_audio_file(self, audio_data, mode="onetime", chunk_index=None):
         """保存音频文件
 
@@ -48,17 +142,7 @@ class AudioStorage:
         """
         try:
             # 生成唯一文件名
-            timestamp = int(time.time() * 1000)
-            unique_id = str(uuid.uuid4())[:8]
-
-            if mode == "realtime" and chunk_index is not None:
-                # 实时录音模式，使用分片索引
-                filename = f"realtime_{timestamp}_{unique_id}_chunk_{chunk_index}.wav"
-            else:
-                # 一次性录音模式
-                filename = f"onetime_{timestamp}_{unique_id}.wav"
-
-            file_path = os.path.join(self.storage_dir, filename)
+            file_path = self.build_file_path(mode=mode, chunk_index=chunk_index)
 
             # 处理不同类型的音频数据
             if isinstance(audio_data, str) and audio_data.startswith(
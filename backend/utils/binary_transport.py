@@ -0,0 +1,118 @@
+"""
+二进制音频传输模块 - 实时分片以原始字节上传（application/octet-stream 或 multipart），
+元数据放在查询参数或请求头中，请求体直接读入每个线程复用的缓冲区
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 元数据字段 -> 请求头名称（查询参数与字段同名）
+STREAM_HEADERS = {
+    "record_id": "X-Record-Id",
+    "chunk_index": "X-Chunk-Index",
+    "is_last_chunk": "X-Is-Last-Chunk",
+    "auto_insert": "X-Auto-Insert",
+    "incremental": "X-Incremental",
+}
+
+# 超过该大小的缓冲区用完后不再保留，避免偶尔的大请求长期占用内存（字节）
+MAX_RETAINED_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+def parse_bool(value):
+    """解析查询参数/请求头中的布尔值"""
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def parse_int(value):
+    """解析查询参数/请求头中的整数，缺省或无法解析时返回 None"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_stream_params(args, headers, form=None):
+    """读取实时分片的元数据，优先级: 表单字段 > 查询参数 > 请求头
+
+    Args:
+        args: 查询参数
+        headers: 请求头
+        form: multipart 表单字段
+
+    Returns:
+        dict: record_id、chunk_index、is_last_chunk、auto_insert、incremental
+    """
+    raw = {}
+    for name, header in STREAM_HEADERS.items():
+        value = None
+        if form is not None:
+            value = form.get(name)
+        if value is None:
+            value = args.get(name)
+        if value is None:
+            value = headers.get(header)
+        raw[name] = value
+
+    return {
+        "record_id": parse_int(raw["record_id"]),
+        "chunk_index": parse_int(raw["chunk_index"]),
+        "is_last_chunk": parse_bool(raw["is_last_chunk"]),
+        "auto_insert": parse_bool(raw["auto_insert"]),
+        "incremental": parse_bool(raw["incremental"]),
+    }
+
+
+class BodyBuffer:
+    """每个线程复用一块字节缓冲区读取请求体
+
+    请求体按 Content-Length 一次读入缓冲区，返回指向缓冲区的 memoryview，
+    不再经过 base64 解码和 JSON 解析产生的两次完整拷贝。返回的视图只在
+    本次请求内有效，需要在请求结束后继续使用（例如后台写文件）时由调用方
+    自行拷贝。
+    """
+
+    def __init__(self, max_retained_bytes=MAX_RETAINED_BUFFER_BYTES):
+        self.max_retained_bytes = max_retained_bytes
+        self._local = threading.local()
+
+    def read(self, stream, length):
+        """从流中读取 length 字节
+
+        Args:
+            stream: 可读的文件对象
+            length: 需要读取的字节数
+
+        Returns:
+            memoryview: 实际读到的数据（流提前结束时可能更短）
+        """
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or len(buffer) < length:
+            # 分配新的缓冲区而不是原地扩容，上一次请求残留的视图不影响新缓冲区
+            buffer = bytearray(max(length, 64 * 1024))
+        if len(buffer) <= self.max_retained_bytes:
+            self._local.buffer = buffer
+        else:
+            self._local.buffer = None
+
+        view = memoryview(buffer)
+        received = 0
+        while received < length:
+            if hasattr(stream, "readinto"):
+                count = stream.readinto(view[received:length])
+            else:
+                data = stream.read(length - received)
+                count = len(data) if data else 0
+                view[received : received + count] = data or b""
+            if not count:
+                break
+            received += count
+        return view[:received]
@@ -0,0 +1,237 @@
+"""
+指标统计模块 - 线程安全的直方图和计数器，以及 Prometheus 文本格式的导出
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认的延迟分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """累计分桶直方图（与 Prometheus 的 histogram 语义一致）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """初始化直方图
+
+        Args:
+            buckets: 分桶上界列表，会自动追加 +Inf
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """记录一个观测值"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        """获取当前统计结果
+
+        Returns:
+            dict: 包含 buckets（上界字符串 -> 累计数量）、count 和 sum
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+            total_count = self._count
+
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            cumulative["+Inf" if bound == float("inf") else f"{bound:g}"] = running
+
+        return {"buckets": cumulative, "count": total_count, "sum": total_sum}
+
+
+def _format_labels(labels):
+    """把标签字典格式化为 {name="value",...}"""
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        escaped = escaped.replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+class LabeledHistogram:
+    """按标签区分的一组直方图"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """获取指定标签的直方图，不存在时创建"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._children.get(key)
+            if histogram is None:
+                histogram = Histogram(self.buckets)
+                self._children[key] = histogram
+            return histogram
+
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块的耗时（秒），代码块抛出异常时同样记录"""
+        histogram = self.labels(**labels)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    def children(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class LabeledCounter:
+    """按标签区分的一组计数器"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """计数增加 amount"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def children(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class MetricsRegistry:
+    """指标注册表，按 Prometheus 文本格式导出所有指标"""
+
+    def __init__(self):
+        # 名称 -> (类型, 说明, 取值函数)
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        """注册一组带标签的直方图
+
+        Returns:
+            LabeledHistogram
+        """
+        histogram = LabeledHistogram(buckets)
+        self._register(name, "histogram", help_text, histogram.children)
+        return histogram
+
+    def counter(self, name, help_text):
+        """注册一组带标签的计数器
+
+        Returns:
+            LabeledCounter
+        """
+        counter = LabeledCounter()
+        self._register(name, "counter", help_text, counter.children)
+        return counter
+
+    def register_histogram(self, name, help_text, func):
+        """注册由其他模块维护的直方图
+
+        Args:
+            name: 指标名称
+            help_text: 说明
+            func: 返回 Histogram 或 [(标签元组, Histogram), ...] 的函数
+        """
+        self._register(name, "histogram", help_text, lambda: _as_children(func()))
+
+    def gauge(self, name, help_text, func):
+        """注册仪表盘指标，在导出时调用 func 取值
+
+        Args:
+            name: 指标名称
+            help_text: 说明
+            func: 返回数值或 [(标签元组, 数值), ...] 的函数
+        """
+        self._register(name, "gauge", help_text, lambda: _as_children(func()))
+
+    def counter_func(self, name, help_text, func):
+        """注册由其他模块维护的累计计数，在导出时调用 func 取值
+
+        Args:
+            name: 指标名称
+            help_text: 说明
+            func: 返回数值或 [(标签元组, 数值), ...] 的函数
+        """
+        self._register(name, "counter", help_text, lambda: _as_children(func()))
+
+    def render(self):
+        """按 Prometheus 文本格式导出所有指标
+
+        Returns:
+            str: 指标文本
+        """
+        with self._lock:
+            metrics = list(self._metrics.items())
+
+        lines = []
+        for name, (metric_type, help_text, collect) in metrics:
+            try:
+                children = collect()
+            except Exception:
+                # 某个指标取值失败不影响其他指标的导出
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in children:
+                if value is None:
+                    continue
+                if metric_type == "histogram":
+                    lines.extend(_render_histogram(name, labels, value))
+                else:
+                    lines.append(
+                        f"{name}{_format_labels(labels)} {_format_value(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def _register(self, name, metric_type, help_text, collect):
+        with self._lock:
+            self._metrics[name] = (metric_type, help_text, collect)
+
+
+def _as_children(value):
+    """把单个取值转换为 [(标签元组, 取值)] 形式"""
+    if isinstance(value, list):
+        return value
+    return [((), value)]
+
+
+def _render_histogram(name, labels, histogram):
+    snapshot = histogram.snapshot()
+    lines = []
+    for bound, count in snapshot["buckets"].items():
+        bucket_labels = tuple(labels) + (("le", bound),)
+        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+    lines.append(
+        f"{name}_sum{_format_labels(labels)} {_format_value(float(snapshot['sum']))}"
+    )
+    lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+    return lines
@@ -0,0 +1,222 @@
+"""
+WebSocket 流式识别服务 - 客户端通过一个长连接持续发送 PCM16 音频，识别结果产生后立即推送
+
+协议（文本消息均为 JSON，同一个连接可以依次进行多次录音）:
+
+    客户端 -> 服务端
+        {"type": "open", "auto_insert": false, "sample_rate": 16000}   开始录音
+        二进制消息: 16kHz 单声道 16 位小端 PCM，长度任意
+        {"type": "close"}                                              结束录音
+
+    服务端 -> 客户端
+        {"type": "opened", "record_id": 1, "sample_rate": 16000}
+        {"type": "partial", "record_id": 1, "chunk_index": 0, "text": "..."}
+        {"type": "final", "record_id": 1, "text": "完整文本"}
+        {"type": "error", "error": "..."}
+"""
+
+import json
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from websockets.sync.server import serve as websocket_serve
+    from websockets.exceptions import ConnectionClosed
+except ImportError:
+    websocket_serve = None
+    ConnectionClosed = Exception
+    logger.info("websockets 未安装，WebSocket 流式识别不可用")
+
+# 客户端发送的 PCM 采样率
+PCM_SAMPLE_RATE = 16000
+
+
+def is_available():
+    """是否可以启动 WebSocket 服务"""
+    return websocket_serve is not None
+
+
+def pcm16_to_float(data):
+    """16 位小端 PCM 转换为 float32 采样"""
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class StreamSocketServer:
+    """WebSocket 流式识别服务
+
+    每个连接在独立线程中处理。收到的 PCM 累积到 chunk_samples 个采样点后
+    交给 feed_session 识别，识别出的文本立即推送给客户端；录音结束时把剩余
+    音频作为最后一个分片识别，再推送完整文本。
+    """
+
+    def __init__(
+        self, host, port, open_session, feed_session, close_session, chunk_samples
+    ):
+        """初始化服务
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+            open_session: 开始录音的函数，参数为 open 消息字典，返回会话状态字典
+                （需要包含 record_id 和 chunk_index）
+            feed_session: 识别函数，参数为 (会话状态, 采样数组或 None, 是否最后
+                一个分片)，返回识别出的文本列表；采样为 None 时只冲刷剩余结果
+            close_session: 结束录音的函数，参数为会话状态，返回完整文本
+            chunk_samples: 返回每个分片采样点数的函数
+        """
+        self.host = host
+        self.port = port
+        self.open_session = open_session
+        self.feed_session = feed_session
+        self.close_session = close_session
+        self.chunk_samples = chunk_samples
+
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.total_connections = 0
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self._server = websocket_serve(self._handle, self.host, self.port)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="ws-server", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"WebSocket 流式识别服务已启动: ws://{self.host}:{self.port}")
+
+    def stop(self):
+        """停止服务并关闭所有连接"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+    def _send(self, connection, message):
+        if connection is None:
+            return
+        try:
+            connection.send(json.dumps(message, ensure_ascii=False))
+        except ConnectionClosed:
+            # 连接已断开，剩余的识别和保存由 _handle 结束时继续完成
+            pass
+
+    def _handle(self, connection):
+        with self._lock:
+            self.connections += 1
+            self.total_connections += 1
+
+        state = None
+        pcm = bytearray()
+        try:
+            for message in connection:
+                if isinstance(message, bytes):
+                    if state is None:
+                        self._send(
+                            connection,
+                            {"type": "error", "error": "请先发送 open 消息"},
+                        )
+                        continue
+                    pcm.extend(message)
+                    chunk_bytes = self.chunk_samples() * 2
+                    while len(pcm) >= chunk_bytes:
+                        samples = pcm16_to_float(pcm[:chunk_bytes])
+                        del pcm[:chunk_bytes]
+                        self._feed(connection, state, samples, False)
+                    continue
+
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    self._send(connection, {"type": "error", "error": "无效的消息"})
+                    continue
+
+                message_type = request.get("type")
+                if message_type == "open":
+                    if state is not None:
+                        finishing, state = state, None
+                        self._finish(connection, finishing, pcm)
+                    sample_rate = int(request.get("sample_rate") or PCM_SAMPLE_RATE)
+                    if sample_rate != PCM_SAMPLE_RATE:
+                        self._send(
+                            connection,
+                            {
+                                "type": "error",
+                                "error": f"只支持 {PCM_SAMPLE_RATE}Hz 的 PCM 音频",
+                            },
+                        )
+                        continue
+                    try:
+                        state = self.open_session(request)
+                    except Exception as e:
+                        logger.error(f"开始 WebSocket 录音失败: {e}")
+                        self._send(connection, {"type": "error", "error": str(e)})
+                        continue
+                    pcm = bytearray()
+                    self._send(
+                        connection,
+                        {
+                            "type": "opened",
+                            "record_id": state["record_id"],
+                            "sample_rate": PCM_SAMPLE_RATE,
+                        },
+                    )
+                elif message_type == "close":
+                    if state is not None:
+                        finishing, state = state, None
+                        self._finish(connection, finishing, pcm)
+                        pcm = bytearray()
+                else:
+                    self._send(
+                        connection,
+                        {"type": "error", "error": f"未知的消息类型: {message_type}"},
+                    )
+        except ConnectionClosed:
+            pass
+        finally:
+            if state is not None:
+                # 客户端断开时保存已经识别的内容
+                try:
+                    self._finish(None, state, pcm)
+                except Exception as e:
+                    logger.error(f"结束 WebSocket 录音失败: {e}")
+            with self._lock:
+                self.connections -= 1
+
+    def _feed(self, connection, state, samples, is_final):
+        """识别一个分片并推送结果"""
+        chunk_index = state["chunk_index"]
+        try:
+            texts = self.feed_session(state, samples, is_final)
+        except Exception as e:
+            logger.error(f"WebSocket 分片识别失败: {e}")
+            self._send(connection, {"type": "error", "error": str(e)})
+            return
+        for text in texts:
+            self._send(
+                connection,
+                {
+                    "type": "partial",
+                    "record_id": state["record_id"],
+                    "chunk_index": chunk_index,
+                    "text": text,
+                },
+            )
+
+    def _finish(self, connection, state, pcm):
+        """识别剩余音频并结束录音"""
+        remaining = pcm16_to_float(pcm[: len(pcm) - len(pcm) % 2]) if pcm else None
+        self._feed(
+            connection,
+            state,
+            remaining if remaining is not None and len(remaining) else None,
+            True,
+        )
+        text = self.close_session(state)
+        self._send(
+            connection, {"type": "final", "record_id": state["record_id"], "text": text}
+        )
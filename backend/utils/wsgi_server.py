@@ -0,0 +1,146 @@
+"""
+生产服务器模块 - 使用 waitress 多线程 WSGI 服务器运行 Flask 应用，支持优雅退出
+"""
+
+import logging
+import signal
+import threading
+import time
+
+from flask import jsonify, request
+
+logger = logging.getLogger(__name__)
+
+try:
+    from waitress.server import create_server
+except ImportError:
+    create_server = None
+    logger.info("waitress 未安装，生产服务器模式不可用")
+
+# 退出时仍然允许访问的接口（用于健康检查）
+DRAIN_ALLOWED_PATHS = ("/api/status", "/api/ready")
+
+
+class RequestTracker:
+    """记录正在处理的请求数，退出时拒绝新请求并等待已有请求完成"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.inflight = 0
+        self.draining = False
+
+    def init_app(self, app):
+        """在 Flask 应用上注册请求计数钩子"""
+
+        @app.before_request
+        def _track_request_start():
+            if self.draining and request.path not in DRAIN_ALLOWED_PATHS:
+                response = jsonify({"error": "服务正在关闭"})
+                response.status_code = 503
+                return response
+            with self._condition:
+                self.inflight += 1
+            request.environ["request_tracker.counted"] = True
+
+        @app.teardown_request
+        def _track_request_end(_):
+            if request.environ.pop("request_tracker.counted", False):
+                with self._condition:
+                    self.inflight -= 1
+                    self._condition.notify_all()
+
+    def drain(self, timeout):
+        """停止接收新请求，等待正在处理的请求完成
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            bool: 是否在超时之前全部完成
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self.draining = True
+            while self.inflight > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+
+def is_available():
+    """是否可以使用生产服务器模式"""
+    return create_server is not None
+
+
+def serve(
+    app,
+    host,
+    port,
+    tracker,
+    threads=8,
+    connection_limit=100,
+    channel_timeout=120,
+    shutdown_timeout=30,
+):
+    """使用 waitress 运行应用，收到 SIGINT/SIGTERM 后优雅退出
+
+    退出时先拒绝新请求（健康检查除外），等待正在进行的识别请求完成，
+    然后关闭监听端口。
+
+    Args:
+        app: Flask 应用
+        host: 监听地址
+        port: 监听端口
+        tracker: RequestTracker 实例（需要已调用 init_app）
+        threads: 处理请求的线程数
+        connection_limit: 最大并发连接数
+        channel_timeout: 空闲连接的超时时间（秒）
+        shutdown_timeout: 退出时等待请求完成的最长时间（秒）
+    """
+    server = create_server(
+        app,
+        host=host,
+        port=port,
+        threads=threads,
+        connection_limit=connection_limit,
+        channel_timeout=channel_timeout,
+        ident="voice-assistant",
+    )
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, _frame):
+        logger.info(f"收到退出信号 {signum}，开始优雅退出")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    # 事件循环在后台线程中运行，主线程负责等待退出信号并排空请求
+    server_thread = threading.Thread(
+        target=server.run, name="waitress-loop", daemon=True
+    )
+    server_thread.start()
+    logger.info(
+        f"生产服务器已启动: http://{host}:{port}, 线程数 {threads}, "
+        f"最大连接数 {connection_limit}"
+    )
+
+    # Windows 上无超时的 wait 不会被 Ctrl+C 打断，因此循环等待
+    while not stop_event.wait(0.5):
+        if not server_thread.is_alive():
+            logger.error("服务器事件循环意外退出")
+            break
+
+    if tracker.drain(shutdown_timeout):
+        logger.info("所有进行中的请求已完成")
+    else:
+        logger.warning(
+            f"等待 {shutdown_timeout}s 后仍有 {tracker.inflight} 个请求未完成，强制退出"
+        )
+
+    server.close()
+    server.task_dispatcher.shutdown(timeout=1)
+    logger.info("生产服务器已关闭")
@@ -263,6 +263,7 @@ app.on("will-quit", async (event) => {
   if (pythonService.isServiceRunning()) {
     event.preventDefault();
     await pythonService.stop();
+    await pythonService.stopModelDaemon();
     app.quit();
   }
 });
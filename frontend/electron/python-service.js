@@ -22,11 +22,13 @@ class PythonService {
       puncModel: "", // ct-punc
       spkModel: "", // cam++
       disableUpdate: true,
-      device: "cuda", // cuda 或 cpu
+      device: "auto", // auto、cuda 或 cpu
       ngpu: 0, // GPU 设备 ID
       hotwords: "", // 热词列表
     };
     this.dataStoragePath = ""; // 数据存储目录
+    // 模型守护进程的套接字路径，设置后模型在守护进程中加载，后端重启时不需要重新加载模型
+    this.modelDaemonSocket = process.env.ASR_MODEL_DAEMON_SOCKET || "";
   }
 
   // 设置模型参数
@@ -41,6 +43,12 @@ class PythonService {
     console.log("设置数据存储目录:", this.dataStoragePath);
   }
 
+  // 设置模型守护进程的套接字路径，为空表示不使用
+  setModelDaemonSocket(socketPath) {
+    this.modelDaemonSocket = socketPath;
+    console.log("设置模型守护进程套接字:", this.modelDaemonSocket);
+  }
+
   // 获取 Python 可执行文件路径
   getPythonPath() {
     // 如果设置了环境变量，优先使用环境变量中的 Python 路径
@@ -162,7 +170,15 @@ class PythonService {
       }
 
       // 准备命令行参数
-      const args = [appPath, this.port.toString()];
+      // 使用生产服务器，退出时等待进行中的识别请求完成
+      const args = [
+        appPath,
+        this.port.toString(),
+        "--server",
+        "waitress",
+        "--host",
+        "127.0.0.1",
+      ];
 
       // 添加模型参数
       if (this.modelParams) {
@@ -200,6 +216,11 @@ class PythonService {
         args.push("--data-storage-path", this.dataStoragePath);
       }
 
+      // 添加模型守护进程参数
+      if (this.modelDaemonSocket) {
+        args.push("--model-daemon", this.modelDaemonSocket);
+      }
+
       console.log("启动 Python 进程参数:", args);
 
       // 启动 Python 进程
@@ -391,6 +412,39 @@ class PythonService {
     });
   }
 
+  // 停止模型守护进程（后端重启时守护进程保留，退出应用时调用）
+  stopModelDaemon() {
+    if (!this.modelDaemonSocket) {
+      return Promise.resolve();
+    }
+
+    return new Promise((resolve) => {
+      console.log("停止模型守护进程");
+      const stopProcess = spawn(
+        this.pythonPath,
+        [
+          "-m",
+          "asr.model_daemon",
+          "--socket",
+          this.modelDaemonSocket,
+          "--shutdown",
+        ],
+        {
+          cwd: this.backendPath,
+          env: this.pythonEnv,
+        }
+      );
+      stopProcess.on("close", (code) => {
+        console.log(`模型守护进程停止命令退出，代码: ${code}`);
+        resolve();
+      });
+      stopProcess.on("error", (err) => {
+        console.error(`停止模型守护进程失败: ${err.message}`);
+        resolve();
+      });
+    });
+  }
+
   // 获取服务 URL
   getUrl() {
     return `http://localhost:${this.port}`;
@@ -0,0 +1,343 @@
+"""
+ASR 离线基准测试 - 在本地 WAV + 参考文本数据集上比较不同模型配置的
+加载时间、峰值内存、实时率（RTF）、分片延迟和字错误率（CER）
+
+数据目录中每个音频文件（wav/mp3/flac 等）旁边放一个同名的 .txt 参考文本，
+或者通过 --transcripts 指定 "<文件名> <文本>" 格式的列表文件。
+
+每个配置在独立的子进程中运行，加载时间和峰值内存互不影响。模型需要提前
+下载到本地缓存，测试时使用 disable_update，不访问网络。
+
+用法示例:
+    python scripts/benchmark_asr.py --data-dir ./testset
+    python scripts/benchmark_asr.py --data-dir ./testset \\
+        --models paraformer-zh iic/SenseVoiceSmall --pipelines bare vad_punc \\
+        --threads 1 4 --chunk-seconds 2 5 --output report.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import unicodedata
+import multiprocessing
+
+import numpy as np
+
+# 让脚本可以直接导入 backend 中的模块
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, os.path.abspath(BACKEND_DIR))
+
+from asr.streaming import SAMPLE_RATE, StreamingSession, is_streaming_model
+from asr.model_loader import create_model, warmup_model
+from utils.audio_decoder import decode_audio_bytes
+from utils.postprocess_utils import format_str_v2
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a", ".ogg", ".webm")
+
+DEFAULT_MODELS = ["paraformer-zh", "paraformer-zh-streaming", "iic/SenseVoiceSmall"]
+
+# 附加模型组合: 名称 -> (vad_model, punc_model, spk_model)
+PIPELINES = {
+    "bare": ("", "", ""),
+    "vad": ("fsmn-vad", "", ""),
+    "vad_punc": ("fsmn-vad", "ct-punc", ""),
+    "vad_punc_spk": ("fsmn-vad", "ct-punc", "cam++"),
+}
+
+
+def load_dataset(data_dir, transcripts_path=None):
+    """读取数据集
+
+    Args:
+        data_dir: 音频目录
+        transcripts_path: 可选的参考文本列表文件
+
+    Returns:
+        [(音频路径, 参考文本), ...]
+    """
+    references = {}
+    if transcripts_path:
+        with open(transcripts_path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.strip().split(maxsplit=1)
+                if len(parts) == 2:
+                    references[os.path.splitext(parts[0])[0]] = parts[1]
+
+    items = []
+    for name in sorted(os.listdir(data_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in AUDIO_EXTENSIONS:
+            continue
+        reference = references.get(stem)
+        text_path = os.path.join(data_dir, stem + ".txt")
+        if reference is None and os.path.exists(text_path):
+            with open(text_path, "r", encoding="utf-8") as f:
+                reference = f.read().strip()
+        if reference is None:
+            logger.warning(f"跳过没有参考文本的音频: {name}")
+            continue
+        items.append((os.path.join(data_dir, name), reference))
+    return items
+
+
+def normalize_text(text):
+    """计算 CER 前的文本归一化：去掉标点、空白和 SenseVoice 标签，统一小写"""
+    text = format_str_v2(text) if "<|" in text else text
+    return "".join(
+        ch.lower()
+        for ch in unicodedata.normalize("NFKC", text)
+        if not unicodedata.category(ch).startswith(("P", "Z", "S", "C"))
+    )
+
+
+def edit_distance(reference, hypothesis):
+    """字符级编辑距离"""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_char in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_char in enumerate(hypothesis, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_char != hyp_char),
+            )
+        previous = current
+    return previous[-1]
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），无法获取时返回 None"""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 返回 KB，macOS 返回字节
+        return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 4) if values else None
+
+
+def recognize(model, model_params, samples):
+    """识别一段完整音频，返回文本"""
+    if is_streaming_model(model_params["model"]):
+        session = StreamingSession("benchmark")
+        return "".join(session.feed(model, samples, is_final=True))
+    result = model.generate(input=samples, language="auto", use_itn=True)
+    return result[0]["text"] if result else ""
+
+
+def run_config(config, items, chunk_seconds, result_queue):
+    """在子进程中测试一个配置"""
+    try:
+        import torch
+
+        torch.set_num_threads(config["threads"])
+    except ImportError:
+        pass
+
+    model_params = {
+        "model": config["model"],
+        "vad_model": config["vad_model"],
+        "punc_model": config["punc_model"],
+        "spk_model": config["spk_model"],
+        "disable_update": True,
+        "device": "cpu",
+        "ngpu": 0,
+        "hotwords": "",
+    }
+    report = dict(config)
+    try:
+        started = time.perf_counter()
+        model = create_model(model_params)
+        report["load_seconds"] = round(time.perf_counter() - started, 3)
+
+        started = time.perf_counter()
+        warmup_model(model, model_params)
+        report["warmup_seconds"] = round(time.perf_counter() - started, 3)
+
+        audio = [
+            (decode_audio_bytes(open(path, "rb").read()), ref) for path, ref in items
+        ]
+
+        # 整段识别：RTF 和 CER
+        total_audio = 0.0
+        total_time = 0.0
+        errors = 0
+        ref_chars = 0
+        for samples, reference in audio:
+            started = time.perf_counter()
+            text = recognize(model, model_params, samples)
+            total_time += time.perf_counter() - started
+            total_audio += len(samples) / SAMPLE_RATE
+            ref = normalize_text(reference)
+            errors += edit_distance(ref, normalize_text(text))
+            ref_chars += len(ref)
+        report["audio_seconds"] = round(total_audio, 2)
+        report["rtf"] = round(total_time / total_audio, 4) if total_audio else None
+        report["cer"] = round(errors / ref_chars, 4) if ref_chars else None
+
+        # 按实时分片长度切分：每个分片的识别延迟
+        latency = {}
+        for seconds in chunk_seconds:
+            step = int(seconds * SAMPLE_RATE)
+            timings = []
+            for samples, _ in audio:
+                session = StreamingSession("benchmark")
+                for start in range(0, len(samples), step):
+                    chunk = samples[start : start + step]
+                    is_final = start + step >= len(samples)
+                    chunk_started = time.perf_counter()
+                    if is_streaming_model(model_params["model"]):
+                        session.feed(model, chunk, is_final=is_final)
+                    else:
+                        model.generate(input=chunk, language="auto", use_itn=True)
+                    timings.append(time.perf_counter() - chunk_started)
+            latency[f"{seconds:g}s"] = {
+                "chunks": len(timings),
+                "p50": percentile(timings, 50),
+                "p95": percentile(timings, 95),
+            }
+        report["chunk_latency"] = latency
+    except Exception as e:
+        report["error"] = str(e)
+    report["peak_rss_mb"] = peak_rss_mb()
+    result_queue.put(report)
+
+
+def build_configs(models, pipelines, threads):
+    configs = []
+    for model in models:
+        for pipeline in pipelines:
+            vad_model, punc_model, spk_model = PIPELINES[pipeline]
+            if spk_model and model != "paraformer-zh":
+                # 说话人模型依赖字级时间戳，只有 paraformer-zh 支持
+                continue
+            if is_streaming_model(model) and pipeline != "bare":
+                # 流式推理绕过 VAD/标点，附加模型不影响结果
+                continue
+            for thread_count in threads:
+                configs.append(
+                    {
+                        "name": f"{model}|{pipeline}|{thread_count}t",
+                        "model": model,
+                        "pipeline": pipeline,
+                        "vad_model": vad_model,
+                        "punc_model": punc_model,
+                        "spk_model": spk_model,
+                        "threads": thread_count,
+                    }
+                )
+    return configs
+
+
+def print_report(reports, chunk_seconds):
+    header = ["配置", "加载(s)", "峰值内存(MB)", "RTF", "CER"]
+    for seconds in chunk_seconds:
+        header += [f"{seconds:g}s p50", f"{seconds:g}s p95"]
+    rows = [header]
+    for report in reports:
+        if "error" in report:
+            rows.append([report["name"], f"失败: {report['error']}"])
+            continue
+        row = [
+            report["name"],
+            str(report["load_seconds"]),
+            f"{report['peak_rss_mb']:.0f}" if report["peak_rss_mb"] else "-",
+            str(report["rtf"]),
+            str(report["cer"]),
+        ]
+        for seconds in chunk_seconds:
+            stats = report["chunk_latency"][f"{seconds:g}s"]
+            row += [str(stats["p50"]), str(stats["p95"])]
+        rows.append(row)
+    for row in rows:
+        print("\t".join(row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR 离线基准测试")
+    parser.add_argument("--data-dir", required=True, help="音频和参考文本所在目录")
+    parser.add_argument("--transcripts", help="参考文本列表文件（<文件名> <文本>）")
+    parser.add_argument(
+        "--models", nargs="+", default=DEFAULT_MODELS, help="测试的模型"
+    )
+    parser.add_argument(
+        "--pipelines",
+        nargs="+",
+        default=list(PIPELINES),
+        choices=list(PIPELINES),
+        help="附加模型组合",
+    )
+    parser.add_argument(
+        "--threads", nargs="+", type=int, default=[1, 4], help="torch 线程数"
+    )
+    parser.add_argument(
+        "--chunk-seconds",
+        nargs="+",
+        type=float,
+        default=[2.0, 5.0],
+        help="测量分片延迟时使用的分片长度（秒）",
+    )
+    parser.add_argument("--limit", type=int, default=0, help="最多使用多少个音频文件")
+    parser.add_argument("--output", help="把完整报告保存为 JSON 文件")
+    args = parser.parse_args()
+
+    items = load_dataset(args.data_dir, args.transcripts)
+    if args.limit:
+        items = items[: args.limit]
+    if not items:
+        logger.error("数据目录中没有找到带参考文本的音频")
+        return 1
+    logger.info(f"数据集: {len(items)} 个音频")
+
+    # 模型已在本地缓存时不访问网络
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    context = multiprocessing.get_context("spawn")
+    reports = []
+    for config in build_configs(args.models, args.pipelines, args.threads):
+        logger.info(f"测试配置: {config['name']}")
+        result_queue = context.Queue()
+        process = context.Process(
+            target=run_config, args=(config, items, args.chunk_seconds, result_queue)
+        )
+        process.start()
+        process.join()
+        if result_queue.empty():
+            report = dict(config, error=f"子进程异常退出: {process.exitcode}")
+        else:
+            report = result_queue.get()
+        reports.append(report)
+
+    print_report(reports, args.chunk_seconds)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        logger.info(f"报告已保存: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())